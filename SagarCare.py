@@ -1,106 +1,551 @@
 
 import os
-import sqlite3
-import random
-from datetime import datetime
+import sys
+import queue
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+import tkinter
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
+from hospital_api import API_URL_ENV, ApiClient
+from hospital_bills import bill_filename, render
+from hospital_photos import Image as PILImage, THUMB_SIZE, import_photo, thumbnail
+from hospital_search import search_patients
+from hospital_forecast import occupancy_forecast
+from hospital_workload import nurse_choices
+from hospital_profile import profiler, enable_from_env, install_tk, untimed, function_name, callback_name, format_top, format_slow
+from hospital_core import (DB_PATH, ROOM_STATUSES, connect, migrate, normalize_patient_id,
+                           RoomUnavailableError, NurseUnavailableError, KeysetSource, staff_search_source, admitted_patients_source, rooms_source,
+                           nurse_history_source, NURSE_HISTORY_PAGE,
+                           dashboard_counts, admission_choices, room_choices, validate_patient, validate_doctor,
+                           validate_nurse, validate_room, admit_patient,
+                           patient_details, discharge_admission, release_admission, get_room, add_room, update_room,
+                           remove_room, room_status, changes_since, get_doctor, add_doctor, update_doctor,
+                           remove_doctor, get_nurse, add_nurse, update_nurse, remove_nurse,
+                           patient_bill, format_bill, write_atomic, dashboard_trends)
+
+# ---------------------- DB EXECUTOR ----------------------
+class DBRequest:
+    def __init__(self, fn, args, on_done, on_error):
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        # A cancelled request is skipped if it hasn't started, and its callback never runs
+        self.cancelled = True
+
+
+class DBExecutor:
+    # Runs database functions on one worker thread with its own connection. Requests
+    # are queued in order; results are handed back to Tk through an after() poll so
+    # callbacks always run on the main thread.
+    def __init__(self, root, db_path=DB_PATH, poll_ms=15):
+        self.root = root
+        self.db_path = db_path
+        self.poll_ms = poll_ms
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="db-executor", daemon=True)
+        self.thread.start()
+        self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        req = DBRequest(fn, args, on_done, on_error)
+        self.requests.put(req)
+        return req
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _execute(self, db, fn, args):
+        try:
+            if profiler.enabled:
+                return profiler.call("data", function_name(fn), fn, db, *args)
+            return fn(db, *args)
+        except Exception:
+            if db.in_transaction:
+                db.rollback()
+            raise
+
+    def _run(self):
+        db = self._connect()
+        while True:
+            req = self.requests.get()
+            if req is None:
+                break
+            if req.cancelled:
+                continue
+            try:
+                self.results.put((req, self._execute(db, req.fn, req.args), None))
+            except Exception as e:
+                self.results.put((req, None, e))
+        db.close()
+
+    @untimed
+    def _poll(self):
+        while True:
+            try:
+                req, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            req.done = True
+            if req.cancelled:
+                continue
+            if error is not None:
+                if req.on_error:
+                    req.on_error(error)
+                else:
+                    messagebox.showerror("Database error", str(error))
+            elif req.on_done:
+                if profiler.enabled:
+                    profiler.call("ui", callback_name(req.on_done), req.on_done, result)
+                else:
+                    req.on_done(result)
+        if not self.closed:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def close(self, timeout=5):
+        # Let queued writes finish, then stop the worker
+        self.closed = True
+        self.root.after_cancel(self._poll_job)
+        self.requests.put(None)
+        self.thread.join(timeout)
+
+
+class RemoteExecutor(DBExecutor):
+    # The same requests sent to an API server (hospital_api.py) instead of a local
+    # connection: a data function is called by name, and a list page by its source's
+    # spec, so only lists built by the named source functions work remotely.
+    def __init__(self, root, url, poll_ms=15):
+        self.url = url
+        super().__init__(root, poll_ms=poll_ms)
+
+    def _connect(self):
+        return ApiClient(self.url)
+
+    def _execute(self, client, fn, args):
+        source = getattr(fn, "__self__", None)
+        if isinstance(source, KeysetSource):
+            return client.page(source.spec, fn.__name__, *args)
+        return client.call(fn.__name__, *args)
 
-# ---------------------- DATABASE SETUP ----------------------
-DB_PATH = "hospital.db"
-conn = sqlite3.connect(DB_PATH)
-cursor = conn.cursor()
-
-# Admissions table;
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS admission (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_id TEXT UNIQUE,
-    patient_name TEXT,
-    age INTEGER,
-    contact TEXT,
-    gender TEXT,
-    disease TEXT,
-    admit_date TEXT,
-    blood_group TEXT,
-    doctor_name TEXT
-)
-""")
-
-# Add room_no
-cursor.execute("PRAGMA table_info(admission)")
-cols = [r[1] for r in cursor.fetchall()]
-if 'room_no' not in cols:
-    try:
-        cursor.execute("ALTER TABLE admission ADD COLUMN room_no TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-# Nurse treatment records
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS nurse_treatment (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_id TEXT,
-    nurse_name TEXT,
-    nurse_notes TEXT,
-    shift TEXT,
-    prescription TEXT,
-    date TEXT
-)
-""")
-
-# New staff tables: doctors and nurses
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS doctors (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    specialization TEXT,
-    contact TEXT,
-    shift TEXT,
-    photo_path TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS nurses (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    contact TEXT,
-    shift TEXT,
-    photo_path TEXT
-)
-""")
-
-# Rooms table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS rooms (
-    room_no TEXT PRIMARY KEY,
-    type TEXT,
-    status TEXT,
-    patient_id TEXT
-)
-""")
-
-# Simple initial room data (if empty)
-cursor.execute("SELECT COUNT(*) FROM rooms")
-if cursor.fetchone()[0] == 0:
-    initial_rooms = [
-        ('101', 'Private', 'Available', None),
-        ('102', 'Shared', 'Available', None),
-        ('201', 'ICU', 'Available', None),
-        ('202', 'Shared', 'Available', None)
-    ]
-    cursor.executemany("INSERT OR IGNORE INTO rooms (room_no, type, status, patient_id) VALUES (?, ?, ?, ?)", initial_rooms)
-
-conn.commit()
 
 # ---------------------- APPLICATION ----------------------
+SEARCH_DEBOUNCE_MS = 200
+ANY_ROOM_TYPE = "Any type"
+ANY_SHIFT = "Any shift"
+NO_NURSE = "None"
+DASHBOARD_REFRESH_MS = 5000
+CHANGE_POLL_MS = 1000  # how often open lists check for other terminals' changes
+TREND_DAYS = 14
+TREND_CHART_HEIGHT = 140
+FORECAST_SHOWN = [1, 3, 7, 14]  # days ahead shown on the dashboard
+
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("green")
 
 
+# ---------------------- VIRTUAL LIST ----------------------
+class VirtualList(ctk.CTkFrame):
+    # Scrollable list that recycles a fixed pool of row widgets. Only the rows around
+    # the visible window are kept in memory; they are fetched from a KeysetSource a
+    # page at a time (through `submit`, i.e. off the Tk thread) as the user scrolls.
+    def __init__(self, master, source, make_row, fill_row, submit, empty_text="Nothing to show.", pool_size=14, page_size=60, row_height=52, row_pack=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.source = source
+        self.fill_row = fill_row
+        self.submit = submit
+        self.empty_text = empty_text
+        self.row_pack = row_pack or {"fill": "x", "pady": 6}
+        self.page_size = page_size
+        self.row_height = row_height
+        self.max_buffer = page_size * 3
+
+        self.total = None
+        self.top = 0
+        self.visible = pool_size
+        self.buffer = []
+        self.buffer_start = 0
+        self.shown = 0
+        self.pending = None
+        self.generation = 0
+
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.empty_label = ctk.CTkLabel(self.body, text="Loading...")
+
+        self.pool = [make_row(self.body) for _ in range(pool_size)]
+        self.pool_data = [None] * pool_size
+        self.bind_wheel(self.body)
+        for row in self.pool:
+            self.bind_wheel(row)
+        self.body.bind("<Configure>", self.on_resize, add="+")
+
+    def bind_wheel(self, widget):
+        # Bind on the plain Tk widgets so the canvas inside each CTk widget gets it once
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tkinter.Misc.bind(widget, sequence, self.on_wheel, "+")
+        for child in widget.winfo_children():
+            self.bind_wheel(child)
+
+    def set_source(self, source):
+        self.source = source
+        self.top = 0
+        self.reload()
+
+    def reload(self):
+        # Drop everything fetched for the old source/data and start over
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+        self.generation += 1
+        generation = self.generation
+        self.buffer = []
+        self.buffer_start = 0
+
+        def counted(total):
+            if generation == self.generation:
+                self.total = total
+                self.scroll_to(self.top)
+        self.submit(self.source.count, on_done=counted)
+
+    def apply_changes(self, keys):
+        # Rows with these ids (first column) were changed by someone else: re-read just
+        # them and patch the held rows, instead of reloading. keys=None reloads.
+        if keys is None or not self.buffer:
+            self.reload()
+            return
+        generation = self.generation
+
+        def loaded(result):
+            if generation == self.generation:
+                self.patch_rows(set(keys), *result)
+        self.submit(self.source.changed, list(keys), on_done=loaded)
+
+    def patch_rows(self, keys, total, rows):
+        # The held rows are a contiguous slice of the list in key order; a changed row
+        # belongs in it if its key falls between the first and last held row (or
+        # before/after them when the slice starts/ends the list).
+        if self.pending is not None:
+            # A page read before these changes may overlap them; read it again
+            self.pending.cancel()
+            self.pending = None
+        key = self.source.key
+        at_start = self.buffer_start == 0
+        at_end = self.buffer_start + len(self.buffer) >= (self.total or 0)
+        low, high = key(self.buffer[0]), key(self.buffer[-1])
+        buffer = [r for r in self.buffer if r[0] not in keys]
+        held = [key(r) for r in buffer]
+        for row in rows:
+            k = key(row)
+            if (at_start or k >= low) and (at_end or k <= high):
+                i = bisect_left(held, k)
+                held.insert(i, k)
+                buffer.insert(i, row)
+        self.buffer = buffer
+        self.total = total
+        if at_end:
+            self.buffer_start = max(0, total - len(buffer))
+        if at_start:
+            self.buffer_start = 0
+        self.scroll_to(self.top)
+
+    # ---- data window ----
+    def next_fetch(self, first, last):
+        # Which page (if any) is needed to cover rows [first, last). Prefer keyset steps
+        # from the rows already held; jump with OFFSET only when that is impossible.
+        last = min(last, self.total)
+        buffer_end = self.buffer_start + len(self.buffer)
+        if self.buffer and self.buffer_start <= first and last <= buffer_end:
+            return None
+        if self.buffer and self.buffer_start <= first <= buffer_end:
+            return "after", self.source.after, (self.source.key(self.buffer[-1]), self.page_size)
+        if self.buffer and first < self.buffer_start <= last + self.page_size:
+            return "before", self.source.before, (self.source.key(self.buffer[0]), self.page_size)
+        if self.total == 0:
+            return None
+        start = max(0, first - self.page_size // 2)
+        if start:
+            return "at", self.source.at, (start, self.page_size * 2)
+        return "first", self.source.after, (None, self.page_size * 2)
+
+    def fetch(self):
+        if self.pending is not None or self.total is None:
+            return
+        wanted = self.next_fetch(self.top, self.top + self.visible)
+        if wanted is None:
+            return
+        kind, fn, args = wanted
+        generation = self.generation
+
+        def loaded(rows):
+            self.pending = None
+            if generation != self.generation:
+                return
+            self.apply_rows(kind, args, rows)
+            self.scroll_to(self.top)
+        self.pending = self.submit(fn, *args, on_done=loaded)
+
+    def apply_rows(self, kind, args, rows):
+        buffer_end = self.buffer_start + len(self.buffer)
+        if kind == "after":
+            if not rows:
+                self.total = buffer_end  # rows were deleted since we counted
+            self.buffer.extend(rows)
+            extra = len(self.buffer) - self.max_buffer
+            if extra > 0 and self.buffer_start + extra <= self.top:
+                del self.buffer[:extra]
+                self.buffer_start += extra
+        elif kind == "before":
+            if not rows:
+                self.top = max(0, self.top - self.buffer_start)
+                self.buffer_start = 0
+            self.buffer[:0] = rows
+            self.buffer_start -= len(rows)
+            extra = len(self.buffer) - self.max_buffer
+            if extra > 0 and self.buffer_start + len(self.buffer) - extra >= self.top + self.visible:
+                del self.buffer[-extra:]
+        else:
+            start = args[0] if kind == "at" else 0
+            if not rows:
+                self.total = start
+            self.buffer = rows
+            self.buffer_start = start
+
+    def scroll_to(self, top):
+        if self.total is None:
+            return
+        self.top = max(0, min(int(top), self.total - self.visible))
+        self.fetch()
+        # While a page is loading keep showing the old rows; its callback renders
+        if self.pending is None:
+            self.render()
+
+    def render(self):
+        if not self.total:
+            self.empty_label.configure(text="Loading..." if self.total is None else self.empty_text)
+            self.empty_label.pack(pady=10)
+        else:
+            self.empty_label.pack_forget()
+
+        count = 0
+        for i in range(self.visible):
+            pos = self.top + i - self.buffer_start
+            if pos < 0 or pos >= len(self.buffer) or self.top + i >= (self.total or 0):
+                break
+            # Only reconfigure rows whose data changed
+            if self.pool_data[i] != self.buffer[pos]:
+                self.fill_row(self.pool[i], self.buffer[pos])
+                self.pool_data[i] = self.buffer[pos]
+            count += 1
+
+        # Show/hide only the tail of the pool whose visibility changed
+        for i in range(self.shown, count):
+            self.pool[i].pack(**self.row_pack)
+        for i in range(count, self.shown):
+            self.pool[i].pack_forget()
+        self.shown = count
+
+        if not self.total or self.total <= self.visible:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / self.total, (self.top + self.visible) / self.total)
+
+    # ---- events ----
+    def on_resize(self, event):
+        fits = max(1, min(len(self.pool), event.height // self.row_height))
+        if fits != self.visible:
+            self.visible = fits
+            self.scroll_to(self.top)
+
+    def on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.top - 3)
+        else:
+            self.scroll_to(self.top + 3)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if self.total is None:
+            return
+        if action == "moveto":
+            self.scroll_to(float(value) * self.total)
+        elif unit == "pages":
+            self.scroll_to(self.top + int(value) * self.visible)
+        else:
+            self.scroll_to(self.top + int(value) * 3)
+
+
+# ---------------------- STAFF PHOTOS ----------------------
+MAX_CACHED_THUMBNAILS = 256  # decoded thumbnails kept in memory
+
+
+class PhotoLoader:
+    # Loads staff photo thumbnails on a worker thread (generating them on first use)
+    # and hands them to Tk as CTkImages. Rows ask for their photo when they are filled,
+    # so only visible rows load anything; requests are served newest first, so the
+    # rows on screen now win over ones that were scrolled past. Decoded images live in
+    # a bounded LRU.
+    def __init__(self, root, poll_ms=30):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.images = OrderedDict()  # photo path -> CTkImage, or None if it has no thumbnail
+        self.waiting = {}  # photo path -> callbacks
+        self.requests = queue.LifoQueue()
+        self.results = queue.Queue()
+        self._poll_job = None
+        self.thread = threading.Thread(target=self._run, name="photo-loader", daemon=True)
+        self.thread.start()
+
+    def get(self, path, callback):
+        # callback(image) with the CTkImage (or None), now if cached, else once loaded
+        if path in self.images:
+            self.images.move_to_end(path)
+            callback(self.images[path])
+            return
+        if path in self.waiting:
+            self.waiting[path].append(callback)
+            return
+        self.waiting[path] = [callback]
+        self.requests.put(path)
+        if self._poll_job is None:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def _run(self):
+        while True:
+            path = self.requests.get()
+            if path is None:
+                break
+            image = None
+            thumb = thumbnail(path)
+            if thumb:
+                try:
+                    with PILImage.open(thumb) as img:
+                        image = img.copy()
+                except OSError:
+                    pass
+            self.results.put((path, image))
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                path, image = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if image is not None:
+                image = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+            self.images[path] = image
+            while len(self.images) > MAX_CACHED_THUMBNAILS:
+                self.images.popitem(last=False)
+            for callback in self.waiting.pop(path, []):
+                callback(image)
+        if self.waiting:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    def close(self):
+        if self._poll_job is not None:
+            self.root.after_cancel(self._poll_job)
+        self.requests.put(None)
+
+
+# ---------------------- PATIENT SEARCH ----------------------
+class PatientSearch:
+    # Entry with a drop-down of matching patients (by ID, name, contact or disease),
+    # searched as the user types, debounced. on_pick(patient_id) runs when a match is
+    # clicked, or for the best match on Enter. The drop-down is placed over the app
+    # window under the entry, so it never pushes the page's layout around.
+    def __init__(self, app, parent, on_pick, width=200, placeholder="Search patients"):
+        self.app = app
+        self.on_pick = on_pick
+        self.entry = ctk.CTkEntry(parent, width=width, placeholder_text=placeholder)
+        self.popup = ctk.CTkFrame(app, corner_radius=6, border_width=1)
+        self.buttons = []
+        self.results = []
+        self.job = None
+        self.entry.bind("<KeyRelease>", self.changed)
+        self.entry.bind("<Return>", lambda e: self.pick(self.results[0][0]) if self.results else None)
+        self.entry.bind("<Escape>", lambda e: self.hide())
+        # Late enough for a click on a match to land first
+        self.entry.bind("<FocusOut>", lambda e: self.app.after(150, self.hide))
+        self.entry.bind("<Destroy>", lambda e: self.popup.destroy(), add="+")
+        # The first search builds the index; start on it as soon as the user heads here
+        self.entry.bind("<FocusIn>", lambda e: self.app.db.submit(search_patients, ""), add="+")
+
+    def changed(self, event):
+        if event.keysym in ("Return", "Escape", "Tab"):
+            return
+        if self.job is not None:
+            self.app.after_cancel(self.job)
+        self.job = self.app.after(SEARCH_DEBOUNCE_MS, self.search)
+
+    def search(self):
+        self.job = None
+        if not self.entry.winfo_exists():
+            return
+        text = self.entry.get().strip()
+        if not text:
+            self.show(text, [])
+            return
+        self.app.db.submit(search_patients, text, on_done=lambda rows: self.show(text, rows))
+
+    def show(self, text, rows):
+        # Drop results for text the user has typed past
+        if not self.entry.winfo_exists() or text != self.entry.get().strip():
+            return
+        self.results = rows
+        if not rows:
+            self.hide()
+            return
+        while len(self.buttons) < len(rows):
+            self.buttons.append(ctk.CTkButton(self.popup, anchor="w", fg_color="transparent", height=26))
+        for button, (pid, name, contact, disease) in zip(self.buttons, rows):
+            button.configure(text=f"{pid}  {name}  |  {disease}  |  {contact}", command=lambda p=pid: self.pick(p))
+            button.pack(fill="x", padx=4, pady=1)
+        for button in self.buttons[len(rows):]:
+            button.pack_forget()
+        self.popup.place(in_=self.entry, relx=0, rely=1, y=2, anchor="nw")
+        self.popup.lift()
+
+    def hide(self):
+        if self.popup.winfo_exists():
+            self.popup.place_forget()
+
+    def pick(self, patient_id):
+        self.hide()
+        self.results = []
+        self.on_pick(patient_id)
+
+
+# ---------------------- VIEW CACHE / FONTS ----------------------
+MAX_CACHED_VIEWS = 5  # least recently shown pages beyond this are destroyed
+FONTS = {}
+
+
+class CachedView:
+    def __init__(self, frame, refresh):
+        self.frame = frame
+        self.refresh = refresh
+
+
+def font(size, weight="normal", family=None):
+    # Shared CTkFont instances; creating one per label is slow and they are all alike.
+    # family=None is the theme's font.
+    key = (size, weight, family)
+    if key not in FONTS:
+        FONTS[key] = ctk.CTkFont(family=family, size=size, weight=weight)
+    return FONTS[key]
+
+
 class HospitalApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, db_path=DB_PATH):
         super().__init__()
         self.title("Sagar Care Hospital System")
         self.geometry("1100x700")
@@ -109,16 +554,22 @@ class HospitalApp(ctk.CTk):
         self.sidebar = ctk.CTkFrame(self, width=220, corner_radius=10)
         self.sidebar.grid(row=0, column=0, sticky="nswe", padx=10, pady=10)
 
-        ctk.CTkLabel(self.sidebar, text="SAGAR CARE", font=ctk.CTkFont(size=20, weight="bold")).grid(row=0, column=0, padx=12, pady=18)
+        ctk.CTkLabel(self.sidebar, text="SAGAR CARE", font=font(20, "bold")).grid(row=0, column=0, padx=12, pady=18)
 
-        ctk.CTkButton(self.sidebar, text="Dashboard", command=self.show_dashboard).grid(row=1, column=0, padx=12, pady=6, sticky="ew")
-        ctk.CTkButton(self.sidebar, text="New Admission", command=self.show_admission_form).grid(row=2, column=0, padx=12, pady=6, sticky="ew")
-        ctk.CTkButton(self.sidebar, text="Admitted Patients", command=self.show_admitted_patients).grid(row=3, column=0, padx=12, pady=6, sticky="ew")
-        ctk.CTkButton(self.sidebar, text="Room Availability", command=self.show_room_availability).grid(row=4, column=0, padx=12, pady=6, sticky="ew")
-        ctk.CTkButton(self.sidebar, text="Staff", command=self.show_staff_page).grid(row=5, column=0, padx=12, pady=6, sticky="ew")
-        ctk.CTkButton(self.sidebar, text="Bill", command=self.show_billing_page).grid(row=6, column=0, padx=12, pady=6, sticky="ew")
-       # ctk.CTkButton(self.sidebar, text="Ambulance Status", command=lambda: self.show_message("Not Implemented", "Ambulance page not in this build.")).grid(row=7, column=0, padx=12, pady=6, sticky="ew")
-        ctk.CTkButton(self.sidebar, text="Exit", command=self.on_closing, fg_color="#ff4444").grid(row=8, column=0, padx=12, pady=20, sticky="ew")
+        # Find any admitted patient by ID, name, contact or disease
+        self.patient_search = PatientSearch(self, self.sidebar, self.view_patient_details, width=196)
+        self.patient_search.entry.grid(row=1, column=0, padx=12, pady=(0, 10), sticky="ew")
+
+        ctk.CTkButton(self.sidebar, text="Dashboard", command=self.show_dashboard).grid(row=2, column=0, padx=12, pady=6, sticky="ew")
+        ctk.CTkButton(self.sidebar, text="New Admission", command=self.show_admission_form).grid(row=3, column=0, padx=12, pady=6, sticky="ew")
+        ctk.CTkButton(self.sidebar, text="Admitted Patients", command=self.show_admitted_patients).grid(row=4, column=0, padx=12, pady=6, sticky="ew")
+        ctk.CTkButton(self.sidebar, text="Room Availability", command=self.show_room_availability).grid(row=5, column=0, padx=12, pady=6, sticky="ew")
+        ctk.CTkButton(self.sidebar, text="Staff", command=self.show_staff_page).grid(row=6, column=0, padx=12, pady=6, sticky="ew")
+        ctk.CTkButton(self.sidebar, text="Bill", command=self.show_billing_page).grid(row=7, column=0, padx=12, pady=6, sticky="ew")
+       # ctk.CTkButton(self.sidebar, text="Ambulance Status", command=lambda: self.show_message("Not Implemented", "Ambulance page not in this build.")).grid(row=8, column=0, padx=12, pady=6, sticky="ew")
+        if profiler.enabled:
+            ctk.CTkButton(self.sidebar, text="Diagnostics", command=self.show_diagnostics).grid(row=8, column=0, padx=12, pady=6, sticky="ew")
+        ctk.CTkButton(self.sidebar, text="Exit", command=self.on_closing, fg_color="#ff4444").grid(row=9, column=0, padx=12, pady=20, sticky="ew")
 
         # Main content area
         self.main_area = ctk.CTkFrame(self, corner_radius=10)
@@ -127,12 +578,42 @@ class HospitalApp(ctk.CTk):
         self.grid_rowconfigure(0, weight=1)
 
         self.current_widgets = []
+        self.views = OrderedDict()
+        self.current_view = None
+        self.page_requests = []
+        self.page_jobs = []
+        self.dashboard_auto = ctk.BooleanVar(value=False)
+        # SAGARCARE_API=http://host:8470 uses a shared API server instead of the local file
+        # (with its token in SAGARCARE_API_TOKEN)
+        api_url = os.environ.get(API_URL_ENV)
+        if api_url:
+            self.db = RemoteExecutor(self, api_url)
+        else:
+            db = connect(db_path)
+            migrate(db)
+            db.close()
+            self.db = DBExecutor(self, db_path)
+        self.photos = PhotoLoader(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.change_seq = None
+        self.change_job = self.after(CHANGE_POLL_MS, self.poll_changes)
 
         # Start at dashboard
         self.show_dashboard()
 
     # ---------------------- Utilities ----------------------
     def clear_main(self):
+        # Results for the page we are leaving are no longer wanted
+        for req in self.page_requests:
+            req.cancel()
+        self.page_requests = []
+        for job in self.page_jobs:
+            self.after_cancel(job)
+        self.page_jobs = []
+        # Cached pages are only hidden; one-off pages are destroyed
+        if self.current_view is not None:
+            self.current_view.frame.pack_forget()
+            self.current_view = None
         for w in self.current_widgets:
             try:
                 w.destroy()
@@ -140,6 +621,68 @@ class HospitalApp(ctk.CTk):
                 pass
         self.current_widgets = []
 
+    def show_view(self, name, build, **pack):
+        # Show a cached page, building it the first time. build(frame) creates the
+        # widgets once and returns a refresh() that re-reads the data and updates
+        # the existing widgets in place; it runs every time the page is shown.
+        self.clear_main()
+        view = self.views.get(name)
+        if view is None:
+            frame = ctk.CTkFrame(self.main_area)
+            view = CachedView(frame, None)
+            self.views[name] = view
+            view.refresh = build(frame)
+            while len(self.views) > MAX_CACHED_VIEWS:
+                _, old = self.views.popitem(last=False)
+                old.frame.destroy()
+        else:
+            self.views.move_to_end(name)
+        view.frame.pack(fill="both", expand=True, **pack)
+        self.current_view = view
+        if view.refresh:
+            view.refresh()
+
+    def run_db(self, fn, *args, on_done=None, on_error=None):
+        # Read for the current page: runs on the DB thread, dropped if the user navigates away
+        self.page_requests = [r for r in self.page_requests if not r.done]
+        req = self.db.submit(fn, *args, on_done=on_done, on_error=on_error)
+        self.page_requests.append(req)
+        return req
+
+    def write_db(self, fn, *args, on_done=None, on_error=None):
+        # Writes always run to completion, even if the page is left meanwhile
+        return self.db.submit(fn, *args, on_done=on_done, on_error=on_error)
+
+    def page_after(self, ms, fn):
+        # after() that is cancelled when the user leaves the page
+        def run():
+            self.page_jobs.remove(job)
+            fn()
+        job = self.after(ms, run)
+        self.page_jobs.append(job)
+        return job
+
+    def store_photo(self, path):
+        # Copy a chosen photo into the managed store; None (after telling the user) if that fails
+        try:
+            return import_photo(path)
+        except OSError as e:
+            messagebox.showerror("Photo", f"Could not copy the photo: {e}")
+            return None
+
+    def show_photo(self, row, path):
+        # Put the thumbnail of `path` on a staff row once it is loaded, unless the row
+        # has been reused for someone else by then
+        row.photo_path = path
+        row.photo.configure(image=None)
+        if path:
+            self.photos.get(path, lambda image: row.photo_path == path and row.photo.configure(image=image))
+
+    def loading_label(self, parent):
+        label = ctk.CTkLabel(parent, text="Loading...")
+        label.pack(pady=10)
+        return label
+
     def show_message(self, title, message):
         dialog = ctk.CTkToplevel(self)
         dialog.title(title)
@@ -147,43 +690,161 @@ class HospitalApp(ctk.CTk):
         ctk.CTkLabel(dialog, text=message, wraplength=360).pack(padx=20, pady=20)
         ctk.CTkButton(dialog, text="OK", command=dialog.destroy).pack(pady=10)
 
+    def poll_changes(self):
+        # Patch the lists on screen (a page's frame.lists) with the rows other
+        # terminals changed; pages not on screen re-read when they are shown anyway
+        def polled(result):
+            seq, changes = result
+            self.change_seq = seq
+            if changes and self.current_view is not None:
+                for lst in getattr(self.current_view.frame, "lists", []):
+                    if lst.source.table in changes:
+                        lst.apply_changes(changes[lst.source.table])
+            again()
+
+        def again(error=None):
+            self.change_job = self.after(CHANGE_POLL_MS, self.poll_changes)
+        self.db.submit(changes_since, self.change_seq, on_done=polled, on_error=again)
+
     def on_closing(self):
-        conn.commit()
-        conn.close()
+        self.after_cancel(self.change_job)
+        self.photos.close()
+        self.db.close()
         self.destroy()
 
     # ---------------------- Dashboard ----------------------
     def show_dashboard(self):
-        self.clear_main()
-        frame = ctk.CTkFrame(self.main_area)
-        frame.pack(fill="both", expand=True)
-        self.current_widgets.append(frame)
-
-        ctk.CTkLabel(frame, text="Dashboard", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
+        self.show_view("dashboard", self.build_dashboard)
 
-        cursor.execute("SELECT COUNT(*) FROM admission")
-        patients = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM doctors")
-        doctors = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM nurses")
-        nurses = cursor.fetchone()[0]
+    def build_dashboard(self, frame):
+        ctk.CTkLabel(frame, text="Dashboard", font=font(24, "bold")).pack(pady=20)
 
         stats_frame = ctk.CTkFrame(frame)
         stats_frame.pack(padx=20, pady=10, fill="x")
-        self.current_widgets.append(stats_frame)
 
-        ctk.CTkLabel(stats_frame, text=f"Admitted Patients: {patients}", font=ctk.CTkFont(size=16)).grid(row=0, column=0, padx=20, pady=10)
-        ctk.CTkLabel(stats_frame, text=f"Doctors: {doctors}", font=ctk.CTkFont(size=16)).grid(row=0, column=1, padx=20, pady=10)
-        ctk.CTkLabel(stats_frame, text=f"Nurses: {nurses}", font=ctk.CTkFont(size=16)).grid(row=0, column=2, padx=20, pady=10)
+        stat_font = font(16)
+        titles = {"admission": "Admitted Patients", "doctors": "Doctors", "nurses": "Nurses"}
+        labels = {}
+        for col, (key, title) in enumerate(titles.items()):
+            labels[key] = ctk.CTkLabel(stats_frame, text=f"{title}: ...", font=stat_font)
+            labels[key].grid(row=0, column=col, padx=20, pady=10)
+
+        # Rooms by type and status; rows are added as new room types show up
+        ctk.CTkLabel(frame, text="Rooms", font=font(18, "bold")).pack(pady=(16, 4))
+        rooms_frame = ctk.CTkFrame(frame)
+        rooms_frame.pack(padx=20, pady=10, fill="x")
+        ctk.CTkLabel(rooms_frame, text="Type", font=stat_font).grid(row=0, column=0, padx=20, pady=6, sticky="w")
+        for col, status in enumerate(ROOM_STATUSES):
+            ctk.CTkLabel(rooms_frame, text=status, font=stat_font).grid(row=0, column=col+1, padx=20, pady=6)
+        room_types = []
+
+        scheduled = {"job": None}
+        def toggle_auto():
+            if scheduled["job"] is not None:
+                self.after_cancel(scheduled["job"])
+                scheduled["job"] = None
+            if self.dashboard_auto.get():
+                refresh()
+        ctk.CTkSwitch(frame, text=f"Auto-refresh every {DASHBOARD_REFRESH_MS // 1000}s", variable=self.dashboard_auto,
+                      command=toggle_auto).pack(pady=10)
+
+        def loaded(counts):
+            updates = {key: counts.get(key, 0) for key in titles}
+            for name, value in counts.items():
+                if name.startswith("rooms:") and value:
+                    _, rtype, status = name.split(":", 2)
+                    if status in ROOM_STATUSES:
+                        updates[(rtype, status)] = value
+            for rtype in sorted({k[0] for k in updates if isinstance(k, tuple)} - set(room_types)):
+                room_types.append(rtype)
+                row = len(room_types)
+                ctk.CTkLabel(rooms_frame, text=rtype or "-", font=stat_font).grid(row=row, column=0, padx=20, pady=4, sticky="w")
+                for col, status in enumerate(ROOM_STATUSES):
+                    labels[(rtype, status)] = ctk.CTkLabel(rooms_frame, text="0", font=stat_font)
+                    labels[(rtype, status)].grid(row=row, column=col+1, padx=20, pady=4)
+
+            # Only touch labels whose value changed
+            for key, label in labels.items():
+                value = updates.get(key, 0)
+                text = f"{titles[key]}: {value}" if key in titles else str(value)
+                if label.cget("text") != text:
+                    label.configure(text=text)
+            if self.dashboard_auto.get() and scheduled["job"] is None:
+                scheduled["job"] = self.page_after(DASHBOARD_REFRESH_MS, refresh)
+
+        # Trends from the hourly/daily rollups: admissions per day and today's peak
+        # occupancy and recent average stay per room type
+        ctk.CTkLabel(frame, text=f"Last {TREND_DAYS} days", font=font(18, "bold")).pack(pady=(16, 4))
+        chart = ctk.CTkCanvas(frame, height=TREND_CHART_HEIGHT, highlightthickness=0, bg="#2b2b2b")
+        chart.pack(padx=20, pady=4, fill="x")
+        trend_label = ctk.CTkLabel(frame, text="", font=font(13), justify="left")
+        trend_label.pack(padx=20, pady=(2, 10))
+
+        def trends_loaded(trends):
+            chart.delete("all")
+            width = max(chart.winfo_width(), 400)
+            counts = trends["admissions"]
+            top = max(counts) or 1
+            slot = width / len(counts)
+            for i, (day, count) in enumerate(zip(trends["days"], counts)):
+                bar = (TREND_CHART_HEIGHT - 30) * count / top
+                x = i * slot
+                chart.create_rectangle(x + 4, TREND_CHART_HEIGHT - 16 - bar, x + slot - 4, TREND_CHART_HEIGHT - 16,
+                                       fill="#2fa572", width=0)
+                chart.create_text(x + slot / 2, TREND_CHART_HEIGHT - 8, text=day[5:], fill="#aaaaaa", font=("", 9))
+                chart.create_text(x + slot / 2, TREND_CHART_HEIGHT - 22 - bar, text=str(count), fill="#dddddd", font=("", 9))
+            peaks = "  |  ".join(f"{t or '-'} {levels[-1]}" for t, levels in trends["occupied"].items())
+            stays = "  |  ".join(f"{t or '-'} {days:.1f} d" for t, days in trends["avg_stay"].items())
+            trend_label.configure(text=f"Admissions per day (bars)\nPeak occupied rooms today: {peaks or '-'}\n"
+                                       f"Average stay, last 30 days: {stays or '-'}")
+
+        # Expected occupied rooms per type over the coming days, against the rooms there are
+        ctk.CTkLabel(frame, text="Occupancy forecast", font=font(18, "bold")).pack(pady=(16, 4))
+        forecast_frame = ctk.CTkFrame(frame)
+        forecast_frame.pack(padx=20, pady=(4, 16), fill="x")
+        forecast_labels = {}  # ahead -> day header, (room type, ahead) -> cell; "note" while only an error shows
+
+        def forecast_loaded(result):
+            if "note" in forecast_labels:
+                forecast_labels.pop("note").destroy()
+            if not forecast_labels:
+                ctk.CTkLabel(forecast_frame, text="Type", font=stat_font).grid(row=0, column=0, padx=20, pady=6, sticky="w")
+                for col, ahead in enumerate(FORECAST_SHOWN):
+                    forecast_labels[ahead] = ctk.CTkLabel(forecast_frame, text="", font=stat_font)
+                    forecast_labels[ahead].grid(row=0, column=col+1, padx=20, pady=6)
+            texts = {ahead: f"+{ahead}d ({result['days'][ahead - 1][5:]})" for ahead in FORECAST_SHOWN}
+            for rtype, expected in result["expected"].items():
+                if (rtype, FORECAST_SHOWN[0]) not in forecast_labels:
+                    row = len(forecast_labels) // len(FORECAST_SHOWN)
+                    ctk.CTkLabel(forecast_frame, text=rtype, font=stat_font).grid(row=row, column=0, padx=20, pady=4, sticky="w")
+                    for col, ahead in enumerate(FORECAST_SHOWN):
+                        forecast_labels[(rtype, ahead)] = ctk.CTkLabel(forecast_frame, text="", font=stat_font)
+                        forecast_labels[(rtype, ahead)].grid(row=row, column=col+1, padx=20, pady=4)
+                for ahead in FORECAST_SHOWN:
+                    texts[(rtype, ahead)] = f"{expected[ahead - 1]:.1f} / {result['capacity'][rtype]}"
+            for key, text in texts.items():
+                if forecast_labels[key].cget("text") != text:
+                    forecast_labels[key].configure(text=text)
+
+        def forecast_failed(error):
+            # e.g. numpy not installed; the rest of the dashboard still works
+            if not forecast_labels:
+                forecast_labels["note"] = ctk.CTkLabel(forecast_frame, text=str(error), font=font(13))
+                forecast_labels["note"].pack(padx=20, pady=10)
+
+        def refresh():
+            scheduled["job"] = None
+            self.run_db(dashboard_counts, on_done=loaded)
+            self.run_db(dashboard_trends, TREND_DAYS, on_done=trends_loaded)
+            self.run_db(occupancy_forecast, on_done=forecast_loaded, on_error=forecast_failed)
+        return refresh
 
     # ---------------------- Admission Form ----------------------
     def show_admission_form(self):
-        self.clear_main()
-        frame = ctk.CTkFrame(self.main_area)
-        frame.pack(fill="both", expand=True, padx=20, pady=20)
-        self.current_widgets.append(frame)
+        self.show_view("admission", self.build_admission_form, padx=20, pady=20)
 
-        ctk.CTkLabel(frame, text="New Patient Admission", font=ctk.CTkFont(size=20, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
+    def build_admission_form(self, frame):
+        ctk.CTkLabel(frame, text="New Patient Admission", font=font(20, "bold")).grid(row=0, column=0, columnspan=2, pady=10)
 
         labels = ["Patient Name", "Age", "Contact", "Gender", "Disease", "Blood Group"]
         self.admission_entries = {}
@@ -200,35 +861,106 @@ class HospitalApp(ctk.CTk):
                 entry.grid(row=i+1, column=1, padx=10, pady=6, sticky="ew")
                 self.admission_entries[label] = entry
 
-        # Doctor choice
-        ctk.CTkLabel(frame, text="Doctor Name").grid(row=len(labels)+1, column=0, padx=10, pady=6, sticky="w")
-        cursor.execute("SELECT name FROM doctors ORDER BY name")
-        doctors = [d[0] for d in cursor.fetchall()]
+        # Doctor, room and nurse choices are filled in once loaded
+        self.doctor_var = ctk.StringVar(value="Loading...")
+        self.room_var = ctk.StringVar(value="Loading...")
+        self.nurse_var = ctk.StringVar(value="Loading...")
+        self.choice_menus = []
+        for offset, (label, var) in enumerate([("Doctor Name", self.doctor_var), ("Room Number", self.room_var), ("Assign Nurse", self.nurse_var)]):
+            ctk.CTkLabel(frame, text=label).grid(row=len(labels)+1+offset, column=0, padx=10, pady=6, sticky="w")
+            parent = frame
+            if var is self.room_var:
+                # Room picker: filter by type and room number / ward prefix; the best
+                # fit (lowest numbered match) is preselected
+                parent = ctk.CTkFrame(frame, fg_color="transparent")
+                parent.grid(row=len(labels)+1+offset, column=1, padx=10, pady=6, sticky="ew")
+                self.room_type_var = ctk.StringVar(value=ANY_ROOM_TYPE)
+                self.room_type_menu = ctk.CTkOptionMenu(parent, variable=self.room_type_var, values=[ANY_ROOM_TYPE], width=110,
+                                                        command=lambda _: self.load_room_choices())
+                self.room_type_menu.pack(side="left")
+                self.room_search_var = ctk.StringVar()
+                ctk.CTkEntry(parent, textvariable=self.room_search_var, width=90, placeholder_text="Room / ward").pack(side="left", padx=6)
+                self.room_search_var.trace_add("write", lambda *_: self.schedule_room_search())
+            elif var is self.nurse_var:
+                # Nurse picker: least loaded first, optionally of one shift; the least
+                # loaded is preselected
+                parent = ctk.CTkFrame(frame, fg_color="transparent")
+                parent.grid(row=len(labels)+1+offset, column=1, padx=10, pady=6, sticky="ew")
+                self.shift_var = ctk.StringVar(value=ANY_SHIFT)
+                self.shift_menu = ctk.CTkOptionMenu(parent, variable=self.shift_var, values=[ANY_SHIFT], width=110,
+                                                    command=lambda _: self.load_nurse_choices())
+                self.shift_menu.pack(side="left", padx=(0, 6))
+            menu = ctk.CTkOptionMenu(parent, variable=var, values=["Loading..."], state="disabled")
+            if parent is frame:
+                menu.grid(row=len(labels)+1+offset, column=1, padx=10, pady=6, sticky="ew")
+            else:
+                menu.pack(side="left", fill="x", expand=True)
+            self.choice_menus.append(menu)
+        self.room_search_job = None
+
+        self.submit_btn = ctk.CTkButton(frame, text="Admit Patient", command=self.save_admission, fg_color="#00cc99", state="disabled")
+        self.submit_btn.grid(row=len(labels)+4, column=1, pady=20, sticky="e")
+        # Typed-in values survive navigation; the choices are re-read each time
+        return lambda: self.run_db(admission_choices, on_done=self.fill_admission_choices)
+
+    def reset_admission_form(self):
+        for label, field in self.admission_entries.items():
+            if isinstance(field, ctk.StringVar):
+                field.set("Male")
+            else:
+                field.delete(0, "end")
+
+    def fill_admission_choices(self, choices):
+        doctors, room_types = choices
         doctors = doctors if doctors else ["No Doctors Available"]
-        self.doctor_var = ctk.StringVar(value=doctors[0])
-        doc_menu = ctk.CTkOptionMenu(frame, variable=self.doctor_var, values=doctors)
-        doc_menu.grid(row=len(labels)+1, column=1, padx=10, pady=6, sticky="ew")
-
-        # Room choice (only available rooms)
-        ctk.CTkLabel(frame, text="Room Number").grid(row=len(labels)+2, column=0, padx=10, pady=6, sticky="w")
-        cursor.execute("SELECT room_no FROM rooms WHERE status='Available' ORDER BY room_no")
-        rooms = [r[0] for r in cursor.fetchall()]
+        self.choice_menus[0].configure(values=doctors, state="normal")
+        if self.doctor_var.get() not in doctors:
+            self.doctor_var.set(doctors[0])
+        types = [ANY_ROOM_TYPE] + room_types
+        self.room_type_menu.configure(values=types)
+        if self.room_type_var.get() not in types:
+            self.room_type_var.set(ANY_ROOM_TYPE)
+        self.load_room_choices()
+        self.load_nurse_choices()
+        self.submit_btn.configure(state="normal")
+
+    def load_nurse_choices(self):
+        if not self.shift_menu.winfo_exists():
+            return
+        shift = self.shift_var.get()
+        self.run_db(nurse_choices, None if shift == ANY_SHIFT else shift, on_done=self.fill_nurse_choices)
+
+    def fill_nurse_choices(self, result):
+        # Shown as "id: name (patients, shift)"; the least loaded one is the suggestion
+        shifts, nurses = result
+        shifts = [ANY_SHIFT] + shifts
+        self.shift_menu.configure(values=shifts)
+        if self.shift_var.get() not in shifts:
+            self.shift_var.set(ANY_SHIFT)
+        values = [f"{nurse_id}: {name} ({load} patients{', ' + shift if shift else ''})" for nurse_id, name, shift, load in nurses]
+        self.choice_menus[2].configure(values=values + [NO_NURSE], state="normal")
+        self.nurse_var.set(values[0] if values else NO_NURSE)
+
+    def schedule_room_search(self):
+        # Debounced like the staff search
+        if self.room_search_job is not None:
+            self.after_cancel(self.room_search_job)
+        self.room_search_job = self.after(SEARCH_DEBOUNCE_MS, self.load_room_choices)
+
+    def load_room_choices(self):
+        self.room_search_job = None
+        if not self.room_type_menu.winfo_exists():
+            return
+        room_type = self.room_type_var.get()
+        room_type = None if room_type == ANY_ROOM_TYPE else room_type
+        self.run_db(room_choices, room_type, self.room_search_var.get().strip(), on_done=self.fill_room_choices)
+
+    def fill_room_choices(self, result):
+        best, rooms = result
         rooms = rooms if rooms else ["No Rooms Available"]
-        self.room_var = ctk.StringVar(value=rooms[0])
-        room_menu = ctk.CTkOptionMenu(frame, variable=self.room_var, values=rooms)
-        room_menu.grid(row=len(labels)+2, column=1, padx=10, pady=6, sticky="ew")
-
-        # Assign Nurse in choice
-        ctk.CTkLabel(frame, text="Assign Nurse").grid(row=len(labels)+3, column=0, padx=10, pady=6, sticky="w")
-        cursor.execute("SELECT id, name FROM nurses ORDER BY name")
-        nurses = [f"{r[0]}: {r[1]}" for r in cursor.fetchall()]
-        nurses = nurses if nurses else ["None"]
-        self.nurse_var = ctk.StringVar(value=nurses[0])
-        nurse_menu = ctk.CTkOptionMenu(frame, variable=self.nurse_var, values=nurses)
-        nurse_menu.grid(row=len(labels)+3, column=1, padx=10, pady=6, sticky="ew")
-
-        submit_btn = ctk.CTkButton(frame, text="Admit Patient", command=self.save_admission, fg_color="#00cc99")
-        submit_btn.grid(row=len(labels)+4, column=1, pady=20, sticky="e")
+        self.choice_menus[1].configure(values=rooms, state="normal")
+        if self.room_var.get() not in rooms:
+            self.room_var.set(best or rooms[0])
 
     def save_admission(self):
         get = lambda k: (self.admission_entries[k].get() if not isinstance(self.admission_entries[k], ctk.StringVar) else self.admission_entries[k].get())
@@ -242,64 +974,67 @@ class HospitalApp(ctk.CTk):
         room_sel = self.room_var.get().strip()
         nurse_selection = self.nurse_var.get()
 
-        if not all([name, age, contact, gender, disease, blood, doctor]) or doctor == "No Doctors Available":
-            self.show_message("Validation", "Please fill all patient fields and select a doctor.")
+        patient = {"name": name, "age": age, "contact": contact, "gender": gender,
+                   "disease": disease, "blood_group": blood, "doctor": doctor}
+        error = validate_patient(patient) if doctor != "No Doctors Available" else "Please fill all patient fields and select a doctor."
+        if error:
+            self.show_message("Validation", error)
             return
 
         if room_sel == "No Rooms Available":
             self.show_message("Validation", "No rooms are available. Please add rooms first.")
             return
 
-        patient_id = "P" + str(random.randint(10000, 99999))
-        admit_date = datetime.now().strftime("%Y-%m-%d %H:%M")
-
-        cursor.execute("INSERT INTO admission (patient_id, patient_name, age, contact, gender, disease, admit_date, blood_group, doctor_name, room_no) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                       (patient_id, name, age, contact, gender, disease, admit_date, blood, doctor, room_sel))
-        conn.commit()
-
-        # Mark room as occupied
-        cursor.execute("UPDATE rooms SET status='Occupied', patient_id=? WHERE room_no=?", (patient_id, room_sel))
-        conn.commit()
+        nurse_id = None
+        if nurse_selection and nurse_selection not in (NO_NURSE, "Loading..."):
+            nurse_id = int(nurse_selection.split(":")[0])
 
-        # add a nurse to patient if selected
-        if nurse_selection and nurse_selection != "None":
-            nurse_id = nurse_selection.split(":")[0]
-            nurse_name = nurse_selection.split(": ")[1]
-            cursor.execute("INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date) VALUES (?, ?, ?, ?, ?, ?)",
-                           (patient_id, nurse_name, "Assigned on admission", "", "", admit_date))
-            conn.commit()
+        def admitted(patient_id):
+            messagebox.showinfo("Success", f"{name} admitted with Patient ID {patient_id} and Room {room_sel}.")
+            self.reset_admission_form()
+            self.show_admission_form()
 
-        messagebox.showinfo("Success", f"{name} admitted with Patient ID {patient_id} and Room {room_sel}.")
-        self.show_admission_form()
+        def failed(error):
+            if isinstance(error, NurseUnavailableError):
+                # The nurse was removed meanwhile; reload the nurse choices and keep the form
+                messagebox.showerror("Nurse removed", f"{error} Please choose another nurse.")
+                self.load_nurse_choices()
+                return
+            if not isinstance(error, RoomUnavailableError):
+                messagebox.showerror("Database error", str(error))
+                return
+            # Another terminal took the room; reload the room choices and keep the form
+            messagebox.showerror("Room taken", f"{error} Please choose another room.")
+            self.load_room_choices()
+        self.write_db(admit_patient, patient, room_sel, nurse_id, on_done=admitted, on_error=failed)
 
     # ---------------------- Admitted Patients ----------------------
     def show_admitted_patients(self):
-        self.clear_main()
-        frame = ctk.CTkFrame(self.main_area)
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
-        self.current_widgets.append(frame)
+        self.show_view("admitted", self.build_admitted_patients, padx=10, pady=10)
 
-        ctk.CTkLabel(frame, text="Admitted Patients", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=10)
-
-        list_frame = ctk.CTkFrame(frame)
-        list_frame.pack(fill="both", expand=True, padx=20, pady=10)
-        self.current_widgets.append(list_frame)
+    def build_admitted_patients(self, frame):
+        ctk.CTkLabel(frame, text="Admitted Patients", font=font(20, "bold")).pack(pady=10)
 
-        cursor.execute("SELECT patient_id, patient_name, disease, doctor_name, room_no FROM admission ORDER BY patient_name")
-        rows = cursor.fetchall()
+        source = admitted_patients_source()
 
-        if not rows:
-            ctk.CTkLabel(list_frame, text="No admitted patients.").pack(pady=10)
-            return
+        def make_row(parent):
+            item = ctk.CTkFrame(parent, corner_radius=8)
+            item.label = ctk.CTkLabel(item, text="", font=font(16))
+            item.label.pack(side="left", padx=12, pady=10)
+            item.button = ctk.CTkButton(item, text="View Details")
+            item.button.pack(side="right", padx=12, pady=8)
+            return item
 
-        for r in rows:
+        def fill_row(item, r):
             pid, name, disease, doctor, roomno = r
-            item = ctk.CTkFrame(list_frame, corner_radius=8)
-            item.pack(fill="x", pady=6)
-            self.current_widgets.append(item)
+            item.label.configure(text=f"{name}  |  {disease}  |  Room: {roomno}")
+            item.button.configure(command=lambda p=pid: self.view_patient_details(p))
 
-            ctk.CTkLabel(item, text=f"{name}  |  {disease}  |  Room: {roomno}", font=ctk.CTkFont(size=16)).pack(side="left", padx=12, pady=10)
-            ctk.CTkButton(item, text="View Details", command=lambda p=pid: self.view_patient_details(p)).pack(side="right", padx=12, pady=8)
+        list_frame = VirtualList(frame, source, make_row, fill_row, self.run_db, empty_text="No admitted patients.")
+        list_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        frame.lists = [list_frame]
+        # Re-read the visible window; rows whose data is unchanged are left alone
+        return list_frame.reload
 
     def view_patient_details(self, patient_id):
         self.clear_main()
@@ -307,30 +1042,35 @@ class HospitalApp(ctk.CTk):
         frame.pack(fill="both", expand=True, padx=20, pady=20)
         self.current_widgets.append(frame)
 
-        ctk.CTkLabel(frame, text="Patient Details", font=ctk.CTkFont(size=22, weight="bold")).pack(pady=10)
+        ctk.CTkLabel(frame, text="Patient Details", font=font(22, "bold")).pack(pady=10)
+        loading = self.loading_label(frame)
 
-        cursor.execute("SELECT patient_id, patient_name, age, contact, gender, disease, admit_date, blood_group, doctor_name, room_no FROM admission WHERE patient_id=?", (patient_id,))
-        data = cursor.fetchone()
-        if not data:
-            self.show_message("Not found", "Patient record not found.")
-            return
+        def loaded(result):
+            loading.destroy()
+            data, summary, notes = result
+            if not data:
+                self.show_message("Not found", "Patient record not found.")
+                return
+            self.fill_patient_details(frame, data, summary, notes)
+        self.run_db(patient_details, patient_id, on_done=loaded)
 
+    def fill_patient_details(self, frame, data, summary, notes):
         pid, name, age, contact, gender, disease, admit_date, blood_group, doctor, roomno = data
 
         info = ctk.CTkFrame(frame)
         info.pack(fill="x", padx=10, pady=8)
         self.current_widgets.append(info)
 
-        ctk.CTkLabel(info, text=f"Patient ID: {pid}", font=ctk.CTkFont(size=14)).grid(row=0, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Name: {name}", font=ctk.CTkFont(size=14)).grid(row=1, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Age: {age}", font=ctk.CTkFont(size=14)).grid(row=2, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Contact: {contact}", font=ctk.CTkFont(size=14)).grid(row=3, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Gender: {gender}", font=ctk.CTkFont(size=14)).grid(row=4, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Disease: {disease}", font=ctk.CTkFont(size=14)).grid(row=5, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Admit Date: {admit_date}", font=ctk.CTkFont(size=14)).grid(row=6, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Blood Group: {blood_group}", font=ctk.CTkFont(size=14)).grid(row=7, column=0, sticky="w", padx=8, pady=4)
-        ctk.CTkLabel(info, text=f"Doctor Name: {doctor}", font=ctk.CTkFont(size=14, weight="bold"), text_color="#00ffcc").grid(row=8, column=0, sticky="w", padx=8, pady=8)
-        ctk.CTkLabel(info, text=f"Room No: {roomno}", font=ctk.CTkFont(size=14, weight="bold"), text_color="#00ffcc").grid(row=9, column=0, sticky="w", padx=8, pady=8)
+        ctk.CTkLabel(info, text=f"Patient ID: {pid}", font=font(14)).grid(row=0, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Name: {name}", font=font(14)).grid(row=1, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Age: {age}", font=font(14)).grid(row=2, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Contact: {contact}", font=font(14)).grid(row=3, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Gender: {gender}", font=font(14)).grid(row=4, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Disease: {disease}", font=font(14)).grid(row=5, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Admit Date: {admit_date}", font=font(14)).grid(row=6, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Blood Group: {blood_group}", font=font(14)).grid(row=7, column=0, sticky="w", padx=8, pady=4)
+        ctk.CTkLabel(info, text=f"Doctor Name: {doctor}", font=font(14, "bold"), text_color="#00ffcc").grid(row=8, column=0, sticky="w", padx=8, pady=8)
+        ctk.CTkLabel(info, text=f"Room No: {roomno}", font=font(14, "bold"), text_color="#00ffcc").grid(row=9, column=0, sticky="w", padx=8, pady=8)
 
         # Discharge / Delete buttons
         btn_frame = ctk.CTkFrame(frame)
@@ -340,96 +1080,100 @@ class HospitalApp(ctk.CTk):
         ctk.CTkButton(btn_frame, text="Discharge Patient", fg_color="#ff884d", command=lambda: self.discharge_patient(pid)).pack(side="left", padx=8)
         ctk.CTkButton(btn_frame, text="Delete Record", fg_color="#ff4444", command=lambda: self.delete_admission(pid)).pack(side="left", padx=8)
 
-        # Nurse details
-        ctk.CTkLabel(frame, text="Assigned / Nurse Records", font=ctk.CTkFont(size=18, weight="bold")).pack(pady=10)
-        n_frame = ctk.CTkFrame(frame)
-        n_frame.pack(fill="both", expand=True, padx=10, pady=8)
-        self.current_widgets.append(n_frame)
-
-        cursor.execute("SELECT nurse_name, nurse_notes, shift, prescription, date FROM nurse_treatment WHERE patient_id=? ORDER BY date DESC", (patient_id,))
-        notes = cursor.fetchall()
-
-        if not notes:
-            ctk.CTkLabel(n_frame, text="No nurse records found.").pack(pady=10)
+        # Nurse details: a summary from the whole history, then the records newest first,
+        # one page at a time
+        count, last_shift, last_date, prescriptions = summary
+        ctk.CTkLabel(frame, text="Assigned / Nurse Records", font=font(18, "bold")).pack(pady=(10, 2))
+        if count:
+            header = f"{count} records  |  Last shift: {last_shift or '-'} ({last_date})\nActive prescriptions: {', '.join(prescriptions) or 'none'}"
         else:
-            for rec in notes:
-                nurse_name, nurse_notes, shift, prescription, date = rec
-                box = ctk.CTkFrame(n_frame, corner_radius=8)
-                box.pack(fill="x", pady=6, padx=6)
-                self.current_widgets.append(box)
+            header = "No nurse records found."
+        ctk.CTkLabel(frame, text=header, justify="left").pack(pady=(0, 6))
+        if not count:
+            return
 
-                ctk.CTkLabel(box, text=f"Nurse: {nurse_name}  |  Shift: {shift}  |  Date: {date}", font=ctk.CTkFont(size=13, weight="bold")).pack(anchor="w", padx=8, pady=6)
-                ctk.CTkLabel(box, text=f"Notes: {nurse_notes}").pack(anchor="w", padx=8, pady=2)
-                ctk.CTkLabel(box, text=f"Prescription: {prescription}").pack(anchor="w", padx=8, pady=2)
+        n_frame = ctk.CTkScrollableFrame(frame)
+        n_frame.pack(fill="both", expand=True, padx=10, pady=8)
+        self.current_widgets.append(n_frame)
+        source = nurse_history_source(pid)
+        shown = [0]
+        more = ctk.CTkButton(n_frame, text="Load more", width=140)
+
+        def add_page(rows):
+            more.pack_forget()
+            for nurse_id, nurse_name, nurse_notes, shift, prescription, date in rows:
+                ctk.CTkLabel(n_frame, justify="left", anchor="w", wraplength=700,
+                             text=f"{date}  |  {nurse_name}  |  Shift: {shift}\nNotes: {nurse_notes}\nPrescription: {prescription}"
+                             ).pack(fill="x", padx=8, pady=4)
+            shown[0] += len(rows)
+            if rows and shown[0] < count:
+                more.configure(text=f"Load more ({count - shown[0]} older)", state="normal",
+                               command=lambda key=source.key(rows[-1]): load_more(key))
+                more.pack(pady=8)
+
+        def load_more(key):
+            more.configure(state="disabled", text="Loading...")
+            self.run_db(source.after, key, NURSE_HISTORY_PAGE, on_done=add_page)
+
+        add_page(notes)
 
     # ---------------------- Discharge / Delete ----------------------
     def discharge_patient(self, patient_id):
-        # Free room if assigned
-        cursor.execute("SELECT room_no FROM admission WHERE patient_id=?", (patient_id,))
-        row = cursor.fetchone()
-        if row and row[0]:
-            room = row[0]
-            cursor.execute("UPDATE rooms SET status='Available', patient_id=NULL WHERE room_no=?", (room,))
-
-        # Delete admission record
-        cursor.execute("DELETE FROM admission WHERE patient_id=?", (patient_id,))
-        conn.commit()
-        messagebox.showinfo("Discharged", f"Patient {patient_id} discharged and room freed.")
-        self.show_admitted_patients()
+        def done(bill):
+            if bill:
+                messagebox.showinfo("Discharged", f"Patient {patient_id} discharged and room freed.\nFinal bill: Rs {bill['total']}")
+            self.show_admitted_patients()
+        self.write_db(discharge_admission, patient_id, on_done=done)
 
     def delete_admission(self, patient_id):
-        # Same as discharge but with different message
-        cursor.execute("SELECT room_no FROM admission WHERE patient_id=?", (patient_id,))
-        row = cursor.fetchone()
-        if row and row[0]:
-            room = row[0]
-            cursor.execute("UPDATE rooms SET status='Available', patient_id=NULL WHERE room_no=?", (room,))
-        cursor.execute("DELETE FROM admission WHERE patient_id=?", (patient_id,))
-        conn.commit()
-        messagebox.showinfo("Deleted", f"Admission record for {patient_id} deleted.")
-        self.show_admitted_patients()
+        # For a record entered by mistake: frees the room like discharge, but archives nothing
+        def done(_):
+            messagebox.showinfo("Deleted", f"Admission record for {patient_id} deleted.")
+            self.show_admitted_patients()
+        self.write_db(release_admission, patient_id, on_done=done)
 
     # ---------------------- Room Availability Page ----------------------
     def show_room_availability(self):
-        self.clear_main()
-        frame = ctk.CTkFrame(self.main_area)
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
-        self.current_widgets.append(frame)
+        self.show_view("rooms", self.build_room_availability, padx=10, pady=10)
 
-        ctk.CTkLabel(frame, text="Room Availability", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=10)
+    def build_room_availability(self, frame):
+        ctk.CTkLabel(frame, text="Room Availability", font=font(20, "bold")).pack(pady=10)
 
         top = ctk.CTkFrame(frame)
         top.pack(fill="x", padx=10, pady=6)
-        self.current_widgets.append(top)
 
         ctk.CTkButton(top, text="Add Room", command=self.add_room_dialog).pack(side="right", padx=8)
 
         # Room list
-        list_frame = ctk.CTkFrame(frame)
-        list_frame.pack(fill="both", expand=True, padx=10, pady=8)
-        self.current_widgets.append(list_frame)
-
-        cursor.execute("SELECT room_no, type, status, patient_id FROM rooms ORDER BY room_no")
-        rooms = cursor.fetchall()
-
-        if not rooms:
-            ctk.CTkLabel(list_frame, text="No rooms configured.").pack(pady=10)
-            return
-
-        for r in rooms:
+        def make_row(parent):
+            row = ctk.CTkFrame(parent)
+            row.label = ctk.CTkLabel(row, text="")
+            row.label.pack(side="left", padx=8)
+            row.edit_btn = ctk.CTkButton(row, text="Edit", width=80)
+            row.edit_btn.pack(side="right", padx=6)
+            row.delete_btn = ctk.CTkButton(row, text="Delete", width=80, fg_color="#ff4444")
+            row.delete_btn.pack(side="right", padx=6)
+            return row
+
+        def fill_row(row, r):
             room_no, rtype, status, patient_id = r
-            row = ctk.CTkFrame(list_frame)
-            row.pack(fill="x", padx=8, pady=4)
-            ctk.CTkLabel(row, text=f"Room {room_no}  |  {rtype}  |  {status}").pack(side="left", padx=8)
-            ctk.CTkButton(row, text="Edit", width=80, command=lambda rn=room_no: self.edit_room_dialog(rn)).pack(side="right", padx=6)
-            ctk.CTkButton(row, text="Delete", width=80, fg_color="#ff4444", command=lambda rn=room_no: self.delete_room(rn)).pack(side="right", padx=6)
+            row.label.configure(text=f"Room {room_no}  |  {rtype}  |  {status}")
+            row.edit_btn.configure(command=lambda rn=room_no: self.edit_room_dialog(rn))
+            row.delete_btn.configure(command=lambda rn=room_no: self.delete_room(rn))
+
+        source = rooms_source()
+        list_frame = VirtualList(frame, source, make_row, fill_row, self.run_db, empty_text="No rooms configured.",
+                                 row_height=44, row_pack={"fill": "x", "padx": 8, "pady": 4})
+        list_frame.pack(fill="both", expand=True, padx=10, pady=8)
+        frame.lists = [list_frame]
+        return list_frame.reload
 
     def add_room_dialog(self):
         dialog = ctk.CTkToplevel(self)
         dialog.title("Add Room")
         dialog.geometry("400x240")
 
-        ctk.CTkLabel(dialog, text="New Room", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
+        ctk.CTkLabel(dialog, text="New Room", font=font(16, "bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
         ctk.CTkLabel(dialog, text="Room No").grid(row=1, column=0, sticky="w", padx=12, pady=6)
         rn = ctk.CTkEntry(dialog)
         rn.grid(row=1, column=1, padx=12, pady=6)
@@ -438,25 +1182,25 @@ class HospitalApp(ctk.CTk):
         tp.grid(row=2, column=1, padx=12, pady=6)
         ctk.CTkLabel(dialog, text="Status").grid(row=3, column=0, sticky="w", padx=12, pady=6)
         st_var = ctk.StringVar(value="Available")
-        ctk.CTkOptionMenu(dialog, variable=st_var, values=["Available", "Occupied", "Cleaning"]).grid(row=3, column=1, padx=12, pady=6)
+        ctk.CTkOptionMenu(dialog, variable=st_var, values=ROOM_STATUSES).grid(row=3, column=1, padx=12, pady=6)
 
         def save():
             room_no = rn.get().strip()
             typ = tp.get().strip() or "General"
             status = st_var.get()
-            if not room_no:
-                messagebox.showerror("Validation", "Room number required")
+            error = validate_room(room_no, status)
+            if error:
+                messagebox.showerror("Validation", error)
                 return
-            cursor.execute("INSERT OR REPLACE INTO rooms (room_no, type, status, patient_id) VALUES (?, ?, ?, NULL)", (room_no, typ, status))
-            conn.commit()
             dialog.destroy()
-            self.show_room_availability()
+            self.write_db(add_room, room_no, typ, status, on_done=lambda _: self.show_room_availability())
 
         ctk.CTkButton(dialog, text="Save Room", command=save, fg_color="#00cc66").grid(row=4, column=1, padx=12, pady=12, sticky="e")
 
     def edit_room_dialog(self, room_no):
-        cursor.execute("SELECT room_no, type, status, patient_id FROM rooms WHERE room_no=?", (room_no,))
-        rec = cursor.fetchone()
+        self.run_db(get_room, room_no, on_done=self.open_edit_room_dialog)
+
+    def open_edit_room_dialog(self, rec):
         if not rec:
             self.show_message("Not found", "Room not found")
             return
@@ -466,7 +1210,7 @@ class HospitalApp(ctk.CTk):
         dialog.title(f"Edit Room {rn}")
         dialog.geometry("420x240")
 
-        ctk.CTkLabel(dialog, text=f"Edit Room {rn}", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
+        ctk.CTkLabel(dialog, text=f"Edit Room {rn}", font=font(16, "bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
         ctk.CTkLabel(dialog, text="Type").grid(row=1, column=0, sticky="w", padx=12, pady=6)
         tp = ctk.CTkEntry(dialog)
         tp.insert(0, rtype or "")
@@ -478,99 +1222,104 @@ class HospitalApp(ctk.CTk):
         def save():
             new_type = tp.get().strip() or "General"
             new_status = st_var.get()
-            # If making available, clear patient_id
-            if new_status == 'Available':
-                cursor.execute("UPDATE rooms SET type=?, status=?, patient_id=NULL WHERE room_no=?", (new_type, new_status, rn))
-            else:
-                cursor.execute("UPDATE rooms SET type=?, status=? WHERE room_no=?", (new_type, new_status, rn))
-            conn.commit()
             dialog.destroy()
-            self.show_room_availability()
+            self.write_db(update_room, rn, new_type, new_status, on_done=lambda _: self.show_room_availability())
 
         ctk.CTkButton(dialog, text="Save Changes", command=save, fg_color="#00cc66").grid(row=3, column=1, padx=12, pady=12, sticky="e")
 
     def delete_room(self, room_no):
-        # prevent deleting occupied room
-        cursor.execute("SELECT status FROM rooms WHERE room_no=?", (room_no,))
-        r = cursor.fetchone()
-        if r and r[0] == 'Occupied':
+        # prevent deleting occupied room (checked again when deleting, in case it changed meanwhile)
+        def occupied():
             messagebox.showerror("Cannot delete", "Room is occupied. Free it before deleting.")
-            return
-        if not messagebox.askyesno("Confirm", "Delete this room? This is permanent."):
-            return
-        cursor.execute("DELETE FROM rooms WHERE room_no=?", (room_no,))
-        conn.commit()
-        self.show_room_availability()
+
+        def checked(status):
+            if status == 'Occupied':
+                occupied()
+                return
+            if not messagebox.askyesno("Confirm", "Delete this room? This is permanent."):
+                return
+            self.write_db(remove_room, room_no, on_done=lambda deleted: self.show_room_availability() if deleted else occupied())
+        self.run_db(room_status, room_no, on_done=checked)
 
     # ---------------------- STAFF MANAGEMENT PAGE ----------------------
     def show_staff_page(self):
-        self.clear_main()
-        frame = ctk.CTkFrame(self.main_area)
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
-        self.current_widgets.append(frame)
+        self.show_view("staff", self.build_staff_page, padx=10, pady=10)
 
-        ctk.CTkLabel(frame, text="Staff Management", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=8)
+    def build_staff_page(self, frame):
+        ctk.CTkLabel(frame, text="Staff Management", font=font(20, "bold")).pack(pady=8)
 
         top_frame = ctk.CTkFrame(frame)
         top_frame.pack(fill="x", padx=12, pady=6)
-        self.current_widgets.append(top_frame)
 
         # Search
         search_var = ctk.StringVar()
-        ctk.CTkEntry(top_frame, placeholder_text="Search staff by name...", textvariable=search_var).grid(row=0, column=0, padx=6, pady=6, sticky="ew")
+        ctk.CTkEntry(top_frame, placeholder_text="Search staff by name, specialization, contact or shift...", textvariable=search_var).grid(row=0, column=0, padx=6, pady=6, sticky="ew")
         top_frame.grid_columnconfigure(0, weight=1)
 
         ctk.CTkButton(top_frame, text="Add Doctor", command=self.add_doctor_dialog).grid(row=0, column=1, padx=6, pady=6)
         ctk.CTkButton(top_frame, text="Add Nurse", command=self.add_nurse_dialog).grid(row=0, column=2, padx=6, pady=6)
 
-        # Staff list area
-        list_area = ctk.CTkFrame(frame)
-        list_area.pack(fill="both", expand=True, padx=12, pady=8)
-        self.current_widgets.append(list_area)
+        # Staff lists: one recycled row pool per list, re-filled in place as the search changes
+        doctor_cols = ["id", "name", "specialization", "contact", "shift", "photo_path"]
+        nurse_cols = ["id", "name", "contact", "shift", "photo_path"]
+
+        def make_row(parent):
+            row = ctk.CTkFrame(parent)
+            row.photo = ctk.CTkLabel(row, text="", width=THUMB_SIZE, height=THUMB_SIZE)
+            row.photo.pack(side="left", padx=(6, 0))
+            row.photo_path = None
+            row.label = ctk.CTkLabel(row, text="")
+            row.label.pack(side="left", padx=6)
+            row.edit_btn = ctk.CTkButton(row, text="Edit", width=80)
+            row.edit_btn.pack(side="right", padx=6)
+            row.delete_btn = ctk.CTkButton(row, text="Delete", width=80, fg_color="#ff4444")
+            row.delete_btn.pack(side="right", padx=6)
+            return row
+
+        def fill_doctor(row, d):
+            did, name, spec, contact, shift, photo = d
+            row.label.configure(text=f"{name} ({spec})   |   Shift: {shift}   |   Contact: {contact}")
+            self.show_photo(row, photo)
+            row.edit_btn.configure(command=lambda id=did: self.edit_doctor_dialog(id))
+            row.delete_btn.configure(command=lambda id=did: self.delete_doctor(id))
+
+        def fill_nurse(row, n):
+            nid, name, contact, shift, photo = n
+            row.label.configure(text=f"{name}   |   Shift: {shift}   |   Contact: {contact}")
+            self.show_photo(row, photo)
+            row.edit_btn.configure(command=lambda id=nid: self.edit_nurse_dialog(id))
+            row.delete_btn.configure(command=lambda id=nid: self.delete_nurse(id))
+
+        row_pack = {"fill": "x", "padx": 12, "pady": 4}
+        ctk.CTkLabel(frame, text="Doctors:", font=font(16, "bold")).pack(anchor="w", padx=20, pady=(6, 2))
+        doctor_list = VirtualList(frame, staff_search_source("doctors", doctor_cols, ""), make_row, fill_doctor, self.run_db,
+                                  empty_text="No doctors found.", pool_size=8, row_height=44, row_pack=row_pack)
+        doctor_list.pack(fill="both", expand=True, padx=12, pady=4)
+
+        ctk.CTkLabel(frame, text="Nurses:", font=font(16, "bold")).pack(anchor="w", padx=20, pady=(12, 2))
+        nurse_list = VirtualList(frame, staff_search_source("nurses", nurse_cols, ""), make_row, fill_nurse, self.run_db,
+                                 empty_text="No nurses found.", pool_size=8, row_height=44, row_pack=row_pack)
+        nurse_list.pack(fill="both", expand=True, padx=12, pady=4)
+        frame.lists = [doctor_list, nurse_list]
 
-        # populate
         def refresh_list(filter_text=""):
-            for w in list_area.winfo_children():
-                w.destroy()
+            doctor_list.set_source(staff_search_source("doctors", doctor_cols, filter_text))
+            nurse_list.set_source(staff_search_source("nurses", nurse_cols, filter_text))
 
-            # Doctors
-            ctk.CTkLabel(list_area, text="Doctors:", font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=8, pady=(6, 2))
-            cursor.execute("SELECT id, name, specialization, contact, shift, photo_path FROM doctors WHERE name LIKE ? ORDER BY name", ('%'+filter_text+'%',))
-            docs = cursor.fetchall()
+        # wire search, debounced so a burst of keystrokes runs a single query
+        pending = {"job": None}
+        def run_search():
+            pending["job"] = None
+            if doctor_list.winfo_exists():
+                refresh_list(search_var.get().strip())
 
-            if not docs:
-                ctk.CTkLabel(list_area, text="No doctors found.").pack(anchor="w", padx=20)
-            else:
-                for d in docs:
-                    did, name, spec, contact, shift, photo = d
-                    row = ctk.CTkFrame(list_area)
-                    row.pack(fill="x", padx=12, pady=4)
-                    ctk.CTkLabel(row, text=f"{name} ({spec})   |   Shift: {shift}   |   Contact: {contact}").pack(side="left", padx=6)
-                    ctk.CTkButton(row, text="Edit", width=80, command=lambda id=did: self.edit_doctor_dialog(id)).pack(side="right", padx=6)
-                    ctk.CTkButton(row, text="Delete", width=80, fg_color="#ff4444", command=lambda id=did: self.delete_doctor(id)).pack(side="right", padx=6)
-
-            # Nurses
-            ctk.CTkLabel(list_area, text="Nurses:", font=ctk.CTkFont(size=16, weight="bold")).pack(anchor="w", padx=8, pady=(12, 2))
-            cursor.execute("SELECT id, name, contact, shift, photo_path FROM nurses WHERE name LIKE ? ORDER BY name", ('%'+filter_text+'%',))
-            nurs = cursor.fetchall()
-
-            if not nurs:
-                ctk.CTkLabel(list_area, text="No nurses found.").pack(anchor="w", padx=20)
-            else:
-                for n in nurs:
-                    nid, name, contact, shift, photo = n
-                    row = ctk.CTkFrame(list_area)
-                    row.pack(fill="x", padx=12, pady=4)
-                    ctk.CTkLabel(row, text=f"{name}   |   Shift: {shift}   |   Contact: {contact}").pack(side="left", padx=6)
-                    ctk.CTkButton(row, text="Edit", width=80, command=lambda id=nid: self.edit_nurse_dialog(id)).pack(side="right", padx=6)
-                    ctk.CTkButton(row, text="Delete", width=80, fg_color="#ff4444", command=lambda id=nid: self.delete_nurse(id)).pack(side="right", padx=6)
-
-        # wire search
         def on_search_change(var, index, mode):
-            refresh_list(search_var.get().strip())
+            if pending["job"] is not None:
+                self.after_cancel(pending["job"])
+            pending["job"] = self.after(SEARCH_DEBOUNCE_MS, run_search)
         search_var.trace_add('write', on_search_change)
 
-        refresh_list("")
+        return lambda: refresh_list(search_var.get().strip())
 
     # ---------------------- Doctor CRUD ----------------------
     def add_doctor_dialog(self):
@@ -578,7 +1327,7 @@ class HospitalApp(ctk.CTk):
         dialog.title("Add Doctor")
         dialog.geometry("420x380")
 
-        ctk.CTkLabel(dialog, text="Doctor Details", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
+        ctk.CTkLabel(dialog, text="Doctor Details", font=font(16, "bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
 
         labels = ["Name", "Specialization", "Contact", "Shift"]
         entries = {}
@@ -601,21 +1350,22 @@ class HospitalApp(ctk.CTk):
             spec = entries['Specialization'].get().strip()
             contact = entries['Contact'].get().strip()
             shift = entries['Shift'].get().strip()
-            p = photo_path.get()
-            if not name:
-                messagebox.showerror("Validation", "Doctor name is required.")
+            error = validate_doctor(name)
+            if error:
+                messagebox.showerror("Validation", error)
+                return
+            p = self.store_photo(photo_path.get())
+            if p is None:
                 return
-            cursor.execute("INSERT INTO doctors (name, specialization, contact, shift, photo_path) VALUES (?, ?, ?, ?, ?)",
-                           (name, spec, contact, shift, p))
-            conn.commit()
             dialog.destroy()
-            self.show_staff_page()
+            self.write_db(add_doctor, name, spec, contact, shift, p, on_done=lambda _: self.show_staff_page())
 
         ctk.CTkButton(dialog, text="Save Doctor", command=save, fg_color="#00cc66").grid(row=6, column=1, padx=12, pady=12, sticky="e")
 
     def edit_doctor_dialog(self, doctor_id):
-        cursor.execute("SELECT name, specialization, contact, shift, photo_path FROM doctors WHERE id=?", (doctor_id,))
-        rec = cursor.fetchone()
+        self.run_db(get_doctor, doctor_id, on_done=lambda rec: self.open_edit_doctor_dialog(doctor_id, rec))
+
+    def open_edit_doctor_dialog(self, doctor_id, rec):
         if not rec:
             self.show_message("Not found", "Doctor not found.")
             return
@@ -625,7 +1375,7 @@ class HospitalApp(ctk.CTk):
         dialog.title("Edit Doctor")
         dialog.geometry("420x380")
 
-        ctk.CTkLabel(dialog, text=f"Edit: {name0}", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
+        ctk.CTkLabel(dialog, text=f"Edit: {name0}", font=font(16, "bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
 
         labels = ["Name", "Specialization", "Contact", "Shift"]
         entries = {}
@@ -650,15 +1400,15 @@ class HospitalApp(ctk.CTk):
             spec = entries['Specialization'].get().strip()
             contact = entries['Contact'].get().strip()
             shift = entries['Shift'].get().strip()
-            p = photo_path.get()
-            if not name:
-                messagebox.showerror("Validation", "Doctor name is required.")
+            error = validate_doctor(name)
+            if error:
+                messagebox.showerror("Validation", error)
+                return
+            p = self.store_photo(photo_path.get())
+            if p is None:
                 return
-            cursor.execute("UPDATE doctors SET name=?, specialization=?, contact=?, shift=?, photo_path=? WHERE id=?",
-                           (name, spec, contact, shift, p, doctor_id))
-            conn.commit()
             dialog.destroy()
-            self.show_staff_page()
+            self.write_db(update_doctor, doctor_id, name, spec, contact, shift, p, on_done=lambda _: self.show_staff_page())
 
         ctk.CTkButton(dialog, text="Save Changes", command=save, fg_color="#00cc66").grid(row=6, column=1, padx=12, pady=12, sticky="e")
 
@@ -666,9 +1416,7 @@ class HospitalApp(ctk.CTk):
         if not messagebox.askyesno("Confirm", "Delete this doctor? This action cannot be undone."):
             return
         # Optional: prevent deleting if doctor assigned to admissions. For now we delete but you can add a check.
-        cursor.execute("DELETE FROM doctors WHERE id=?", (doctor_id,))
-        conn.commit()
-        self.show_staff_page()
+        self.write_db(remove_doctor, doctor_id, on_done=lambda _: self.show_staff_page())
 
     # ---------------------- Nurse CRUD ----------------------
     def add_nurse_dialog(self):
@@ -676,7 +1424,7 @@ class HospitalApp(ctk.CTk):
         dialog.title("Add Nurse")
         dialog.geometry("420x320")
 
-        ctk.CTkLabel(dialog, text="Nurse Details", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
+        ctk.CTkLabel(dialog, text="Nurse Details", font=font(16, "bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
 
         labels = ["Name", "Contact", "Shift"]
         entries = {}
@@ -698,21 +1446,22 @@ class HospitalApp(ctk.CTk):
             name = entries['Name'].get().strip()
             contact = entries['Contact'].get().strip()
             shift = entries['Shift'].get().strip()
-            p = photo_path.get()
-            if not name:
-                messagebox.showerror("Validation", "Nurse name is required.")
+            error = validate_nurse(name)
+            if error:
+                messagebox.showerror("Validation", error)
+                return
+            p = self.store_photo(photo_path.get())
+            if p is None:
                 return
-            cursor.execute("INSERT INTO nurses (name, contact, shift, photo_path) VALUES (?, ?, ?, ?)",
-                           (name, contact, shift, p))
-            conn.commit()
             dialog.destroy()
-            self.show_staff_page()
+            self.write_db(add_nurse, name, contact, shift, p, on_done=lambda _: self.show_staff_page())
 
         ctk.CTkButton(dialog, text="Save Nurse", command=save, fg_color="#00cc66").grid(row=5, column=1, padx=12, pady=12, sticky="e")
 
     def edit_nurse_dialog(self, nurse_id):
-        cursor.execute("SELECT name, contact, shift, photo_path FROM nurses WHERE id=?", (nurse_id,))
-        rec = cursor.fetchone()
+        self.run_db(get_nurse, nurse_id, on_done=lambda rec: self.open_edit_nurse_dialog(nurse_id, rec))
+
+    def open_edit_nurse_dialog(self, nurse_id, rec):
         if not rec:
             self.show_message("Not found", "Nurse not found.")
             return
@@ -722,7 +1471,7 @@ class HospitalApp(ctk.CTk):
         dialog.title("Edit Nurse")
         dialog.geometry("420x320")
 
-        ctk.CTkLabel(dialog, text=f"Edit: {name0}", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
+        ctk.CTkLabel(dialog, text=f"Edit: {name0}", font=font(16, "bold")).grid(row=0, column=0, columnspan=2, padx=12, pady=12)
 
         labels = ["Name", "Contact", "Shift"]
         entries = {}
@@ -746,47 +1495,47 @@ class HospitalApp(ctk.CTk):
             name = entries['Name'].get().strip()
             contact = entries['Contact'].get().strip()
             shift = entries['Shift'].get().strip()
-            p = photo_path.get()
-            if not name:
-                messagebox.showerror("Validation", "Nurse name is required.")
+            error = validate_nurse(name)
+            if error:
+                messagebox.showerror("Validation", error)
+                return
+            p = self.store_photo(photo_path.get())
+            if p is None:
                 return
-            cursor.execute("UPDATE nurses SET name=?, contact=?, shift=?, photo_path=? WHERE id=?",
-                           (name, contact, shift, p, nurse_id))
-            conn.commit()
             dialog.destroy()
-            self.show_staff_page()
+            self.write_db(update_nurse, nurse_id, name, contact, shift, p, on_done=lambda _: self.show_staff_page())
 
         ctk.CTkButton(dialog, text="Save Changes", command=save, fg_color="#00cc66").grid(row=5, column=1, padx=12, pady=12, sticky="e")
 
     def delete_nurse(self, nurse_id):
         if not messagebox.askyesno("Confirm", "Delete this nurse? This action cannot be undone."):
             return
-        cursor.execute("DELETE FROM nurses WHERE id=?", (nurse_id,))
-        conn.commit()
-        self.show_staff_page()
+        self.write_db(remove_nurse, nurse_id, on_done=lambda _: self.show_staff_page())
 
     # ---------------------- BILLING PAGE ----------------------
     def show_billing_page(self):
-        self.clear_main()
+        self.show_view("billing", self.build_billing_page, padx=20, pady=20)
 
-        frame = ctk.CTkFrame(self.main_area)
-        frame.pack(fill="both", expand=True, padx=20, pady=20)
-        self.current_widgets.append(frame)
-
-        ctk.CTkLabel(frame, text="Billing System",font=ctk.CTkFont(size=22, weight="bold")).pack(pady=10)
+    def build_billing_page(self, frame):
+        ctk.CTkLabel(frame, text="Billing System",font=font(22, "bold")).pack(pady=10)
 
         # Patient ID input
         id_frame = ctk.CTkFrame(frame)
         id_frame.pack(pady=10)
-        ctk.CTkLabel(id_frame, text="Enter Patient ID: ").pack(side="left", padx=5)
+        ctk.CTkLabel(id_frame, text="Patient ID or name: ").pack(side="left", padx=5)
 
-        self.bill_pid = ctk.CTkEntry(id_frame, width=200)
+        def picked(patient_id):
+            self.bill_pid.delete(0, "end")
+            self.bill_pid.insert(0, patient_id)
+            self.load_billing_details()
+        self.bill_pid = PatientSearch(self, id_frame, picked, width=260, placeholder="ID, name, contact...").entry
         self.bill_pid.pack(side="left", padx=5)
 
         ctk.CTkButton(id_frame, text="Load Details", 
                   command=self.load_billing_details).pack(side="left", padx=5)
 
         # Bill output area
+        self.current_bill = None
         self.bill_box = ctk.CTkTextbox(frame, width=700, height=400)
         self.bill_box.pack(pady=20)
 
@@ -799,94 +1548,50 @@ class HospitalApp(ctk.CTk):
         self.extra_charges.grid(row=0, column=1, padx=5)
 
         ctk.CTkButton(extra_frame, text="Update Total",command=self.update_bill_total).grid(row=0, column=2, padx=10)
-
+        ctk.CTkButton(extra_frame, text="Save Bill", command=self.save_bill).grid(row=0, column=3, padx=10)
+        # Nothing to re-read on return: the bill stays on the last loaded patient
+        return None
 
     def load_billing_details(self):
-        pid = self.bill_pid.get().strip()
+        pid = normalize_patient_id(self.bill_pid.get())
         if not pid:
             messagebox.showerror("Error", "Enter Patient ID")
             return
 
-        cursor.execute("""
-            SELECT patient_name, disease, admit_date, doctor_name, room_no 
-            FROM admission WHERE patient_id=?
-        """, (pid,))
-        data = cursor.fetchone()
+        self.bill_box.delete("1.0", "end")
+        self.bill_box.insert("end", "Loading...")
+        self.run_db(patient_bill, pid, on_done=self.show_bill)
 
-        if not data:
+    def show_bill(self, bill):
+        if not bill:
+            self.bill_box.delete("1.0", "end")
             messagebox.showerror("Error", "No patient found.")
             return
+        self.current_bill = bill
+        self.bill_base_total = bill["total"]  # before extra charges, which replace each other
+        self.render_bill()
 
-        name, disease, admit, doctor, roomno = data
-
-        # Fetch room type for pricing
-        cursor.execute("SELECT type FROM rooms WHERE room_no=?", (roomno,))
-        room_type_result = cursor.fetchone()
-    
-        room_type = room_type_result[0] if room_type_result else "General"
-
-        # Room charges by type
-        pricing = {
-            "Private": 2500,
-            "Shared": 1500,
-            "ICU": 5000,
-            "General": 1000
-        }
-        room_cost = pricing.get(room_type, 1200)
-
-        doctor_fee = 700
-        nursing_fee = 400
-        service_fee = 200
-
-        total = room_cost + doctor_fee + nursing_fee + service_fee
-
-        self.current_bill = {
-            "pid": pid,
-            "name": name,
-            "disease": disease,
-            "admit": admit,
-            "doctor": doctor,
-            "roomno": roomno,
-            "room_cost": room_cost,
-            "doctor_fee": doctor_fee,
-            "nursing_fee": nursing_fee,
-            "service_fee": service_fee,
-            "total": total
-        }
-
-        self.show_bill()
-
-
-    def show_bill(self):
-        b = self.current_bill
-
-        text = f"""
-    ------------------- SAGAR CARE HOSPITAL -------------------
-
-    Patient ID     : {b['pid']}
-    Patient Name   : {b['name']}
-    Disease        : {b['disease']}
-    Doctor         : {b['doctor']}
-    Room Number    : {b['roomno']}
-    Admit Date     : {b['admit']}
-
-    ----------------------- CHARGES ---------------------------
-    Room Charge    : Rs {b['room_cost']}
-    Doctor Fee     : Rs {b['doctor_fee']}
-    Nursing Fee    : Rs {b['nursing_fee']}
-    Service Fee    : Rs {b['service_fee']}
-    -----------------------------------------------------------
-
-    Total Amount   : Rs {b['total']}
-
-    -----------------------------------------------------------
-        """
-
+    def render_bill(self):
         self.bill_box.delete("1.0", "end")
-        self.bill_box.insert("end", text)
+        self.bill_box.insert("end", format_bill(self.current_bill))
 
 
+    def save_bill(self):
+        bill = self.current_bill
+        if not bill:
+            messagebox.showerror("Error", "Load a patient's bill first.")
+            return
+        path = filedialog.asksaveasfilename(initialfile=bill_filename(bill, "pdf"), defaultextension=".pdf",
+                                            filetypes=[("PDF", "*.pdf"), ("Text", "*.txt")])
+        if not path:
+            return
+        write_atomic(path, render(bill, "txt" if path.lower().endswith(".txt") else "pdf"))
+        messagebox.showinfo("Saved", f"Bill saved to {path}")
+
     def update_bill_total(self):
+        if self.current_bill is None:
+            messagebox.showerror("Error", "Load a patient's bill first.")
+            return
         extra = self.extra_charges.get().strip()
         if not extra:
             extra_val = 0
@@ -897,12 +1602,46 @@ class HospitalApp(ctk.CTk):
                 messagebox.showerror("Error", "Extra charges must be a number")
                 return
 
-        self.current_bill["total"] += extra_val
-        self.show_bill()
+        self.current_bill["total"] = self.bill_base_total + extra_val
+        self.render_bill()
+
+    # ---------------------- Diagnostics (profiler on) ----------------------
+    def show_diagnostics(self):
+        self.show_view("diagnostics", self.build_diagnostics, padx=20, pady=20)
+
+    def build_diagnostics(self, frame):
+        ctk.CTkLabel(frame, text="Diagnostics", font=font(22, "bold")).pack(pady=10)
+        ctk.CTkLabel(frame, text="Where the time goes (sql: statements, data: database calls, "
+                                 "ui: callbacks with widgets created and layout time). Slow ones are also in the slow log.").pack()
+        box = ctk.CTkTextbox(frame, font=font(12, family="Courier"), wrap="none")
+        box.pack(fill="both", expand=True, pady=10)
+
+        def refresh():
+            box.delete("1.0", "end")
+            box.insert("end", "TOP OFFENDERS (by total time)\n" + format_top(25) +
+                       "\n\nRECENT SLOW OPERATIONS\n" + (format_slow(30) or "None yet."))
+
+        def reset():
+            profiler.reset()
+            refresh()
+
+        buttons = ctk.CTkFrame(frame, fg_color="transparent")
+        buttons.pack()
+        ctk.CTkButton(buttons, text="Refresh", command=refresh).pack(side="left", padx=6)
+        ctk.CTkButton(buttons, text="Reset", command=reset).pack(side="left", padx=6)
+        return refresh
 
 
 
 # ---------------------- START APP ----------------------
 if __name__ == "__main__":
+    if "--check-plans" in sys.argv[1:]:
+        # Kept for old scripts; the check now lives in the headless CLI
+        import hospital_cli
+        sys.exit(hospital_cli.main(["check-plans"]))
+    # SAGARCARE_PROFILE=1 times queries and callbacks, logs slow ones to slow_ops.log
+    # and adds the Diagnostics page
+    if enable_from_env():
+        install_tk()
     app = HospitalApp()
     app.mainloop()
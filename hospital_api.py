@@ -0,0 +1,407 @@
+# HTTP/JSON API over the hospital operations, so several desktop terminals (see
+# SAGARCARE_API in SagarCare.py), scripts or a web front end can share one database
+# through one server. Standard library only: asyncio serves the HTTP/1.1 connections
+# (kept alive between requests) and the hospital_core data functions run on a pool
+# of worker threads, each holding its own connection. The database is in WAL mode,
+# so the pool's readers never wait for each other or for the one writer.
+#
+# Every call is POST /api/<function> with a JSON body {"args": [...]}, answered with
+# {"result": ...}; only the functions in API_FUNCTIONS can be called. List pages are
+# POST /api/page with {"source": [name, args], "op": "after", "args": [key, limit]},
+# naming one of the sources in SOURCES (clients never send SQL). Errors answer
+# {"error": message, "type": exception class} with a 4xx/5xx status.
+#
+# Every request but GET /health must carry the shared token of SAGARCARE_API_TOKEN
+# as "Authorization: Bearer <token>"; the server reads it from the same variable
+# and answers 401 without it. With no token configured the server only listens on
+# this machine (a loopback address).
+#
+# Started by "hospital_cli.py serve"; "hospital_cli.py bench-api" measures it.
+import asyncio
+import hmac
+import http.client
+import ipaddress
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from hospital_core import (DB_PATH, STAFF_FTS, connect, RoomUnavailableError, NurseUnavailableError, staff_search_source,
+                           admitted_patients_source, rooms_source, nurse_history_source, dashboard_counts, admission_choices,
+                           room_choices, changes_since, admit_patient, admit_patients, patient_details, release_admission,
+                           discharge_admission, discharges, patient_discharges, nurse_summary, add_nurse_record, get_room, add_room, update_room, remove_room,
+                           room_status, get_doctor, add_doctor, update_doctor, remove_doctor, get_nurse,
+                           add_nurse, update_nurse, remove_nurse, nurse_by_name, patient_bill, bill_all, tariffs, set_tariff,
+                           dashboard_trends, rollup_series, occupancy_series)
+from hospital_profile import profiler
+from hospital_search import search_patients
+from hospital_forecast import occupancy_forecast
+from hospital_workload import nurse_choices, suggest_nurse, rebalance_shift
+
+API_URL_ENV = "SAGARCARE_API"
+API_TOKEN_ENV = "SAGARCARE_API_TOKEN"
+API_PORT = 8470
+WORKERS = 8
+MAX_BODY = 1 << 20
+
+API_FUNCTIONS = {fn.__name__: fn for fn in [
+    dashboard_counts, admission_choices, room_choices, changes_since, search_patients,
+    admit_patient, admit_patients, patient_details, release_admission,
+    discharge_admission, discharges, patient_discharges,
+    nurse_summary, add_nurse_record,
+    get_room, add_room, update_room, remove_room, room_status,
+    get_doctor, add_doctor, update_doctor, remove_doctor,
+    get_nurse, add_nurse, update_nurse, remove_nurse, nurse_by_name,
+    nurse_choices, suggest_nurse, rebalance_shift,
+    patient_bill, bill_all, tariffs, set_tariff,
+    dashboard_trends, rollup_series, occupancy_series, occupancy_forecast,
+]}
+
+SOURCES = {fn.__name__: fn for fn in [admitted_patients_source, rooms_source, staff_search_source, nurse_history_source]}
+PAGE_OPS = {"count", "after", "before", "at", "changed"}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_token():
+    return os.environ.get(API_TOKEN_ENV) or None
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def authorized(headers, token):
+    # Constant-time compare, so the token can't be guessed byte by byte from timings
+    if token is None:
+        return True
+    scheme, _, sent = headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(sent.strip().encode(), token.encode())
+
+
+def page_source(name, args):
+    # Rebuild a client's list source; staff searches may only pick real staff columns
+    if name not in SOURCES:
+        raise ApiError(f"Unknown list {name}", 404)
+    if name == "staff_search_source":
+        table, columns, text = args
+        if table not in STAFF_FTS or not set(columns) <= set(STAFF_FTS[table]) | {"id", "photo_path"}:
+            raise ApiError("Unknown staff table or column")
+        return staff_search_source(table, columns, str(text))
+    return SOURCES[name](*args)
+
+
+# ---------------------- SERVER ----------------------
+class ApiServer:
+    def __init__(self, db_path=DB_PATH, workers=WORKERS, token=None):
+        self.db_path = db_path
+        self.token = token
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db", initializer=self._open)
+
+    def _open(self):
+        self.local.db = connect(self.db_path)
+
+    def call(self, name, body):
+        # Runs on a pool thread, with that thread's connection
+        db = self.local.db
+        args = body.get("args", [])
+        if not isinstance(args, list):
+            raise ApiError("args must be a list")
+        try:
+            if name == "page":
+                op = body.get("op")
+                if op not in PAGE_OPS:
+                    raise ApiError(f"Unknown page operation {op}")
+                source = body.get("source") or [None, []]
+                return getattr(page_source(source[0], source[1]), op)(db, *args)
+            if profiler.enabled:
+                return profiler.call("data", name, API_FUNCTIONS[name], db, *args)
+            return API_FUNCTIONS[name](db, *args)
+        except BaseException:
+            if db.in_transaction:
+                db.rollback()
+            raise
+
+    async def respond(self, method, path, headers, body):
+        # (status, payload) for one request
+        if method == "GET" and path == "/health":
+            return 200, {"result": "ok"}
+        if not authorized(headers, self.token):
+            return 401, {"error": "Missing or wrong API token", "type": "Unauthorized"}
+        name = path[len("/api/"):] if path.startswith("/api/") else None
+        if method != "POST" or (name != "page" and name not in API_FUNCTIONS):
+            return 404, {"error": f"No such endpoint: {method} {path}", "type": "NotFound"}
+        try:
+            body = json.loads(body or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("request body must be a JSON object")
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, self.call, name, body)
+        except RoomUnavailableError as e:
+            return 409, {"error": str(e), "type": "RoomUnavailableError", "room_no": e.room_no}
+        except NurseUnavailableError as e:
+            return 409, {"error": str(e), "type": "NurseUnavailableError", "nurse_id": e.nurse_id}
+        except ApiError as e:
+            return e.status, {"error": str(e), "type": "ApiError"}
+        except (ValueError, TypeError, KeyError, IndexError) as e:
+            # Bad JSON, or arguments that don't fit the function
+            return 400, {"error": str(e), "type": type(e).__name__}
+        except Exception as e:
+            # Database errors (e.g. locked for too long), or a bug
+            return 500, {"error": str(e), "type": type(e).__name__}
+        return 200, {"result": result}
+
+    async def handle(self, reader, writer):
+        # One client connection: requests are answered in order until it closes
+        try:
+            while True:
+                request = await read_message(reader, request=True)
+                if request is None:
+                    break
+                (method, path), headers, body = request
+                status, payload = await self.respond(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(encode_message(f"HTTP/1.1 {status} {http.client.responses.get(status, '')}",
+                                            json.dumps(payload).encode(), keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ApiError as e:
+            writer.write(encode_message(f"HTTP/1.1 {e.status} Bad Request",
+                                        json.dumps({"error": str(e), "type": "ApiError"}).encode(), False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, started=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if started:
+            started(server)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def read_header_lines(lines):
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+async def read_message(reader, request):
+    # ((method, path) or status, headers, body) of the next HTTP message, or None at EOF
+    try:
+        start = await reader.readline()
+        if not start:
+            return None
+        lines = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            lines.append(line.decode("latin-1"))
+    except ValueError:
+        raise ApiError("Header line too long", 431) from None
+    headers = read_header_lines(lines)
+    parts = start.decode("latin-1").split()
+    if len(parts) < 2:
+        raise ApiError("Malformed start line")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise ApiError("Bad Content-Length") from None
+    if length > MAX_BODY:
+        raise ApiError("Request body too large", 413)
+    body = await reader.readexactly(length) if length else b""
+    first = (parts[0], parts[1].split("?")[0]) if request else int(parts[1])
+    return first, headers, body
+
+
+def encode_message(start, body, keep_alive=True, content_type="application/json"):
+    return (f"{start}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + body
+
+
+def serve(db_path=DB_PATH, host="127.0.0.1", port=API_PORT, workers=WORKERS):
+    token = api_token()
+    if token is None and not is_loopback(host):
+        raise RuntimeError(f"Set {API_TOKEN_ENV} to serve on {host}; without a token only loopback addresses are allowed")
+    server = ApiServer(db_path, workers, token)
+    started = lambda s: print(f"Serving {db_path} on http://{host}:{s.sockets[0].getsockname()[1]} "
+                              f"with {workers} connections", flush=True)
+    try:
+        asyncio.run(server.serve(host, port, started))
+    finally:
+        server.close()
+
+
+# ---------------------- CLIENT ----------------------
+class ApiClient:
+    # Blocking client on one keep-alive connection, for one thread at a time (the
+    # desktop app's executor thread). Errors come back as the exceptions the local
+    # functions raise where the app cares (RoomUnavailableError, NurseUnavailableError),
+    # else ApiError.
+    in_transaction = False
+
+    def __init__(self, url, timeout=30, token=None):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or API_PORT
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        token = token or api_token()
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.conn = None
+
+    def call(self, name, *args):
+        return self.request(name, {"args": list(args)})
+
+    def page(self, spec, op, *args):
+        return self.request("page", {"source": spec, "op": op, "args": list(args)})
+
+    def request(self, name, body):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request("POST", "/api/" + name, json.dumps(body), self.headers)
+            response = self.conn.getresponse()
+            payload = json.loads(response.read())
+        except (OSError, http.client.HTTPException, ValueError):
+            # Not retried: a write may have gone through. The next call reconnects.
+            self.close()
+            raise
+        if "error" in payload:
+            if payload.get("type") == "RoomUnavailableError":
+                raise RoomUnavailableError(payload["room_no"])
+            if payload.get("type") == "NurseUnavailableError":
+                raise NurseUnavailableError(payload["nurse_id"])
+            raise ApiError(payload["error"], response.status)
+        return payload["result"]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ---------------------- BENCHMARK ----------------------
+# Each simulated terminal keeps one connection open and sends requests back to back:
+# dashboard counters, list pages, room choices, patient details and bills, plus a
+# share of writes (a nurse record). Reports sustained requests/s and latency.
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server_process(db_path, port, workers):
+    # A separate process, so the clients and the server don't share one interpreter lock
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hospital_cli.py")
+    proc = subprocess.Popen([sys.executable, cli, "--db", db_path, "serve", "--port", str(port),
+                             "--workers", str(workers)], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("API server did not start")
+
+
+def bench_requests(client, write_ratio, seed=0):
+    # A shuffled list of (name, body) covering the app's calls on existing records
+    patients = [r[0] for r in client.page(admitted_patients_source().spec, "after", None, 200)]
+    rooms = client.page(rooms_source().spec, "after", None, 1)
+    pages = [admitted_patients_source().spec, rooms_source().spec, staff_search_source("doctors", ["id", "name"], "").spec]
+    rng = random.Random(seed)
+    work = []
+    for i in range(1000):
+        pid = rng.choice(patients) if patients else "P00000000"
+        if rng.random() < write_ratio:
+            work.append(("add_nurse_record", {"args": [pid, "Benchmark", "Observation", "Day", ""]}))
+            continue
+        kind = i % 5
+        if kind == 0:
+            work.append(("dashboard_counts", {"args": []}))
+        elif kind == 1:
+            work.append(("page", {"source": rng.choice(pages), "op": "after", "args": [None, 60]}))
+        elif kind == 2:
+            work.append(("room_choices", {"args": [None, rooms[0][0][:1] if rooms else ""]}))
+        elif kind == 3:
+            work.append(("patient_details", {"args": [pid]}))
+        else:
+            work.append(("patient_bill", {"args": [pid]}))
+    auth = "".join(f"\r\n{k}: {v}" for k, v in client.headers.items() if k == "Authorization")
+    return [encode_message(f"POST /api/{name} HTTP/1.1\r\nHost: bench{auth}", json.dumps(body).encode())
+            for name, body in work]
+
+
+async def bench_client(host, port, messages, offset, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(messages[i % len(messages)])
+            await writer.drain()
+            status, _, _ = await read_message(reader, request=False)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+
+async def run_clients(host, port, messages, clients, seconds):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(bench_client(host, port, messages, n * 37, deadline, latencies, errors)
+                           for n in range(clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def benchmark(url=None, db_path=DB_PATH, clients=32, seconds=10.0, workers=WORKERS, write_ratio=0.1):
+    # Returns a dict of results; with no url a server for db_path is started and stopped
+    proc = None
+    if url is None:
+        port = free_port()
+        proc = start_server_process(db_path, port, workers)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        client = ApiClient(url)
+        messages = bench_requests(client, write_ratio)
+        client.close()
+        latencies, errors, elapsed = asyncio.run(run_clients(client.host, client.port, messages, clients, seconds))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {"clients": clients, "requests": len(latencies), "errors": len(errors), "seconds": elapsed,
+            "rps": len(latencies) / elapsed, "p50_ms": pick(0.50), "p99_ms": pick(0.99)}
@@ -0,0 +1,310 @@
+# Synthetic data and a benchmark of every page and operation, to see how the app
+# behaves at realistic (or far larger) scale. The generator is seeded, so the same
+# arguments always produce the same hospital; it loads through the bulk importer, so
+# generated rows pass the same validation as real ones.
+#
+# The benchmark times what each HospitalApp method runs against the database (its
+# data functions and list pages), headless, and reports p50/p95/p99 latency and the
+# peak Python memory of one run. Results can be saved as a baseline, and later runs
+# compared with it. With a display, --gui also times the real pages, widgets included.
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from hospital_core import (connect, write_transaction, admitted_patients_source, rooms_source, staff_search_source,
+                           dashboard_counts, admission_choices, room_choices, admit_patient, patient_details,
+                           discharge_admission, patient_bill, changes_since, dashboard_trends)
+from hospital_import import AdmissionImport, import_records, drop_table_extras, restore_table_extras
+from hospital_search import search_patients
+from hospital_forecast import np, forecast_cache, occupancy_forecast
+from hospital_workload import nurse_choices, suggest_nurse
+
+FIRST_NAMES = ["Aarav", "Asha", "Deepak", "Divya", "Farhan", "Gita", "Harish", "Isha", "Kiran", "Lakshmi",
+               "Manoj", "Meera", "Neha", "Nikhil", "Pooja", "Rahul", "Ravi", "Sagar", "Sneha", "Vikram"]
+LAST_NAMES = ["Bose", "Das", "Gupta", "Iyer", "Joshi", "Kapoor", "Kumar", "Menon", "Nair", "Patel",
+              "Rao", "Reddy", "Shah", "Sharma", "Singh", "Verma"]
+DISEASES = ["Fever", "Fracture", "Pneumonia", "Dengue", "Diabetes", "Asthma", "Appendicitis", "Typhoid"]
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
+SPECIALIZATIONS = ["Cardiology", "Orthopedics", "Neurology", "Pediatrics", "General Medicine", "Surgery"]
+SHIFTS = ["Day", "Night", "Evening"]
+ROOM_TYPES = ["General", "Shared", "Private", "ICU"]
+NOTES = ["Vitals stable", "Dressing changed", "Medication given", "Patient resting", "Fever reduced"]
+CHUNK = 20000
+
+
+class RaiseOnReject:
+    # Generated rows are always valid; one that isn't is a bug in the generator
+    def write(self, rec, error):
+        raise ValueError(f"Generated row rejected: {error}: {rec}")
+
+
+# ---------------------- GENERATOR ----------------------
+def records(rows):
+    # (values, raw) pairs as import_records takes them
+    return ((row, row) for row in rows)
+
+
+def person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def phone(rng):
+    return f"9{rng.randrange(10 ** 9):09d}"
+
+
+def stamp(rng, now, days=30):
+    return (now - timedelta(minutes=rng.randrange(days * 24 * 60))).strftime("%Y-%m-%d %H:%M")
+
+
+def generate(conn, patients=10000, doctors=200, nurses=400, rooms=None, notes=100000, seed=1):
+    # Add a synthetic hospital to the database; returns {table: rows added}. By default
+    # there are a fifth more rooms than patients, and every patient gets a room. All
+    # of it commits in one transaction, so a failed run leaves the database as it was.
+    with write_transaction(conn):
+        return generate_rows(conn, patients, doctors, nurses, rooms, notes, seed)
+
+
+def generate_rows(conn, patients, doctors, nurses, rooms, notes, seed):
+    rng = random.Random(seed)
+    now = datetime.now()
+    rooms = patients + patients // 5 if rooms is None else rooms
+    added = {}
+
+    per_floor = 1000
+    width = len(str(rooms // per_floor + 1))
+    room_rows = ([f"{i // per_floor + 1:0{width}d}{i % per_floor:03d}", rng.choice(ROOM_TYPES), "Available"]
+                 for i in range(rooms))
+    added["rooms"] = import_records(conn, "rooms", records(room_rows), RaiseOnReject())
+
+    doctor_names = [f"Dr. {person(rng)} {i}" for i in range(doctors)]
+    added["doctors"] = import_records(conn, "doctors", records([name, rng.choice(SPECIALIZATIONS), phone(rng), rng.choice(SHIFTS), ""]
+                                                               for name in doctor_names), RaiseOnReject())
+    nurse_names = [f"{person(rng)} {i}" for i in range(nurses)]
+    added["nurses"] = import_records(conn, "nurses", records([name, phone(rng), rng.choice(SHIFTS), ""]
+                                                             for name in nurse_names), RaiseOnReject())
+
+    free = [r[0] for r in conn.execute("SELECT room_no FROM rooms WHERE status='Available'")]
+    rng.shuffle(free)
+
+    # Rows follow the importer's field list; fields left out (patient_id, nurse_id) read as ""
+    fields = AdmissionImport.fields
+    admissions = ([row.get(k, "") for k in fields] for row in (
+        {"name": person(rng), "age": str(rng.randint(1, 95)), "contact": phone(rng), "gender": rng.choice(["Male", "Female", "Other"]),
+         "disease": rng.choice(DISEASES), "blood_group": rng.choice(BLOOD_GROUPS),
+         "doctor": rng.choice(doctor_names) if doctor_names else "Dr. On Call", "room_no": free[i] if i < len(free) else "",
+         "admit_date": stamp(rng, now), "nurse": rng.choice(nurse_names) if nurse_names else ""}
+        for i in range(patients)))
+    added["admission"] = import_records(conn, "admissions", records(admissions), RaiseOnReject())
+
+    # Nurse notes have no importer kind; same approach: indexes rebuilt once at the end
+    patient_ids = [r[0] for r in conn.execute("SELECT patient_id FROM admission")]
+    count = 0
+    if patient_ids and notes:
+        with write_transaction(conn):
+            extras = drop_table_extras(conn, "nurse_treatment")
+            names = nurse_names or ["Nurse On Call"]
+            while count < notes:
+                n = min(CHUNK, notes - count)
+                conn.executemany("INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date) VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(rng.choice(patient_ids), rng.choice(names), rng.choice(NOTES), rng.choice(SHIFTS), "", stamp(rng, now))
+                                  for _ in range(n)])
+                count += n
+            restore_table_extras(conn, "nurse_treatment", extras)
+    added["nurse_treatment"] = count
+    return added
+
+
+# ---------------------- BENCHMARK ----------------------
+DOCTOR_COLUMNS = ["id", "name", "specialization", "contact", "shift", "photo_path"]
+NURSE_COLUMNS = ["id", "name", "contact", "shift", "photo_path"]
+PATIENT = {"name": "Bench Patient", "age": "40", "contact": "9000000000", "gender": "Male",
+           "disease": "Fever", "blood_group": "O+", "doctor": "Dr. On Call"}
+
+
+def first_page(source, conn):
+    # What a VirtualList does when shown: count, then the first two pages
+    source.count(conn)
+    source.after(conn, None, 120)
+
+
+def operations(conn, rng):
+    # [(HospitalApp method, function running what it runs against the database)].
+    # save_admission and discharge_patient write for real (the discharge archives the
+    # stay, the events feed the rollups), so run these on scratch_copy().
+    patient_ids = [r[0] for r in admitted_patients_source().after(conn, None, 5000)]
+    if not patient_ids:
+        raise ValueError("The database has no patients; run generate first")
+    names = [r[0] for r in conn.execute("SELECT name FROM doctors LIMIT 200")] + ["Sharma", "Nair"]
+    searches = [name.split()[-2 if len(name.split()) > 1 else -1][:rng.randint(3, 5)] for name in names]
+    admitted = []
+
+    def save_admission():
+        room_no, _ = room_choices(conn)
+        if room_no:
+            admitted.append(admit_patient(conn, PATIENT, room_no, suggest_nurse(conn)))
+
+    def discharge_patient():
+        if admitted:
+            discharge_admission(conn, admitted.pop())
+
+    def cold_forecast():
+        # The dashboard's forecast right after an admission, i.e. not from the cache
+        forecast_cache.token = None
+        occupancy_forecast(conn)
+
+    def staff_search():
+        text = rng.choice(searches)
+        first_page(staff_search_source("doctors", DOCTOR_COLUMNS, text), conn)
+        first_page(staff_search_source("nurses", NURSE_COLUMNS, text), conn)
+
+    # Build the patient index up front, as the app does when the search bar gets focus,
+    # and the nurse workload index, as the first admission form does
+    search_patients(conn, "")
+    nurse_choices(conn)
+    lookups = searches + [pid[:rng.randint(4, len(pid))] for pid in rng.sample(patient_ids, min(20, len(patient_ids)))]
+    seq = changes_since(conn)[0]
+    return [
+        ("show_dashboard", lambda: (dashboard_counts(conn), dashboard_trends(conn))),
+        ("show_admission_form", lambda: (admission_choices(conn), room_choices(conn), nurse_choices(conn))),
+        ("show_admitted_patients", lambda: first_page(admitted_patients_source(), conn)),
+        ("view_patient_details", lambda: patient_details(conn, rng.choice(patient_ids))),
+        ("show_room_availability", lambda: first_page(rooms_source(), conn)),
+        ("show_staff_page", lambda: (first_page(staff_search_source("doctors", DOCTOR_COLUMNS, ""), conn),
+                                     first_page(staff_search_source("nurses", NURSE_COLUMNS, ""), conn))),
+        ("staff_search", staff_search),
+        ("load_billing_details", lambda: patient_bill(conn, rng.choice(patient_ids))),
+        ("patient_search", lambda: search_patients(conn, rng.choice(lookups))),
+        ("poll_changes", lambda: changes_since(conn, seq)),
+        ("save_admission", save_admission),
+        ("discharge_patient", discharge_patient),
+    ] + ([("occupancy_forecast", cold_forecast)] if np is not None else [])
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(fn, iterations, memory_runs=5):
+    # Latency percentiles in ms over `iterations` calls, then the peak memory of one
+    # call in KiB. Memory is traced in separate runs, as tracing slows everything down.
+    for _ in range(3):
+        fn()
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    peak = 0
+    tracemalloc.start()
+    for _ in range(memory_runs):
+        tracemalloc.reset_peak()
+        fn()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return {"n": iterations, "p50_ms": percentile(times, 0.50), "p95_ms": percentile(times, 0.95),
+            "p99_ms": percentile(times, 0.99), "peak_kib": peak / 1024}
+
+
+@contextmanager
+def scratch_copy(conn):
+    # A connection to a copy of conn's database, deleted afterwards. The copy sits
+    # next to the original, on the same disk, so commits cost what they would there.
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    fd, copy_path = tempfile.mkstemp(suffix=".db", prefix="bench-", dir=os.path.dirname(os.path.abspath(path)) if path else None)
+    os.close(fd)
+    copy = connect(copy_path)
+    try:
+        conn.backup(copy)
+        yield copy
+    finally:
+        copy.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(copy_path + suffix):
+                os.remove(copy_path + suffix)
+
+
+def run_benchmark(conn, iterations=200, seed=1):
+    # Runs on a copy of the database, so a run leaves the original as it found it
+    rng = random.Random(seed)
+    with scratch_copy(conn) as copy:
+        return {name: measure(fn, iterations) for name, fn in operations(copy, rng)}
+
+
+def settle(app, timeout=60):
+    # Run the Tk loop until every database read the page issued has been answered
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        app.update()
+        if all(req.done or req.cancelled for req in app.page_requests):
+            return
+        time.sleep(0.001)
+    raise TimeoutError("page did not finish loading")
+
+
+def run_gui_benchmark(db_path, iterations=20, seed=1):
+    # Wall time of each page from the call until its data is on screen. Results land
+    # through the DB executor's poll, so timings are rounded up to its interval (15 ms).
+    from SagarCare import HospitalApp
+    rng = random.Random(seed)
+    conn = connect(db_path)
+    patient_ids = [r[0] for r in admitted_patients_source().after(conn, None, 1000)]
+    conn.close()
+    app = HospitalApp(db_path)
+    try:
+        settle(app)
+        pages = [("show_dashboard", app.show_dashboard), ("show_admission_form", app.show_admission_form),
+                 ("show_admitted_patients", app.show_admitted_patients),
+                 ("show_room_availability", app.show_room_availability), ("show_staff_page", app.show_staff_page),
+                 ("show_billing_page", app.show_billing_page),
+                 ("view_patient_details", lambda: app.view_patient_details(rng.choice(patient_ids)))]
+        results = {}
+        for name, show in pages:
+            def run(show=show):
+                show()
+                settle(app)
+            results["gui:" + name] = measure(run, iterations, memory_runs=1)
+        return results
+    finally:
+        app.on_closing()
+
+
+# ---------------------- BASELINE ----------------------
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": datetime.now().isoformat(timespec="seconds"), "operations": results}, f, indent=2)
+
+
+def compare(results, baseline, tolerance=0.25, floor_ms=0.2):
+    # [(operation, baseline p50, p50, regressed)] for operations in both. A median more
+    # than `tolerance` slower is a regression, unless the difference is under floor_ms
+    # (timer and scheduler noise on sub-millisecond operations). The median is compared
+    # rather than the tail, which moves with whatever else the machine is doing.
+    rows = []
+    for name, r in results.items():
+        old = baseline["operations"].get(name)
+        if old:
+            slower = r["p50_ms"] - old["p50_ms"]
+            rows.append((name, old["p50_ms"], r["p50_ms"], slower > floor_ms and r["p50_ms"] > old["p50_ms"] * (1 + tolerance)))
+    return rows
+
+
+def report(results, comparison=()):
+    baseline = {name: (old, regressed) for name, old, _, regressed in comparison}
+    lines = [f"{'operation':28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>9}  vs baseline p50"]
+    for name, r in results.items():
+        line = f"{name:28} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['peak_kib']:9.1f}"
+        if name in baseline:
+            old, regressed = baseline[name]
+            change = (r["p50_ms"] / old - 1) * 100 if old else 0.0
+            line += f"  {old:.3f} ({change:+.0f}%){'  REGRESSION' if regressed else ''}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,137 @@
+# Bill documents: plain text and PDF files for printing or emailing, written without
+# any outside service. A billing run (see bill_all) can be rendered across all cores
+# with a process pool; every file is written to a temporary name and renamed into
+# place, and the batch gets a sha256sum-style manifest ("sha256sum -c" checks it).
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+
+from hospital_core import format_bill, write_atomic
+
+CHUNK_SIZE = 500  # bills per pool task
+FORMATS = ["txt", "pdf"]
+
+
+# ---------------------- PDF ----------------------
+# A single A4 page of Courier text is all a bill needs, so this writes the PDF by
+# hand: catalog, page tree, page, font, then one content stream with the lines.
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE = 10
+LEADING = 13
+
+
+@lru_cache(maxsize=None)
+def pdf_template():
+    # Objects 1-4 are the same in every bill; build them and their offsets once per process
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+         f"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>").encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    return bytes(out), offsets
+
+
+def pdf_escape(line):
+    line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return line.encode("cp1252", "replace")
+
+
+def render_pdf(text):
+    prefix, offsets = pdf_template()
+    lines = text.strip("\n").splitlines()
+    stream = bytearray(b"BT /F1 %d Tf %d TL 40 %d Td\n" % (FONT_SIZE, LEADING, PAGE_HEIGHT - 60))
+    for line in lines:
+        stream += b"(" + pdf_escape(line) + b") Tj T*\n"
+    stream += b"ET"
+
+    out = bytearray(prefix)
+    offsets = offsets + [len(out)]
+    out += b"5 0 obj\n<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 6\n0000000000 65535 f \n"
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size 6 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+def render(bill, fmt):
+    text = format_bill(bill)
+    if fmt == "pdf":
+        return render_pdf(text)
+    return text.encode("utf-8")
+
+
+# ---------------------- FILES ----------------------
+def bill_filename(bill, fmt, run=None):
+    return f"{run}_{bill['pid']}.{fmt}" if run else f"{bill['pid']}.{fmt}"
+
+
+def write_bills(bills, out_dir, formats, run=None):
+    # Render and write a chunk of bills; returns [(filename, sha256, size)]. Runs in
+    # the pool's worker processes, so it only takes plain data.
+    written = []
+    for bill in bills:
+        for fmt in formats:
+            data = render(bill, fmt)
+            name = bill_filename(bill, fmt, run)
+            write_atomic(os.path.join(out_dir, name), data)
+            written.append((name, hashlib.sha256(data).hexdigest(), len(data)))
+    return written
+
+
+# ---------------------- RUNS ----------------------
+def run_bills(conn, run):
+    # Bills of a billing run as bill dicts, streamed in patient ID order. Everything
+    # comes from the bills themselves, so discharged patients print as billed.
+    cur = conn.execute("""
+        SELECT patient_id, patient_name, disease, admit_date, doctor_name, room_no, room_type,
+               days, room_rate, room_cost, doctor_fee, nursing_fee, service_fee, extra, total
+        FROM bills WHERE run = ? ORDER BY patient_id""", (run,))
+    keys = ["pid", "name", "disease", "admit", "doctor", "roomno", "room_type", "days", "room_rate", "room_cost",
+            "doctor_fee", "nursing_fee", "service_fee", "extra", "total"]
+    while True:
+        rows = cur.fetchmany(CHUNK_SIZE)
+        if not rows:
+            return
+        yield [dict(zip(keys, row)) for row in rows]
+
+
+def render_run(conn, run, out_dir, formats=FORMATS, workers=None):
+    # Render every bill of `run` into out_dir and write MANIFEST-<run>.sha256.
+    # workers=None uses all cores, 1 renders in this process. Only a few chunks are
+    # in flight at once, so memory stays flat however big the run is.
+    # Returns (files written, manifest path).
+    os.makedirs(out_dir, exist_ok=True)
+    formats = list(formats)
+    written = []
+    chunks = run_bills(conn, run)
+    if workers == 1:
+        for bills in chunks:
+            written += write_bills(bills, out_dir, formats, run)
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            limit = 2 * workers
+            pending = set()
+            for bills in chunks:
+                if len(pending) >= limit:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        written += future.result()
+                pending.add(pool.submit(write_bills, bills, out_dir, formats, run))
+            for future in pending:
+                written += future.result()
+
+    manifest = os.path.join(out_dir, f"MANIFEST-{run}.sha256")
+    written.sort()
+    write_atomic(manifest, "".join(f"{digest}  {name}\n" for name, digest, _ in written).encode("utf-8"))
+    return len(written), manifest
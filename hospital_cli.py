@@ -0,0 +1,459 @@
+# Command line for scripts and cron jobs. Only needs hospital_core, so it starts
+# without a display and without loading customtkinter.
+#
+#   python hospital_cli.py admit --name "Ravi Kumar" --age 40 --contact 555-0300 --gender Male \
+#       --disease Fever --blood-group O+ --doctor "Asha Rao" [--room 101 | --room-type ICU] [--nurse "Meera Das" | --nurse auto [--shift Night]]
+#   python hospital_cli.py discharge P00100001
+#   python hospital_cli.py discharges --from 2026-09-01 --to 2026-10-01 | --patient P00100001
+#   python hospital_cli.py list patients|rooms|doctors|nurses
+#   python hospital_cli.py bill P00100001 [--extra 500]
+#   python hospital_cli.py bill-all [--run 2026-10]
+#   python hospital_cli.py tariff [room:ICU 5500]
+#   python hospital_cli.py render-bills --run 2026-10 -o bills/2026-10 [--format pdf] [--workers 8]
+#   python hospital_cli.py export admission -o admission.csv
+#   python hospital_cli.py export nurse_treatment -o nightly/nurse.jsonl.gz --since-last insurer
+#   python hospital_cli.py import admissions old_system.csv [--rejects bad.csv]
+#   python hospital_cli.py backfill-rollups
+#   python hospital_cli.py trends [--days 14] [--hourly ICU]
+#   python hospital_cli.py nurse-load [--shift Night] [--limit 20]
+#   python hospital_cli.py rebalance-nurses Night
+#   python hospital_cli.py forecast [--date 2026-10-18]
+#   python hospital_cli.py check-plans
+#   python hospital_cli.py generate --patients 100000 --notes 1000000 [--seed 1]
+#   python hospital_cli.py bench [--iterations 200] [--baseline bench_baseline.json] [--save-baseline bench_baseline.json]
+#   python hospital_cli.py serve [--host 127.0.0.1] [--port 8470] [--workers 8]
+#   python hospital_cli.py bench-api [--url http://127.0.0.1:8470] [--clients 32] [--seconds 10]
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime, timedelta
+
+from hospital_core import (DB_PATH, open_database, normalize_patient_id, RoomUnavailableError, NurseUnavailableError, nurse_by_name,
+                           KeysetSource, admitted_patients_source, rooms_source, validate_patient, room_choices, admit_patient,
+                           discharge_admission, discharges, patient_discharges, DISCHARGE_COLUMNS, patient_bill, bill_all, tariffs, set_tariff, format_bill,
+                           backfill_rollups, dashboard_trends, occupancy_series, check_query_plans)
+
+LISTS = {
+    "patients": admitted_patients_source(),
+    "rooms": rooms_source(),
+    "doctors": KeysetSource("doctors", ["id", "name", "specialization", "contact", "shift"], order_by=["name", "id"]),
+    "nurses": KeysetSource("nurses", ["id", "name", "contact", "shift"], order_by=["name", "id"]),
+}
+
+EXPORT_TABLES = ["admission", "nurse_treatment", "rooms", "doctors", "nurses"]
+
+
+def cmd_admit(db, args):
+    patient = {"name": args.name, "age": args.age, "contact": args.contact, "gender": args.gender,
+               "disease": args.disease, "blood_group": args.blood_group, "doctor": args.doctor}
+    error = validate_patient(patient)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    room_no = args.room
+    if not room_no:
+        room_no, _ = room_choices(db, args.room_type, args.ward or "")
+        if not room_no:
+            print("No room available", file=sys.stderr)
+            return 1
+    nurse_id = None
+    if args.nurse == "auto":
+        from hospital_workload import suggest_nurse
+        nurse_id = suggest_nurse(db, args.shift)
+        if nurse_id is None:
+            print(f"No nurse on shift {args.shift}" if args.shift else "No nurses", file=sys.stderr)
+            return 1
+    elif args.nurse:
+        nurse_id = nurse_by_name(db, args.nurse)
+        if nurse_id is None:
+            print(f"No nurse named {args.nurse}", file=sys.stderr)
+            return 1
+    try:
+        patient_id = admit_patient(db, patient, room_no, nurse_id)
+    except (RoomUnavailableError, NurseUnavailableError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(patient_id, room_no)
+    return 0
+
+
+def cmd_discharge(db, args):
+    status = 0
+    for pid in args.patient_ids:
+        pid = normalize_patient_id(pid)
+        bill = discharge_admission(db, pid)
+        if bill:
+            print(f"{pid} discharged, final bill Rs {bill['total']}")
+        else:
+            print(f"{pid}: no such patient", file=sys.stderr)
+            status = 1
+    return status
+
+
+def cmd_discharges(db, args):
+    if args.patient:
+        rows = patient_discharges(db, normalize_patient_id(args.patient))
+    elif args.start and args.end:
+        rows = discharges(db, args.start, args.end, args.limit)
+    else:
+        print("discharges: give --patient, or --from and --to", file=sys.stderr)
+        return 1
+    out = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    out.writerow(name for name, _ in DISCHARGE_COLUMNS)
+    out.writerows(rows)
+    return 0
+
+
+def cmd_list(db, args):
+    out = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    source = LISTS[args.what]
+    out.writerow(source.columns)
+    out.writerows(source.rows(db))
+    return 0
+
+
+def cmd_bill(db, args):
+    pid = normalize_patient_id(args.patient_id)
+    bill = patient_bill(db, pid, args.extra)
+    if not bill:
+        print(f"{pid}: no such patient", file=sys.stderr)
+        return 1
+    print(format_bill(bill))
+    return 0
+
+
+def cmd_bill_all(db, args):
+    start = time.perf_counter()
+    run, count = bill_all(db, args.run_label)
+    print(f"Billed {count} patients for run {run} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_render_bills(db, args):
+    from hospital_bills import render_run
+    start = time.perf_counter()
+    count, manifest = render_run(db, args.run_label, args.output, args.format, args.workers)
+    print(f"Wrote {count} files in {time.perf_counter() - start:.2f}s, manifest {manifest}")
+    return 0
+
+
+def cmd_tariff(db, args):
+    if args.item is not None:
+        if args.amount is None:
+            print("tariff: give an amount to set", file=sys.stderr)
+            return 1
+        set_tariff(db, args.item, args.amount)
+    for item, amount in sorted(tariffs(db).items()):
+        print(f"{item}\t{amount}")
+    return 0
+
+
+def cmd_export(db, args):
+    from hospital_export import export_table
+    if args.output == "-":
+        # Straight to stdout; the streaming exporter needs a real file to rename into place
+        cur = db.execute(f"SELECT * FROM {args.table}")
+        out = csv.writer(sys.stdout)
+        out.writerow([d[0] for d in cur.description])
+        out.writerows(cur)
+        return 0
+    try:
+        count = export_table(db, args.table, args.output, args.format, args.gzip or None, args.since_last)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Exported {count} rows of {args.table} to {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_import(db, args):
+    # Imported lazily: only this command needs it
+    from hospital_import import import_file
+    start = time.perf_counter()
+    imported, rejected, reject_path = import_file(db, args.kind, args.file, args.rejects, args.chunk_size,
+                                                  defer_indexes=not args.keep_indexes)
+    elapsed = time.perf_counter() - start
+    print(f"Imported {imported} {args.kind} in {elapsed:.2f}s ({imported / max(elapsed, 1e-9):,.0f} rows/s)")
+    if rejected:
+        print(f"Rejected {rejected} rows, see {reject_path}", file=sys.stderr)
+    return 1 if rejected else 0
+
+
+def cmd_backfill_rollups(db, args):
+    start = time.perf_counter()
+    stays = backfill_rollups(db)
+    print(f"Rebuilt rollups from {stays} stays in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_trends(db, args):
+    if args.hourly:
+        now = datetime.now()
+        start = (now - timedelta(hours=args.days * 24 - 1)).strftime("%Y-%m-%d %H")
+        end = (now + timedelta(hours=1)).strftime("%Y-%m-%d %H")
+        print("hour\toccupied\tpeak")
+        for bucket, level, peak in occupancy_series(db, args.hourly, start, end, "hour"):
+            print(f"{bucket}\t{level}\t{peak}")
+        return 0
+    trends = dashboard_trends(db, args.days)
+    types = list(trends["occupied"])
+    print("\t".join(["day", "admissions"] + [f"peak {t or '-'}" for t in types]))
+    for i, day in enumerate(trends["days"]):
+        print("\t".join([day, str(trends["admissions"][i])] + [str(trends["occupied"][t][i]) for t in types]))
+    for room_type, days in trends["avg_stay"].items():
+        print(f"average stay {room_type or '-'}: {days:.1f} days")
+    return 0
+
+
+def cmd_nurse_load(db, args):
+    from hospital_workload import nurse_choices
+    shifts, nurses = nurse_choices(db, args.shift, args.limit)
+    print("id\tname\tshift\tpatients")
+    for nurse_id, name, shift, load in nurses:
+        print(f"{nurse_id}\t{name}\t{shift}\t{load}")
+    return 0
+
+
+def cmd_rebalance_nurses(db, args):
+    from hospital_workload import rebalance_shift
+    start = time.perf_counter()
+    moves = rebalance_shift(db, args.shift)
+    print(f"Moved {len(moves)} patients between {args.shift} nurses in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_forecast(db, args):
+    from hospital_forecast import occupancy_forecast
+    start = time.perf_counter()
+    result = occupancy_forecast(db, args.date)
+    elapsed = time.perf_counter() - start
+    types = list(result["expected"])
+    print("\t".join(["day"] + types))
+    print("\t".join(["rooms"] + [str(result["capacity"][t]) for t in types]))
+    for i, day in enumerate(result["days"]):
+        print("\t".join([day] + [f"{result['expected'][t][i]:.1f}" for t in types]))
+    print(f"Forecast in {elapsed:.3f}s", file=sys.stderr)
+    return 0
+
+
+def cmd_check_plans(db, args):
+    # Fail (exit 1) if any query the app runs needs a full table scan
+    problems = check_query_plans()
+    for sql, step in problems:
+        print(f"FULL SCAN: {step}\n    {' '.join(sql.split())}")
+    print("Query plans OK" if not problems else f"{len(problems)} full scan(s) found")
+    return 1 if problems else 0
+
+
+def cmd_generate(db, args):
+    from hospital_bench import generate
+    start = time.perf_counter()
+    added = generate(db, args.patients, args.doctors, args.nurses, args.rooms, args.notes, args.seed)
+    print(", ".join(f"{count} {table}" for table, count in added.items()) + f" added in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def cmd_bench(db, args):
+    import json
+    from hospital_bench import run_benchmark, run_gui_benchmark, compare, report, save_baseline
+    try:
+        results = run_benchmark(db, args.iterations, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.gui:
+        try:
+            results.update(run_gui_benchmark(args.db, max(1, args.iterations // 10), args.seed))
+        except Exception as e:
+            # No display, or customtkinter isn't installed; the headless results still stand
+            print(f"GUI benchmark skipped: {e}", file=sys.stderr)
+    comparison = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            comparison = compare(results, json.load(f), args.tolerance)
+    print(report(results, comparison))
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+    regressions = [name for name, _, _, regressed in comparison if regressed]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def cmd_serve(db, args):
+    from hospital_api import serve
+    try:
+        serve(args.db, args.host, args.port, args.workers)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_bench_api(db, args):
+    from hospital_api import benchmark
+    r = benchmark(args.url, args.db, args.clients, args.seconds, args.workers, args.write_ratio)
+    print(f"{r['requests']} requests from {r['clients']} clients in {r['seconds']:.1f}s: "
+          f"{r['rps']:,.0f} req/s, p50 {r['p50_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms, {r['errors']} errors")
+    return 1 if r["errors"] else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hospital_cli", description="Sagar Care hospital management, without the GUI")
+    parser.add_argument("--db", default=DB_PATH, help=f"database file (default: {DB_PATH})")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every query, log slow ones to slow_ops.log and print the top offenders at exit")
+    parser.set_defaults(open_db=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("admit", help="admit a patient and print the new patient ID and room")
+    p.add_argument("--name", required=True)
+    p.add_argument("--age", required=True)
+    p.add_argument("--contact", required=True)
+    p.add_argument("--gender", required=True)
+    p.add_argument("--disease", required=True)
+    p.add_argument("--blood-group", required=True)
+    p.add_argument("--doctor", required=True)
+    p.add_argument("--room", help="default: best fit of --room-type in --ward")
+    p.add_argument("--room-type")
+    p.add_argument("--ward", help="room number prefix, e.g. 2 for rooms 2xx")
+    p.add_argument("--nurse", help="nurse name, or auto for the least loaded nurse")
+    p.add_argument("--shift", help="with --nurse auto: only nurses of this shift")
+    p.set_defaults(run=cmd_admit)
+
+    p = commands.add_parser("discharge", help="discharge patients, archiving them with their final bill, and free their rooms")
+    p.add_argument("patient_ids", nargs="+")
+    p.set_defaults(run=cmd_discharge)
+
+    p = commands.add_parser("discharges", help="print archived discharges as tab separated rows")
+    p.add_argument("--from", dest="start", help="first discharge time, e.g. 2026-09-01")
+    p.add_argument("--to", dest="end", help="discharges before this time")
+    p.add_argument("--patient")
+    p.add_argument("--limit", type=int, default=1000)
+    p.set_defaults(run=cmd_discharges)
+
+    p = commands.add_parser("list", help="print a list as tab separated rows")
+    p.add_argument("what", choices=sorted(LISTS))
+    p.set_defaults(run=cmd_list)
+
+    p = commands.add_parser("bill", help="print a patient's bill")
+    p.add_argument("patient_id")
+    p.add_argument("--extra", type=int, default=0, help="extra charges in Rs")
+    p.set_defaults(run=cmd_bill)
+
+    p = commands.add_parser("bill-all", help="bill every admitted patient into the bills table")
+    p.add_argument("--run", dest="run_label", help="run label; re-running a label replaces its bills (default: current month)")
+    p.set_defaults(run=cmd_bill_all)
+
+    p = commands.add_parser("render-bills", help="write the bills of a billing run as text/PDF files")
+    p.add_argument("--run", dest="run_label", required=True)
+    p.add_argument("-o", "--output", required=True, help="output directory")
+    p.add_argument("--format", nargs="+", choices=["txt", "pdf"], default=["txt", "pdf"])
+    p.add_argument("--workers", type=int, help="worker processes (default: all cores, 1 = no pool)")
+    p.set_defaults(run=cmd_render_bills)
+
+    p = commands.add_parser("tariff", help="list tariffs, or set one")
+    p.add_argument("item", nargs="?", help="e.g. room:ICU, room_default, doctor_fee")
+    p.add_argument("amount", nargs="?", type=int)
+    p.set_defaults(run=cmd_tariff)
+
+    p = commands.add_parser("export", help="write a table as CSV, JSON Lines or Parquet")
+    p.add_argument("table", choices=EXPORT_TABLES)
+    p.add_argument("-o", "--output", default="-", help="output file (default: CSV on stdout)")
+    p.add_argument("--format", choices=["csv", "jsonl", "parquet"], help="default: from the output file name")
+    p.add_argument("--gzip", action="store_true", help="compress (default: if the output name ends in .gz)")
+    p.add_argument("--since-last", metavar="NAME",
+                   help="only rows changed since the last export made under NAME (admission, nurse_treatment, rooms)")
+    p.set_defaults(run=cmd_export)
+
+    p = commands.add_parser("import", help="bulk import records from a CSV or JSON Lines file")
+    p.add_argument("kind", choices=["admissions", "doctors", "nurses", "rooms"])
+    p.add_argument("file")
+    p.add_argument("--rejects", help="where to write rows that fail validation (default: <file>.rejects.<ext>)")
+    p.add_argument("--chunk-size", type=int, default=20000, help="rows per executemany batch")
+    p.add_argument("--keep-indexes", action="store_true",
+                   help="update indexes row by row instead of rebuilding them after the import (faster for small imports into big tables)")
+    p.set_defaults(run=cmd_import)
+
+    p = commands.add_parser("backfill-rollups", help="rebuild the hourly/daily rollups from the discharge archive and admissions")
+    p.set_defaults(run=cmd_backfill_rollups)
+
+    p = commands.add_parser("trends", help="print daily admissions, peak occupancy and average stay from the rollups")
+    p.add_argument("--days", type=int, default=14)
+    p.add_argument("--hourly", metavar="ROOM_TYPE", help="print hourly occupancy of one room type instead")
+    p.set_defaults(run=cmd_trends)
+
+    p = commands.add_parser("nurse-load", help="print the least loaded nurses with their number of admitted patients")
+    p.add_argument("--shift", help="only nurses of this shift")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(run=cmd_nurse_load)
+
+    p = commands.add_parser("rebalance-nurses", help="even out the patients of one shift's nurses")
+    p.add_argument("shift")
+    p.set_defaults(run=cmd_rebalance_nurses)
+
+    p = commands.add_parser("forecast", help="print the expected occupied rooms per room type for the next 14 days")
+    p.add_argument("--date", help="forecast as of this day, YYYY-MM-DD (default: today)")
+    p.set_defaults(run=cmd_forecast)
+
+    p = commands.add_parser("check-plans", help="fail if any query the app runs needs a full table scan")
+    p.set_defaults(run=cmd_check_plans, open_db=False)
+
+    p = commands.add_parser("generate", help="add a seeded synthetic hospital to the database, for benchmarks")
+    p.add_argument("--patients", type=int, default=10000)
+    p.add_argument("--doctors", type=int, default=200)
+    p.add_argument("--nurses", type=int, default=400)
+    p.add_argument("--rooms", type=int, help="default: a fifth more than --patients")
+    p.add_argument("--notes", type=int, default=100000, help="nurse treatment records")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(run=cmd_generate)
+
+    p = commands.add_parser("bench", help="time every page and operation; p50/p95/p99 latency and memory")
+    p.add_argument("--iterations", type=int, default=200, help="timed runs per operation")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--baseline", help="compare with results saved by --save-baseline; exit 1 on a regression")
+    p.add_argument("--save-baseline", metavar="PATH")
+    p.add_argument("--tolerance", type=float, default=0.25, help="median slowdown that counts as a regression (default: 0.25 = 25%%)")
+    p.add_argument("--gui", action="store_true", help="also time the real pages (needs a display)")
+    p.set_defaults(run=cmd_bench)
+
+    p = commands.add_parser("serve", help="serve the HTTP/JSON API (see hospital_api.py)")
+    p.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: 127.0.0.1, this machine only; other addresses need SAGARCARE_API_TOKEN set)")
+    p.add_argument("--port", type=int, default=8470)
+    p.add_argument("--workers", type=int, default=8, help="database connections / worker threads")
+    p.set_defaults(run=cmd_serve)
+
+    p = commands.add_parser("bench-api", help="measure API requests/s under concurrent keep-alive clients")
+    p.add_argument("--url", help="server to measure (default: start one for --db)")
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--seconds", type=float, default=10.0)
+    p.add_argument("--workers", type=int, default=8, help="worker threads of the server started for --db")
+    p.add_argument("--write-ratio", type=float, default=0.1, help="share of requests that write (nurse records)")
+    p.set_defaults(run=cmd_bench_api, open_db=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        from hospital_profile import profiler, format_top
+        profiler.enable()
+    try:
+        if not args.open_db:
+            return args.run(None, args)
+        db = open_database(args.db)
+        try:
+            return args.run(db, args)
+        finally:
+            db.close()
+    finally:
+        if args.profile:
+            print(format_top(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1565 @@
+# Database, schema and hospital operations with no GUI dependencies.
+# SagarCare.py (the desktop app) and hospital_cli.py (scripts, cron jobs) both build on this.
+import json
+import os
+import sqlite3
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# ---------------------- DATABASE SETUP ----------------------
+DB_PATH = "hospital.db"
+
+# Schema changes are applied by numbered migrations and PRAGMA user_version records
+# how many have run, so an up-to-date database costs one PRAGMA read at startup.
+# Every step must also be safe on databases created before migrations existed
+# (user_version 0 but tables already present), hence IF NOT EXISTS throughout.
+# Append new steps to MIGRATIONS; never edit one that has shipped.
+
+def migration_1_base_schema(db):
+    # Admissions table
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS admission (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT UNIQUE,
+        patient_name TEXT,
+        age INTEGER,
+        contact TEXT,
+        gender TEXT,
+        disease TEXT,
+        admit_date TEXT,
+        blood_group TEXT,
+        doctor_name TEXT
+    )
+    """)
+
+    # Add room_no (older databases were created without it)
+    cols = [r[1] for r in db.execute("PRAGMA table_info(admission)")]
+    if 'room_no' not in cols:
+        db.execute("ALTER TABLE admission ADD COLUMN room_no TEXT")
+
+    # Nurse treatment records
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS nurse_treatment (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        nurse_name TEXT,
+        nurse_notes TEXT,
+        shift TEXT,
+        prescription TEXT,
+        date TEXT
+    )
+    """)
+
+    # Staff tables: doctors and nurses
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS doctors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        specialization TEXT,
+        contact TEXT,
+        shift TEXT,
+        photo_path TEXT
+    )
+    """)
+
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS nurses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        contact TEXT,
+        shift TEXT,
+        photo_path TEXT
+    )
+    """)
+
+    # Rooms table
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS rooms (
+        room_no TEXT PRIMARY KEY,
+        type TEXT,
+        status TEXT,
+        patient_id TEXT
+    )
+    """)
+
+    # Simple initial room data (if empty)
+    if db.execute("SELECT COUNT(*) FROM rooms").fetchone()[0] == 0:
+        initial_rooms = [
+            ('101', 'Private', 'Available', None),
+            ('102', 'Shared', 'Available', None),
+            ('201', 'ICU', 'Available', None),
+            ('202', 'Shared', 'Available', None)
+        ]
+        db.executemany("INSERT OR IGNORE INTO rooms (room_no, type, status, patient_id) VALUES (?, ?, ?, ?)", initial_rooms)
+
+
+STAFF_FTS = {
+    "doctors": ["name", "specialization", "contact", "shift"],
+    "nurses": ["name", "contact", "shift"],
+}
+
+
+def migration_2_list_paging_and_staff_search(db):
+    # Index for paging the admitted patients list by name
+    db.execute("CREATE INDEX IF NOT EXISTS idx_admission_name ON admission (patient_name, patient_id)")
+
+    # Staff search: name indexes for paging / short prefixes, and trigram FTS5 indexes
+    # over every searchable field. The FTS tables index the staff tables in place
+    # (external content) and are kept in sync by triggers.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors (name, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_nurses_name ON nurses (name, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_doctors_name_nocase ON doctors (name COLLATE NOCASE)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_nurses_name_nocase ON nurses (name COLLATE NOCASE)")
+
+    for table, fields in STAFF_FTS.items():
+        fts = f"{table}_fts"
+        cols = ", ".join(fields)
+        new_vals = ", ".join("new." + f for f in fields)
+        old_vals = ", ".join("old." + f for f in fields)
+        db.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', tokenize='trigram')")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END""")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END""")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END""")
+        # Index the staff that already exist
+        db.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def migration_3_hot_path_indexes(db):
+    # Nurse history per patient, newest first
+    db.execute("CREATE INDEX IF NOT EXISTS idx_nurse_treatment_patient_date ON nurse_treatment (patient_id, date)")
+    # Which admission holds a room
+    db.execute("CREATE INDEX IF NOT EXISTS idx_admission_room ON admission (room_no)")
+    # Available rooms in room order for the admission form
+    db.execute("CREATE INDEX IF NOT EXISTS idx_rooms_status ON rooms (status, room_no)")
+
+
+def migration_4_patient_id_sequence(db):
+    # Patient IDs come from a counter instead of random numbers (see SequenceIdAllocator).
+    # Legacy random IDs (P + 5 digits) are rewritten to the new 8-digit width, and the
+    # counter starts above the whole legacy range so old and new IDs can never collide.
+    db.execute("CREATE TABLE IF NOT EXISTS id_sequence (name TEXT PRIMARY KEY, next_value INTEGER NOT NULL)")
+    legacy = "P[0-9][0-9][0-9][0-9][0-9]"
+    for table in ["admission", "nurse_treatment", "rooms"]:
+        db.execute(f"UPDATE {table} SET patient_id = 'P' || printf('%08d', substr(patient_id, 2)) WHERE patient_id GLOB '{legacy}'")
+    db.execute("INSERT OR IGNORE INTO id_sequence (name, next_value) VALUES ('patient', ?)", (LEGACY_PATIENT_ID_LIMIT,))
+
+
+ROOM_STATUSES = ["Available", "Occupied", "Cleaning"]
+
+
+def migration_5_counters(db):
+    # Totals for the dashboard, kept current by triggers so reading them never counts
+    # rows. Keys: 'admission', 'doctors', 'nurses' and 'rooms:<type>:<status>'.
+    db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID")
+    for table in ["admission", "doctors", "nurses"]:
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_count_ai AFTER INSERT ON {table} BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = '{table}';
+        END""")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_count_ad AFTER DELETE ON {table} BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = '{table}';
+        END""")
+
+    room_key = "'rooms:' || ifnull({0}.type, '') || ':' || ifnull({0}.status, '')"
+    add_room = f"""INSERT INTO counters (name, value) VALUES ({room_key.format("new")}, 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;"""
+    remove_room = f"""UPDATE counters SET value = value - 1 WHERE name = {room_key.format("old")};"""
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS rooms_count_ai AFTER INSERT ON rooms BEGIN {add_room} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS rooms_count_ad AFTER DELETE ON rooms BEGIN {remove_room} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS rooms_count_au AFTER UPDATE OF type, status ON rooms BEGIN {remove_room} {add_room} END")
+
+    # Start from the real counts
+    db.execute("DELETE FROM counters")
+    for table in ["admission", "doctors", "nurses"]:
+        db.execute(f"INSERT INTO counters (name, value) SELECT '{table}', COUNT(*) FROM {table}")
+    db.execute(f"INSERT INTO counters (name, value) SELECT {room_key.format('rooms')}, COUNT(*) FROM rooms GROUP BY type, status")
+
+
+# Tables whose rows carry an updated_at change timestamp (UTC, millisecond precision),
+# set by triggers on every insert and update, and from migration 13 a change_seq in
+# commit order for incremental exports.
+CHANGE_TRACKED = ["admission", "nurse_treatment", "rooms"]
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def migration_6_change_timestamps(db):
+    for table in CHANGE_TRACKED:
+        cols = [r[1] for r in db.execute(f"PRAGMA table_info({table})")]
+        if "updated_at" not in cols:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TEXT")
+        db.execute(f"UPDATE {table} SET updated_at = {NOW_SQL} WHERE updated_at IS NULL")
+        db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at)")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_stamp_ai AFTER INSERT ON {table} BEGIN
+            UPDATE {table} SET updated_at = {NOW_SQL} WHERE rowid = new.rowid;
+        END""")
+        # The WHEN stops the trigger's own UPDATE from stamping the row again
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_stamp_au AFTER UPDATE ON {table}
+            WHEN new.updated_at IS old.updated_at BEGIN
+            UPDATE {table} SET updated_at = {NOW_SQL} WHERE rowid = new.rowid;
+        END""")
+
+    # Where each named export (e.g. "insurer") got to, per table
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS export_state (
+        name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        last_updated_at TEXT NOT NULL,
+        exported_at TEXT NOT NULL,
+        PRIMARY KEY (name, table_name)
+    ) WITHOUT ROWID
+    """)
+
+
+def migration_7_tariffs_and_bills(db):
+    # Prices, editable without a code change. 'room:<type>' is a day rate,
+    # 'room_default' the day rate for types without their own entry, fees are per bill.
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS tariffs (
+        item TEXT PRIMARY KEY,
+        amount INTEGER NOT NULL,
+        changed_at TEXT NOT NULL
+    ) WITHOUT ROWID
+    """)
+    db.executemany(f"INSERT OR IGNORE INTO tariffs (item, amount, changed_at) VALUES (?, ?, {NOW_SQL})", [
+        ("room:Private", 2500), ("room:Shared", 1500), ("room:ICU", 5000), ("room:General", 1000),
+        ("room_default", 1200), ("doctor_fee", 700), ("nursing_fee", 400), ("service_fee", 200),
+    ])
+
+    # One row per patient per billing run (e.g. run '2026-10' for the October run)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS bills (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        patient_id TEXT NOT NULL,
+        billed_at TEXT NOT NULL,
+        admit_date TEXT,
+        room_no TEXT,
+        room_type TEXT,
+        days INTEGER NOT NULL,
+        room_rate INTEGER NOT NULL,
+        room_cost INTEGER NOT NULL,
+        doctor_fee INTEGER NOT NULL,
+        nursing_fee INTEGER NOT NULL,
+        service_fee INTEGER NOT NULL,
+        extra INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL
+    )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_bills_run_patient ON bills (run, patient_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_bills_patient ON bills (patient_id, billed_at)")
+
+
+# Watched tables and the column that identifies a row in change_log
+CHANGE_FEED = {"admission": "patient_id", "rooms": "room_no", "doctors": "id", "nurses": "id"}
+CHANGE_LOG_KEEP = 20000
+
+
+def migration_8_change_log(db):
+    # One entry per inserted, updated or deleted row of the CHANGE_FEED tables, so a
+    # terminal can patch its open lists with just the rows other terminals changed
+    # (see changes_since). Only about the newest CHANGE_LOG_KEEP entries are kept; a
+    # terminal that falls further behind reloads instead. row_key has no type, so
+    # keys keep their column's type.
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_key,
+        op TEXT NOT NULL
+    )
+    """)
+    for table, key in CHANGE_FEED.items():
+        log = f"INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', %s.{key}, '%s')"
+        # On stamped tables, skip the updated_at stamp's own UPDATE (same WHEN as the stamp)
+        when = "WHEN new.updated_at IS old.updated_at" if table in CHANGE_TRACKED else ""
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_log_ai AFTER INSERT ON {table} BEGIN {log % ('new', 'insert')}; END")
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_log_au AFTER UPDATE ON {table} {when} BEGIN {log % ('new', 'update')}; END")
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_log_ad AFTER DELETE ON {table} BEGIN {log % ('old', 'delete')}; END")
+        # A changed key: the row under the old key is gone
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_log_rekey AFTER UPDATE OF {key} ON {table}
+            WHEN new.{key} IS NOT old.{key} BEGIN {log % ('old', 'delete')}; END""")
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS change_log_trim AFTER INSERT ON change_log
+        WHEN new.seq % 1000 = 0 BEGIN
+        DELETE FROM change_log WHERE seq <= new.seq - {CHANGE_LOG_KEEP};
+    END""")
+
+
+def migration_9_discharge_archive(db):
+    # Discharged patients move out of admission into one discharged_YYYY_MM table per
+    # month of discharge (created on first use, see DISCHARGE ARCHIVE). The catalog
+    # lists the months that have a table, and the index which months hold a patient.
+    db.execute("CREATE TABLE IF NOT EXISTS discharge_months (month TEXT PRIMARY KEY) WITHOUT ROWID")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS discharge_index (
+        patient_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        PRIMARY KEY (patient_id, month)
+    ) WITHOUT ROWID
+    """)
+    create_discharged_view(db)
+
+
+# Admission, discharge and room status events, and their hourly and daily rollups
+# (see ROLLUPS). Buckets are local time, like admit_date and discharged_at.
+EVENTS_KEEP = 100000
+LOCAL_NOW_SQL = "strftime('%Y-%m-%d %H:%M', 'now', 'localtime')"
+ROLLUP_GRAINS = {"hour": "rollup_hourly", "day": "rollup_daily"}
+
+
+def bucket_sql(at, grain):
+    # "YYYY-MM-DD HH" or "YYYY-MM-DD" for a time column; a bare date falls in its first hour
+    if grain == "day":
+        return f"substr({at}, 1, 10)"
+    return f"CASE WHEN length({at}) >= 13 THEN substr({at}, 1, 13) ELSE substr({at}, 1, 10) || ' 00' END"
+
+
+def create_discharge_event_trigger(db, table):
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_event_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO events (at, kind, room_type, subject, value)
+        VALUES (new.discharged_at, 'discharge', ifnull(new.room_type, ''), ifnull(new.doctor_name, ''), ifnull(new.days, 0));
+    END""")
+
+
+def migration_10_rollups(db):
+    # Triggers turn admissions, discharges (rows added to a discharge partition) and
+    # room status changes into events, and each event adds itself to the buckets of
+    # both grains, so charts read a handful of rows whatever the history's length.
+    # Metrics (dim): admissions (''), admissions_by_doctor (doctor), and by room type
+    # admissions_by_type, discharges, stay_days, occupied (occupied rooms after the
+    # bucket's last change) and occupied_peak. Only the newest EVENTS_KEEP events are kept;
+    # backfill_rollups rebuilds the rollups from the archive.
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY,
+        at TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        room_type TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        value INTEGER NOT NULL
+    )
+    """)
+    db.execute("CREATE TABLE IF NOT EXISTS occupancy (room_type TEXT PRIMARY KEY, occupied INTEGER NOT NULL) WITHOUT ROWID")
+    for table in ROLLUP_GRAINS.values():
+        db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            metric TEXT NOT NULL,
+            dim TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (metric, dim, bucket)
+        ) WITHOUT ROWID
+        """)
+
+    event = "INSERT INTO events (at, kind, room_type, subject, value) VALUES"
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS admission_event_ai AFTER INSERT ON admission BEGIN
+        {event} (ifnull(new.admit_date, {LOCAL_NOW_SQL}), 'admit',
+                 ifnull((SELECT type FROM rooms WHERE room_no = new.room_no), ''), ifnull(new.doctor_name, ''), 1);
+    END""")
+    occupied = "(new.status = 'Occupied') - (old.status = 'Occupied')"
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS rooms_event_au AFTER UPDATE OF status ON rooms
+        WHEN new.status IS NOT old.status BEGIN
+        {event} ({LOCAL_NOW_SQL}, 'room', ifnull(new.type, ''), ifnull(new.status, ''), ifnull({occupied}, 0));
+    END""")
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS rooms_event_ai AFTER INSERT ON rooms WHEN new.status = 'Occupied' BEGIN
+        {event} ({LOCAL_NOW_SQL}, 'room', ifnull(new.type, ''), new.status, 1);
+    END""")
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS rooms_event_ad AFTER DELETE ON rooms WHEN old.status = 'Occupied' BEGIN
+        {event} ({LOCAL_NOW_SQL}, 'room', ifnull(old.type, ''), 'Deleted', -1);
+    END""")
+    for month, in db.execute("SELECT month FROM discharge_months").fetchall():
+        create_discharge_event_trigger(db, discharge_partition(month))
+
+    def add(metric, dim, value):
+        return "".join(f"""
+            INSERT INTO {table} (metric, dim, bucket, value) VALUES ('{metric}', {dim}, {bucket_sql('new.at', grain)}, {value})
+            ON CONFLICT (metric, dim, bucket) DO UPDATE SET value = value + excluded.value;"""
+                       for grain, table in ROLLUP_GRAINS.items())
+
+    def level(metric, merge):
+        current = "(SELECT occupied FROM occupancy WHERE room_type = new.room_type)"
+        return "".join(f"""
+            INSERT INTO {table} (metric, dim, bucket, value) VALUES ('{metric}', new.room_type, {bucket_sql('new.at', grain)}, {current})
+            ON CONFLICT (metric, dim, bucket) DO UPDATE SET value = {merge};"""
+                       for grain, table in ROLLUP_GRAINS.items())
+
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS events_rollup_admit AFTER INSERT ON events WHEN new.kind = 'admit' BEGIN
+        {add('admissions', "''", 1)}
+        {add('admissions_by_doctor', 'new.subject', 1)}
+        {add('admissions_by_type', 'new.room_type', 1)}
+    END""")
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS events_rollup_discharge AFTER INSERT ON events WHEN new.kind = 'discharge' BEGIN
+        {add('discharges', 'new.room_type', 1)}
+        {add('stay_days', 'new.room_type', 'new.value')}
+    END""")
+    # One trigger, so the level is moved before the buckets read it
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS events_rollup_room AFTER INSERT ON events
+        WHEN new.kind = 'room' AND new.value <> 0 BEGIN
+        INSERT INTO occupancy (room_type, occupied) VALUES (new.room_type, new.value)
+            ON CONFLICT (room_type) DO UPDATE SET occupied = occupied + excluded.occupied;
+        {level('occupied', 'excluded.value')}
+        {level('occupied_peak', 'max(value, excluded.value)')}
+    END""")
+    db.execute(f"""CREATE TRIGGER IF NOT EXISTS events_trim AFTER INSERT ON events
+        WHEN new.seq % 1000 = 0 BEGIN
+        DELETE FROM events WHERE seq <= new.seq - {EVENTS_KEEP};
+    END""")
+    reset_occupancy(db)
+
+
+def migration_11_stay_lengths(db):
+    # Finished stays per (room type, billed days): the whole archive's length of stay
+    # distribution in a few hundred rows, for the occupancy forecast. Kept by the
+    # discharge events and rebuilt by backfill_rollups.
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS stay_lengths (
+        room_type TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        stays INTEGER NOT NULL,
+        PRIMARY KEY (room_type, days)
+    ) WITHOUT ROWID
+    """)
+    db.execute("""CREATE TRIGGER IF NOT EXISTS events_stay_length AFTER INSERT ON events
+        WHEN new.kind = 'discharge' AND new.value >= 1 BEGIN
+        INSERT INTO stay_lengths (room_type, days, stays) VALUES (new.room_type, new.value, 1)
+            ON CONFLICT (room_type, days) DO UPDATE SET stays = stays + 1;
+    END""")
+    db.execute("DELETE FROM stay_lengths")
+    db.execute("INSERT INTO stay_lengths (room_type, days, stays) SELECT ifnull(room_type, ''), days, COUNT(*) FROM discharged WHERE days >= 1 GROUP BY 1, 2")
+
+
+def migration_12_nurse_assignment(db):
+    # The nurse looking after each admitted patient, by nurse id, so per-nurse load
+    # is an index count (see hospital_workload). Assignments change with admission
+    # rows and so follow its change feed, and leave with the row on discharge.
+    # Existing patients get the nurse of their latest treatment record.
+    cols = [r[1] for r in db.execute("PRAGMA table_info(admission)")]
+    if "nurse_id" not in cols:
+        db.execute("ALTER TABLE admission ADD COLUMN nurse_id INTEGER")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_admission_nurse ON admission (nurse_id, patient_id)")
+    # Only rows that get a nurse are written (each write is stamped and logged)
+    db.execute("""UPDATE admission SET nurse_id = latest.nurse_id FROM (
+        SELECT a.patient_id, (SELECT n.id FROM nurse_treatment t JOIN nurses n ON n.name = t.nurse_name
+                              WHERE t.patient_id = a.patient_id ORDER BY t.date DESC, t.id DESC, n.id LIMIT 1) AS nurse_id
+        FROM admission a WHERE a.nurse_id IS NULL) AS latest
+    WHERE admission.patient_id = latest.patient_id AND latest.nurse_id IS NOT NULL""")
+
+
+def migration_13_change_seq(db):
+    # updated_at is stamped when a row is written, not when its transaction commits, so
+    # an incremental export cut off at a time can miss rows of a transaction that was
+    # still open. Writers take turns, so a counter bumped inside each write is in
+    # commit order: rows also get change_seq from the 'change' row of id_sequence, and
+    # an export that read the counter at n has seen every row up to n (see
+    # hospital_export). Rows no export has been past yet are numbered in updated_at
+    # order and each export's position moves from its time to that numbering.
+    db.execute("INSERT OR IGNORE INTO id_sequence (name, next_value) VALUES ('change', 0)")
+    export_cols = [r[1] for r in db.execute("PRAGMA table_info(export_state)")]
+    if "last_seq" not in export_cols:
+        db.execute("ALTER TABLE export_state ADD COLUMN last_seq INTEGER NOT NULL DEFAULT 0")
+    for table in CHANGE_TRACKED:
+        cols = [r[1] for r in db.execute(f"PRAGMA table_info({table})")]
+        if "change_seq" not in cols:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+        db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_change_seq ON {table} (change_seq)")
+        if "last_updated_at" in export_cols:
+            db.execute(f"""UPDATE {table} SET change_seq = (SELECT next_value FROM id_sequence WHERE name = 'change') + pending.n FROM (
+                SELECT rowid AS row, row_number() OVER (ORDER BY updated_at, rowid) AS n FROM {table}
+                WHERE updated_at > (SELECT min(last_updated_at) FROM export_state WHERE table_name = '{table}')) AS pending
+            WHERE {table}.rowid = pending.row""")
+            db.execute(f"""UPDATE id_sequence SET next_value = max(next_value, (SELECT ifnull(max(change_seq), 0) FROM {table}))
+                          WHERE name = 'change'""")
+            db.execute(f"""UPDATE export_state SET last_seq = ifnull((SELECT change_seq FROM {table} WHERE updated_at <= last_updated_at
+                                                                ORDER BY updated_at DESC, rowid DESC LIMIT 1), 0)
+                          WHERE table_name = '{table}'""")
+        for trigger in ["ai", "au"]:
+            db.execute(f"DROP TRIGGER IF EXISTS {table}_stamp_{trigger}")
+        stamp = f"""UPDATE id_sequence SET next_value = next_value + 1 WHERE name = 'change';
+            UPDATE {table} SET updated_at = {NOW_SQL}, change_seq = (SELECT next_value FROM id_sequence WHERE name = 'change')
+            WHERE rowid = new.rowid;"""
+        db.execute(f"CREATE TRIGGER {table}_stamp_ai AFTER INSERT ON {table} BEGIN {stamp} END")
+        db.execute(f"CREATE TRIGGER {table}_stamp_au AFTER UPDATE ON {table} WHEN new.updated_at IS old.updated_at BEGIN {stamp} END")
+    if "last_updated_at" in export_cols:
+        db.execute("ALTER TABLE export_state DROP COLUMN last_updated_at")
+
+
+def migration_14_bill_patient_details(db):
+    # Bills keep the patient's name, disease and doctor as billed, so a run still prints
+    # in full once its patients are discharged (archived out of admission). Existing
+    # bills take them from the admission, or else from the patient's archived stay.
+    cols = [r[1] for r in db.execute("PRAGMA table_info(bills)")]
+    for col in ["patient_name", "disease", "doctor_name"]:
+        if col not in cols:
+            db.execute(f"ALTER TABLE bills ADD COLUMN {col} TEXT")
+    copy = """UPDATE bills SET patient_name = s.patient_name, disease = s.disease, doctor_name = s.doctor_name
+              FROM {} AS s WHERE s.patient_id = bills.patient_id AND bills.patient_name IS NULL"""
+    db.execute(copy.format("admission"))
+    for month, in db.execute("SELECT month FROM discharge_months").fetchall():
+        db.execute(copy.format(discharge_partition(month)))
+
+
+def stamp_changes(db, table):
+    # Stamp the rows of `table` written with its stamp triggers dropped (bulk import):
+    # one change_seq for all of them, as they commit together
+    seq = db.execute("UPDATE id_sequence SET next_value = next_value + 1 WHERE name = 'change' RETURNING next_value").fetchone()[0]
+    db.execute(f"UPDATE {table} SET updated_at = {NOW_SQL}, change_seq = ? WHERE updated_at IS NULL", (seq,))
+
+
+def replay_events(db, table):
+    # Log the events the event triggers of `table` missed for rows written while they
+    # were dropped (bulk import), i.e. the rows without an updated_at stamp yet. The
+    # events table's own triggers then bring the rollups up to date as usual.
+    if table == "admission":
+        db.execute(f"""INSERT INTO events (at, kind, room_type, subject, value)
+            SELECT ifnull(a.admit_date, {LOCAL_NOW_SQL}), 'admit', ifnull(r.type, ''), ifnull(a.doctor_name, ''), 1
+            FROM admission a LEFT JOIN rooms r ON r.room_no = a.room_no WHERE a.updated_at IS NULL""")
+    elif table == "rooms":
+        db.execute(f"""INSERT INTO events (at, kind, room_type, subject, value)
+            SELECT {LOCAL_NOW_SQL}, 'room', ifnull(type, ''), status, 1 FROM rooms WHERE updated_at IS NULL AND status = 'Occupied'""")
+
+
+def reset_occupancy(db):
+    db.execute("DELETE FROM occupancy")
+    db.execute("INSERT INTO occupancy (room_type, occupied) SELECT ifnull(type, ''), total(status = 'Occupied') FROM rooms GROUP BY type")
+
+
+def recount(db):
+    # Recompute every counter from the tables, for when rows were written with the
+    # counter triggers out of the way (bulk import). Same keys as migration 5.
+    room_key = "'rooms:' || ifnull(type, '') || ':' || ifnull(status, '')"
+    db.execute("DELETE FROM counters")
+    for table in ["admission", "doctors", "nurses"]:
+        db.execute(f"INSERT INTO counters (name, value) SELECT '{table}', COUNT(*) FROM {table}")
+    db.execute(f"INSERT INTO counters (name, value) SELECT {room_key}, COUNT(*) FROM rooms GROUP BY type, status")
+
+
+MIGRATIONS = [
+    migration_1_base_schema,
+    migration_2_list_paging_and_staff_search,
+    migration_3_hot_path_indexes,
+    migration_4_patient_id_sequence,
+    migration_5_counters,
+    migration_6_change_timestamps,
+    migration_7_tariffs_and_bills,
+    migration_8_change_log,
+    migration_9_discharge_archive,
+    migration_10_rollups,
+    migration_11_stay_lengths,
+    migration_12_nurse_assignment,
+    migration_13_change_seq,
+    migration_14_bill_patient_details,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db):
+    # Bring the schema up to SCHEMA_VERSION. Each step runs in its own transaction
+    # together with its user_version bump, so a failed step leaves the database at
+    # the previous version and is retried on the next start.
+    if db.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    while True:
+        # BEGIN IMMEDIATE takes the write lock, so two terminals starting at once
+        # can't both apply the same step; re-read the version once we hold it.
+        db.execute("BEGIN IMMEDIATE")
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            db.rollback()
+            return
+        try:
+            MIGRATIONS[version](db)
+            db.execute(f"PRAGMA user_version = {version + 1}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+
+# ---------------------- PATIENT IDS ----------------------
+LEGACY_PATIENT_ID_LIMIT = 100000  # old IDs were "P" + random 10000..99999
+
+
+class SequenceIdAllocator:
+    # Allocates IDs from a counter row in id_sequence. Call allocate() inside the write
+    # transaction that uses the IDs: the counter bump then commits or rolls back with
+    # the rows, and other processes wait on the write lock instead of racing, so IDs
+    # are unique across terminals. Cost is one indexed UPDATE per call, whatever the
+    # table size, and `count` IDs are reserved at once for batches.
+    def __init__(self, name, prefix, width):
+        self.name = name
+        self.prefix = prefix
+        self.width = width
+
+    def allocate(self, db, count=1):
+        end = db.execute("UPDATE id_sequence SET next_value = next_value + ? WHERE name = ? RETURNING next_value",
+                         (count, self.name)).fetchone()[0]
+        return [self.format(n) for n in range(end - count, end)]
+
+    def format(self, n):
+        return f"{self.prefix}{n:0{self.width}d}"
+
+
+# Any object with allocate(db, count) -> [ids] can be swapped in here
+patient_id_allocator = SequenceIdAllocator("patient", prefix="P", width=8)
+
+
+def normalize_patient_id(text):
+    # Accept IDs as printed before the switch to 8 digits (e.g. "P12345" -> "P00012345")
+    text = text.strip().upper()
+    if text[:1] == "P" and text[1:].isdigit() and len(text) - 1 < patient_id_allocator.width:
+        return patient_id_allocator.format(int(text[1:]))
+    return text
+
+
+class Connection(sqlite3.Connection):
+    # Where changes_since last looked: ((data_version, total_changes), newest seq)
+    feed_state = None
+
+
+def connect(db_path=DB_PATH):
+    # WAL lets readers (other pages, other terminals) keep going while one write
+    # commits, and each commit costs a single fsync of the log.
+    db = sqlite3.connect(db_path, timeout=10, factory=Connection)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+
+@contextmanager
+def write_transaction(db):
+    # BEGIN IMMEDIATE takes the write lock up front, so checks made inside the
+    # transaction (e.g. "is this room still available?") can't be invalidated by
+    # another terminal before we commit. Everything inside commits once, or not at all.
+    # Inside another write transaction (generate running several imports as one) it
+    # is a savepoint: the outer transaction holds the lock and commits everything.
+    if db.in_transaction:
+        db.execute("SAVEPOINT nested_write")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK TO nested_write")
+            db.execute("RELEASE nested_write")
+            raise
+        db.execute("RELEASE nested_write")
+        return
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+
+
+def write_atomic(path, data):
+    # Readers see the old file or the whole new one, never a partial write
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class RoomUnavailableError(Exception):
+    def __init__(self, room_no):
+        super().__init__(f"Room {room_no} is no longer available.")
+        self.room_no = room_no
+
+
+class NurseUnavailableError(Exception):
+    def __init__(self, nurse_id):
+        super().__init__(f"Nurse {nurse_id} is no longer on the staff.")
+        self.nurse_id = nurse_id
+
+
+def open_database(db_path=DB_PATH):
+    # Connection with the schema brought up to date; what scripts and the CLI start from
+    db = connect(db_path)
+    migrate(db)
+    return db
+
+
+# ---------------------- KEYSET PAGING ----------------------
+class KeysetSource:
+    # Pages through a table in ORDER BY order. Each page continues from the key of the
+    # last row seen, so with an index on the ORDER BY columns every page costs the same
+    # no matter how deep into the list it is. The ORDER BY columns must be unique together.
+    # descending=True lists them largest first (newest first, for dates).
+    def __init__(self, table, columns, order_by, where="", params=(), descending=False):
+        self.table = table
+        self.columns = list(columns)
+        self.order_by = list(order_by)
+        self.where = where
+        self.params = tuple(params)
+        self.descending = descending
+        self.key_index = [self.columns.index(c) for c in self.order_by]
+        # (function name, args) for sources built by the named functions below, which
+        # is how a client asks the API server for the same list without sending SQL
+        self.spec = None
+
+    def key(self, row):
+        return tuple(row[i] for i in self.key_index)
+
+    def _select(self, condition="", condition_params=(), backwards=False):
+        clauses = [c for c in (self.where, condition) if c]
+        sql = f"SELECT {', '.join(self.columns)} FROM {self.table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        direction = " DESC" if self.descending != backwards else ""
+        sql += " ORDER BY " + ", ".join(c + direction for c in self.order_by)
+        return sql, self.params + tuple(condition_params)
+
+    def _key_condition(self, op):
+        cols = ", ".join(self.order_by)
+        marks = ", ".join("?" for _ in self.order_by)
+        return f"({cols}) {op} ({marks})"
+
+    def count(self, conn):
+        sql = f"SELECT COUNT(*) FROM {self.table}"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return conn.execute(sql, self.params).fetchone()[0]
+
+    def after(self, conn, key, limit):
+        if key is None:
+            sql, params = self._select()
+        else:
+            sql, params = self._select(self._key_condition("<" if self.descending else ">"), key)
+        return conn.execute(sql + " LIMIT ?", params + (limit,)).fetchall()
+
+    def before(self, conn, key, limit):
+        sql, params = self._select(self._key_condition(">" if self.descending else "<"), key, backwards=True)
+        return conn.execute(sql + " LIMIT ?", params + (limit,)).fetchall()[::-1]
+
+    def at(self, conn, offset, limit):
+        # Only used when the scrollbar is dragged to an arbitrary position
+        sql, params = self._select()
+        return conn.execute(sql + " LIMIT ? OFFSET ?", params + (limit, offset)).fetchall()
+
+    def changed(self, conn, keys):
+        # (row count, current rows among `keys`) for patching a list after those rows
+        # changed; the first column identifies a row, as in change_log
+        sql, params = self._select(f"{self.columns[0]} IN (SELECT value FROM json_each(?))", (json.dumps(keys),))
+        return self.count(conn), conn.execute(sql, params).fetchall()
+
+    def rows(self, conn, page_size=1000):
+        # Every row in order, one page in memory at a time
+        key = None
+        while True:
+            page = self.after(conn, key, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            key = self.key(page[-1])
+
+
+def staff_search_source(table, columns, text):
+    # Three or more characters go through the trigram index (substring match on any
+    # field); shorter input can't be trigram-indexed, so it matches name prefixes.
+    where, params = "", ()
+    if len(text) >= 3:
+        where = f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)"
+        params = ('"' + text.replace('"', '""') + '"',)
+    elif text:
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where = "name LIKE ? ESCAPE '\\'"
+        params = (escaped + "%",)
+    source = KeysetSource(table, columns, ["name", "id"], where, params)
+    source.spec = ("staff_search_source", [table, list(columns), text])
+    return source
+
+
+def admitted_patients_source():
+    source = KeysetSource("admission", ["patient_id", "patient_name", "disease", "doctor_name", "room_no"],
+                          order_by=["patient_name", "patient_id"])
+    source.spec = ("admitted_patients_source", [])
+    return source
+
+
+def rooms_source():
+    source = KeysetSource("rooms", ["room_no", "type", "status", "patient_id"], order_by=["room_no"])
+    source.spec = ("rooms_source", [])
+    return source
+
+
+def nurse_history_source(patient_id):
+    # A patient's treatment records, newest first; pages seek idx_nurse_treatment_patient_date,
+    # whose entries end in the rowid (id) that breaks ties between same-minute notes
+    source = KeysetSource("nurse_treatment", ["id", "nurse_name", "nurse_notes", "shift", "prescription", "date"],
+                          order_by=["date", "id"], where="patient_id = ?", params=(patient_id,), descending=True)
+    source.spec = ("nurse_history_source", [patient_id])
+    return source
+
+
+# ---------------------- CHANGE FEED ----------------------
+def changes_since(conn, seq=None):
+    # (newest seq, {table: [row keys]}) for changes logged after seq. A table maps to
+    # None when its changes can't be listed (bulk import, or seq fell out of the log):
+    # lists of it should reload. seq=None only returns the seq to start from.
+    # PRAGMA data_version only moves when another connection commits, and
+    # total_changes counts this connection's own writes; while both stand still the
+    # newest seq can't have moved either, so an idle poll reads no table at all.
+    version = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+    if conn.feed_state and conn.feed_state[0] == version:
+        newest = conn.feed_state[1]
+    else:
+        newest = conn.execute("SELECT ifnull(max(seq), 0) FROM change_log").fetchone()[0]
+        conn.feed_state = (version, newest)
+    if seq is None or seq == newest:
+        return newest, {}
+    oldest = conn.execute("SELECT min(seq) FROM change_log").fetchone()[0]
+    if seq > newest or oldest is None or oldest > seq + 1:
+        return newest, {table: None for table in CHANGE_FEED}
+    changes = {}
+    for table, key, op in conn.execute("SELECT table_name, row_key, op FROM change_log WHERE seq > ? AND seq <= ? ORDER BY seq",
+                                       (seq, newest)):
+        if op == "reload":
+            changes[table] = None
+        elif changes.get(table, ()) is not None:
+            changes.setdefault(table, {})[key] = None
+    return newest, {table: None if keys is None else list(keys) for table, keys in changes.items()}
+
+
+# ---------------------- ROOM ALLOCATION ----------------------
+class RoomIndex:
+    # Available rooms per type, each a sorted list of room numbers, so the best fit
+    # for a type (and optionally a ward, i.e. a room number prefix such as "2" for
+    # the second floor) is one bisect: O(log n) instead of a query per render.
+    # Rooms sort as strings, so numbering is assumed to be fixed width per ward.
+    #
+    # Functions here that change a room's status call invalidate(); changes made by
+    # other terminals are noticed through a cheap token (newest rooms.updated_at plus
+    # the room counters' total) checked before each use, which rebuilds the index
+    # when it moved. The API server uses it from several threads without locking: a
+    # refresh swaps in a whole new by_type, and one that raced a write leaves a
+    # token the next refresh no longer matches.
+    def __init__(self):
+        self.by_type = {}
+        self.token = None
+
+    def invalidate(self):
+        self.token = None
+
+    def refresh(self, conn):
+        token = conn.execute("""SELECT (SELECT max(updated_at) FROM rooms),
+                                       (SELECT total(value) FROM counters WHERE name >= 'rooms:' AND name < 'rooms;')""").fetchone()
+        if token == self.token:
+            return self
+        by_type = {}
+        for room_no, room_type in conn.execute("SELECT room_no, type FROM rooms WHERE status='Available'"):
+            by_type.setdefault(room_type or "General", []).append(room_no)
+        for rooms in by_type.values():
+            rooms.sort()
+        self.by_type = by_type
+        self.token = token
+        return self
+
+    def types(self):
+        return sorted(self.by_type)
+
+    def matches(self, room_type=None, prefix="", limit=50):
+        # Available rooms of the type (any type if None) starting with prefix, best fit first
+        found = []
+        for t in ([room_type] if room_type else self.types()):
+            rooms = self.by_type.get(t, [])
+            i = bisect_left(rooms, prefix)
+            end = min(i + limit, len(rooms))
+            while i < end and rooms[i].startswith(prefix):
+                found.append(rooms[i])
+                i += 1
+        return sorted(found)[:limit]
+
+    def best_fit(self, room_type=None, prefix=""):
+        # Lowest numbered available room of the type in the ward, or None
+        best = None
+        for t in ([room_type] if room_type else self.by_type):
+            rooms = self.by_type.get(t, [])
+            i = bisect_left(rooms, prefix)
+            if i < len(rooms) and rooms[i].startswith(prefix) and (best is None or rooms[i] < best):
+                best = rooms[i]
+        return best
+
+
+room_index = RoomIndex()
+
+
+# ---------------------- DATA ACCESS ----------------------
+# Every query the app runs lives here. Each function takes the connection to use,
+# so the UI can run them on the background DBExecutor instead of the Tk thread.
+def dashboard_counts(conn):
+    # {counter name: value} from the trigger-maintained counters table
+    return dict(conn.execute("SELECT name, value FROM counters"))
+
+
+def admission_choices(conn):
+    # Doctors and types of the rooms available right now; nurses come from
+    # hospital_workload.nurse_choices, least loaded first
+    doctors = [d[0] for d in conn.execute("SELECT name FROM doctors ORDER BY name")]
+    room_types = room_index.refresh(conn).types()
+    return doctors, room_types
+
+
+def room_choices(conn, room_type=None, prefix="", limit=50):
+    # (best fit, matching available rooms) for the room picker
+    index = room_index.refresh(conn)
+    return index.best_fit(room_type, prefix), index.matches(room_type, prefix, limit)
+
+
+PATIENT_FIELDS = ["name", "age", "contact", "gender", "disease", "blood_group", "doctor"]
+NURSE_HISTORY_PAGE = 25  # treatment records per "load more"
+ACTIVE_PRESCRIPTION_WINDOW = "-3 days"  # SQLite date modifier, counted back from the last note
+ACTIVE_PRESCRIPTIONS_SHOWN = 8
+
+
+def validate_patient(patient):
+    # Error message for an admission that can't be saved, or None if it's fine
+    return validate_patient_values([str(patient.get(k) or "").strip() for k in PATIENT_FIELDS])
+
+
+def validate_patient_values(values):
+    # Same check on stripped values in PATIENT_FIELDS order (the bulk importer's fast path)
+    if not all(values):
+        return "Please fill all patient fields and select a doctor."
+    return None
+
+
+def validate_doctor(name):
+    return None if name.strip() else "Doctor name is required."
+
+
+def validate_nurse(name):
+    return None if name.strip() else "Nurse name is required."
+
+
+def validate_room(room_no, status):
+    if not room_no.strip():
+        return "Room number required"
+    if status not in ROOM_STATUSES:
+        return f"Room status must be one of {', '.join(ROOM_STATUSES)}"
+    return None
+
+
+def admit_patient(conn, patient, room_no, nurse_id=None):
+    return admit_patients(conn, [(patient, room_no, nurse_id)])[0]
+
+
+def admit_patients(conn, admissions):
+    # Admit a batch of (patient, room_no, nurse_id) in one transaction: one commit
+    # (one fsync) for the whole batch, e.g. for mass-casualty intake. Each room is
+    # reserved only if it is still Available; if any room was taken meanwhile the
+    # whole batch is rolled back and RoomUnavailableError is raised (likewise
+    # NurseUnavailableError for a nurse removed meanwhile).
+    admit_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+    room_index.invalidate()
+    with write_transaction(conn):
+        patient_ids = patient_id_allocator.allocate(conn, len(admissions))
+        for (patient, room_no, nurse_id), patient_id in zip(admissions, patient_ids):
+
+            # Reserve the room
+            cur = conn.execute("UPDATE rooms SET status='Occupied', patient_id=? WHERE room_no=? AND status='Available'", (patient_id, room_no))
+            if cur.rowcount != 1:
+                raise RoomUnavailableError(room_no)
+
+            nurse = None
+            if nurse_id is not None:
+                nurse = conn.execute("SELECT name FROM nurses WHERE id=?", (nurse_id,)).fetchone()
+                if nurse is None:
+                    raise NurseUnavailableError(nurse_id)
+
+            conn.execute("INSERT INTO admission (patient_id, patient_name, age, contact, gender, disease, admit_date, blood_group, doctor_name, room_no, nurse_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (patient_id, patient["name"], patient["age"], patient["contact"], patient["gender"], patient["disease"],
+                          admit_date, patient["blood_group"], patient["doctor"], room_no, nurse_id))
+
+            # add a nurse to patient if selected
+            if nurse:
+                conn.execute("INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date) VALUES (?, ?, ?, ?, ?, ?)",
+                             (patient_id, nurse[0], "Assigned on admission", "", "", admit_date))
+    return patient_ids
+
+
+def patient_details(conn, patient_id, notes=NURSE_HISTORY_PAGE):
+    # (admission row, nurse_summary, first page of nurse_history_source); later pages
+    # are fetched from the source as the user asks for them
+    data = conn.execute("SELECT patient_id, patient_name, age, contact, gender, disease, admit_date, blood_group, doctor_name, room_no FROM admission WHERE patient_id=?", (patient_id,)).fetchone()
+    if not data:
+        return None, None, []
+    return data, nurse_summary(conn, patient_id), nurse_history_source(patient_id).after(conn, None, notes)
+
+
+def nurse_summary(conn, patient_id):
+    # (note count, last shift, last note date, [active prescriptions]) from index seeks
+    # only: the count walks the patient's index entries, the last note is the top one,
+    # and prescriptions are those written in the ACTIVE_PRESCRIPTION_WINDOW before the
+    # last note, newest first
+    count = conn.execute("SELECT COUNT(*) FROM nurse_treatment WHERE patient_id=?", (patient_id,)).fetchone()[0]
+    last = conn.execute("SELECT shift, date FROM nurse_treatment WHERE patient_id=? ORDER BY date DESC, id DESC LIMIT 1",
+                        (patient_id,)).fetchone()
+    if not last:
+        return count, None, None, []
+    prescriptions = conn.execute("""
+        SELECT prescription FROM nurse_treatment
+        WHERE patient_id=? AND date >= strftime('%Y-%m-%d %H:%M', ?, ?) AND prescription <> ''
+        GROUP BY prescription ORDER BY MAX(date) DESC LIMIT ?""",
+                                 (patient_id, last[1], ACTIVE_PRESCRIPTION_WINDOW, ACTIVE_PRESCRIPTIONS_SHOWN)).fetchall()
+    return count, last[0], last[1], [p for p, in prescriptions]
+
+
+def add_nurse_record(conn, patient_id, nurse_name, notes, shift="", prescription=""):
+    conn.execute("INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date) VALUES (?, ?, ?, ?, ?, ?)",
+                 (patient_id, nurse_name, notes, shift, prescription, datetime.now().strftime("%Y-%m-%d %H:%M")))
+    conn.commit()
+
+
+def release_admission(conn, patient_id):
+    # Free room if assigned, then delete the admission record. False if there was none.
+    room_index.invalidate()
+    with write_transaction(conn):
+        row = conn.execute("SELECT room_no FROM admission WHERE patient_id=?", (patient_id,)).fetchone()
+        if row and row[0]:
+            conn.execute("UPDATE rooms SET status='Available', patient_id=NULL WHERE room_no=?", (row[0],))
+        conn.execute("DELETE FROM admission WHERE patient_id=?", (patient_id,))
+    return row is not None
+
+
+def get_room(conn, room_no):
+    return conn.execute("SELECT room_no, type, status, patient_id FROM rooms WHERE room_no=?", (room_no,)).fetchone()
+
+
+def add_room(conn, room_no, room_type, status):
+    # Upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the delete
+    # triggers, which would leave the room counters wrong.
+    room_index.invalidate()
+    conn.execute("""INSERT INTO rooms (room_no, type, status, patient_id) VALUES (?, ?, ?, NULL)
+                    ON CONFLICT (room_no) DO UPDATE SET type=excluded.type, status=excluded.status, patient_id=NULL""",
+                 (room_no, room_type, status))
+    conn.commit()
+
+
+def update_room(conn, room_no, room_type, status):
+    # If making available, clear patient_id
+    room_index.invalidate()
+    if status == 'Available':
+        conn.execute("UPDATE rooms SET type=?, status=?, patient_id=NULL WHERE room_no=?", (room_type, status, room_no))
+    else:
+        conn.execute("UPDATE rooms SET type=?, status=? WHERE room_no=?", (room_type, status, room_no))
+    conn.commit()
+
+
+def remove_room(conn, room_no):
+    # Returns False (and deletes nothing) when the room is occupied
+    r = conn.execute("SELECT status FROM rooms WHERE room_no=?", (room_no,)).fetchone()
+    if r and r[0] == 'Occupied':
+        return False
+    room_index.invalidate()
+    conn.execute("DELETE FROM rooms WHERE room_no=?", (room_no,))
+    conn.commit()
+    return True
+
+
+def room_status(conn, room_no):
+    r = conn.execute("SELECT status FROM rooms WHERE room_no=?", (room_no,)).fetchone()
+    return r[0] if r else None
+
+
+def get_doctor(conn, doctor_id):
+    return conn.execute("SELECT name, specialization, contact, shift, photo_path FROM doctors WHERE id=?", (doctor_id,)).fetchone()
+
+
+def add_doctor(conn, name, spec, contact, shift, photo_path):
+    conn.execute("INSERT INTO doctors (name, specialization, contact, shift, photo_path) VALUES (?, ?, ?, ?, ?)",
+                 (name, spec, contact, shift, photo_path))
+    conn.commit()
+
+
+def update_doctor(conn, doctor_id, name, spec, contact, shift, photo_path):
+    conn.execute("UPDATE doctors SET name=?, specialization=?, contact=?, shift=?, photo_path=? WHERE id=?",
+                 (name, spec, contact, shift, photo_path, doctor_id))
+    conn.commit()
+
+
+def remove_doctor(conn, doctor_id):
+    conn.execute("DELETE FROM doctors WHERE id=?", (doctor_id,))
+    conn.commit()
+
+
+def get_nurse(conn, nurse_id):
+    return conn.execute("SELECT name, contact, shift, photo_path FROM nurses WHERE id=?", (nurse_id,)).fetchone()
+
+
+def add_nurse(conn, name, contact, shift, photo_path):
+    conn.execute("INSERT INTO nurses (name, contact, shift, photo_path) VALUES (?, ?, ?, ?)",
+                 (name, contact, shift, photo_path))
+    conn.commit()
+
+
+def update_nurse(conn, nurse_id, name, contact, shift, photo_path):
+    conn.execute("UPDATE nurses SET name=?, contact=?, shift=?, photo_path=? WHERE id=?",
+                 (name, contact, shift, photo_path, nurse_id))
+    conn.commit()
+
+
+def nurse_by_name(conn, name):
+    # Lowest id of a nurse with this name, or None
+    row = conn.execute("SELECT id FROM nurses WHERE name=? ORDER BY id LIMIT 1", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def remove_nurse(conn, nurse_id):
+    # Their patients are left without a nurse, to be reassigned
+    with write_transaction(conn):
+        conn.execute("UPDATE admission SET nurse_id=NULL WHERE nurse_id=?", (nurse_id,))
+        conn.execute("DELETE FROM nurses WHERE id=?", (nurse_id,))
+
+
+# ---------------------- BILLING ----------------------
+class TariffCache:
+    # The tariffs table as a dict, re-read only when a tariff changed (newest
+    # changed_at moved), so pricing a bill doesn't re-query every price.
+    def __init__(self):
+        self.prices = {}
+        self.token = None
+
+    def get(self, conn):
+        token = conn.execute("SELECT max(changed_at), count(*) FROM tariffs").fetchone()
+        if token != self.token:
+            self.prices = dict(conn.execute("SELECT item, amount FROM tariffs"))
+            self.token = token
+        return self.prices
+
+
+tariff_cache = TariffCache()
+
+
+def tariffs(conn):
+    return tariff_cache.get(conn)
+
+
+def set_tariff(conn, item, amount):
+    conn.execute(f"""INSERT INTO tariffs (item, amount, changed_at) VALUES (?, ?, {NOW_SQL})
+                     ON CONFLICT (item) DO UPDATE SET amount=excluded.amount, changed_at=excluded.changed_at""", (item, amount))
+    conn.commit()
+
+
+# Length of stay in days as of :now (nights, at least 1) and the room's day rate.
+# Shared by single bills and the batch run so both price a stay the same way.
+BILL_SELECT = """
+    SELECT a.patient_id, a.patient_name, a.disease, a.admit_date, a.doctor_name, a.room_no,
+           ifnull(r.type, 'General') AS room_type,
+           max(1, ifnull(CAST(julianday(date(:now)) - julianday(date(a.admit_date)) AS INTEGER), 1)) AS days,
+           ifnull(t.amount, :default_rate) AS room_rate
+    FROM admission a
+    LEFT JOIN rooms r ON r.room_no = a.room_no
+    LEFT JOIN tariffs t ON t.item = 'room:' || ifnull(r.type, 'General')
+"""
+
+
+def bill_params(conn, now=None):
+    prices = tariffs(conn)
+    return {"now": now or datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "default_rate": prices.get("room_default", 0),
+            "doctor_fee": prices.get("doctor_fee", 0),
+            "nursing_fee": prices.get("nursing_fee", 0),
+            "service_fee": prices.get("service_fee", 0)}
+
+
+def patient_bill(conn, patient_id, extra=0, now=None):
+    # The bill for one admitted patient as of now, or None
+    params = bill_params(conn, now)
+    row = conn.execute(BILL_SELECT + " WHERE a.patient_id = :pid", dict(params, pid=patient_id)).fetchone()
+    if not row:
+        return None
+    pid, name, disease, admit, doctor, roomno, room_type, days, room_rate = row
+    fees = params["doctor_fee"] + params["nursing_fee"] + params["service_fee"]
+    return {
+        "pid": pid,
+        "name": name,
+        "disease": disease,
+        "admit": admit,
+        "doctor": doctor,
+        "roomno": roomno,
+        "room_type": room_type,
+        "days": days,
+        "room_rate": room_rate,
+        "room_cost": room_rate * days,
+        "doctor_fee": params["doctor_fee"],
+        "nursing_fee": params["nursing_fee"],
+        "service_fee": params["service_fee"],
+        "total": room_rate * days + fees + extra
+    }
+
+
+def bill_all(conn, run=None, now=None):
+    # Bill every admitted patient in one INSERT ... SELECT: SQLite computes the stay,
+    # the room-day charge and the total for all rows without a Python loop. Running
+    # the same run again replaces its bills. Returns (run, bills written).
+    params = bill_params(conn, now)
+    run = run or params["now"][:7]
+    with write_transaction(conn):
+        conn.execute("DELETE FROM bills WHERE run = ?", (run,))
+        cur = conn.execute(f"""
+            INSERT INTO bills (run, patient_id, patient_name, disease, doctor_name, billed_at, admit_date, room_no,
+                               room_type, days, room_rate, room_cost, doctor_fee, nursing_fee, service_fee, total)
+            SELECT :run, patient_id, patient_name, disease, doctor_name, :now, admit_date, room_no,
+                   room_type, days, room_rate, room_rate * days,
+                   :doctor_fee, :nursing_fee, :service_fee,
+                   room_rate * days + :doctor_fee + :nursing_fee + :service_fee
+            FROM ({BILL_SELECT})""", dict(params, run=run))
+    return run, cur.rowcount
+
+
+def format_bill(b):
+    return f"""
+    ------------------- SAGAR CARE HOSPITAL -------------------
+
+    Patient ID     : {b['pid']}
+    Patient Name   : {b['name']}
+    Disease        : {b['disease']}
+    Doctor         : {b['doctor']}
+    Room Number    : {b['roomno']} ({b['room_type']})
+    Admit Date     : {b['admit']}
+    Days           : {b['days']}
+
+    ----------------------- CHARGES ---------------------------
+    Room Charge    : Rs {b['room_cost']}  ({b['days']} x Rs {b['room_rate']})
+    Doctor Fee     : Rs {b['doctor_fee']}
+    Nursing Fee    : Rs {b['nursing_fee']}
+    Service Fee    : Rs {b['service_fee']}
+    -----------------------------------------------------------
+
+    Total Amount   : Rs {b['total']}
+
+    -----------------------------------------------------------
+        """
+
+
+# ---------------------- DISCHARGE ARCHIVE ----------------------
+# Discharge moves the admission, with its discharge time and final bill, into the
+# partition for the month it happened in, so admission only ever holds patients in
+# the building. The partitions live in the main database file rather than an
+# attached one: under WAL a transaction spanning two files isn't atomic, and a crash
+# mid-discharge must never lose or duplicate a patient. "discharged" is a view over
+# all partitions; the queries below read only the partitions their month range or
+# patient (through discharge_index) can be in.
+DISCHARGE_COLUMNS = [
+    ("patient_id", "TEXT NOT NULL"), ("patient_name", "TEXT"), ("age", "INTEGER"), ("contact", "TEXT"),
+    ("gender", "TEXT"), ("disease", "TEXT"), ("blood_group", "TEXT"), ("doctor_name", "TEXT"),
+    ("admit_date", "TEXT"), ("discharged_at", "TEXT NOT NULL"), ("room_no", "TEXT"), ("room_type", "TEXT"),
+    ("days", "INTEGER"), ("room_rate", "INTEGER"), ("room_cost", "INTEGER"), ("doctor_fee", "INTEGER"),
+    ("nursing_fee", "INTEGER"), ("service_fee", "INTEGER"), ("extra", "INTEGER"), ("total", "INTEGER"),
+]
+DISCHARGE_SELECT = ", ".join(name for name, _ in DISCHARGE_COLUMNS)
+
+
+def discharge_partition(month):
+    # Table name of a "YYYY-MM" month's partition; the month ends up in SQL, so it is checked
+    datetime.strptime(month, "%Y-%m")
+    return f"discharged_{month[:4]}_{month[5:]}"
+
+
+def create_discharged_view(db):
+    months = [m for m, in db.execute("SELECT month FROM discharge_months ORDER BY month")]
+    db.execute("DROP VIEW IF EXISTS discharged")
+    if months:
+        body = " UNION ALL ".join(f"SELECT {DISCHARGE_SELECT} FROM {discharge_partition(m)}" for m in months)
+    else:
+        body = "SELECT " + ", ".join(f"NULL AS {name}" for name, _ in DISCHARGE_COLUMNS) + " WHERE 0"
+    db.execute(f"CREATE VIEW discharged AS {body}")
+
+
+def ensure_discharge_partition(db, month):
+    # Inside a write transaction: the month's partition, created (and added to the view) if new
+    table = discharge_partition(month)
+    if db.execute("SELECT 1 FROM discharge_months WHERE month=?", (month,)).fetchone():
+        return table
+    db.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, "
+               + ", ".join(f"{name} {decl}" for name, decl in DISCHARGE_COLUMNS) + ")")
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_patient ON {table} (patient_id)")
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_discharged ON {table} (discharged_at)")
+    create_discharge_event_trigger(db, table)
+    db.execute("INSERT INTO discharge_months (month) VALUES (?)", (month,))
+    create_discharged_view(db)
+    return table
+
+
+def discharge_admission(conn, patient_id, extra=0, now=None):
+    # Archive the admission with its final bill as of now, free the room and delete the
+    # admission, all in one transaction. Returns the final bill, or None if there was none.
+    room_index.invalidate()
+    with write_transaction(conn):
+        bill = patient_bill(conn, patient_id, extra, now)
+        if bill is None:
+            return None
+        discharged_at = bill_params(conn, now)["now"]
+        month = discharged_at[:7]
+        table = ensure_discharge_partition(conn, month)
+        conn.execute(f"""
+            INSERT INTO {table} ({DISCHARGE_SELECT})
+            SELECT patient_id, patient_name, age, contact, gender, disease, blood_group, doctor_name, admit_date,
+                   :discharged_at, room_no, :room_type, :days, :room_rate, :room_cost, :doctor_fee,
+                   :nursing_fee, :service_fee, :extra, :total
+            FROM admission WHERE patient_id = :pid""", dict(bill, discharged_at=discharged_at, extra=extra))
+        conn.execute("INSERT OR IGNORE INTO discharge_index (patient_id, month) VALUES (?, ?)", (patient_id, month))
+        if bill["roomno"]:
+            conn.execute("UPDATE rooms SET status='Available', patient_id=NULL WHERE room_no=?", (bill["roomno"],))
+        conn.execute("DELETE FROM admission WHERE patient_id=?", (patient_id,))
+    return bill
+
+
+def discharge_months(conn, start=None, end=None):
+    # Months with a partition, oldest first, between the "YYYY-MM..." bounds (inclusive)
+    return [m for m, in conn.execute("SELECT month FROM discharge_months WHERE month >= ? AND month <= ? ORDER BY month",
+                                     ((start or "")[:7], (end or "9999-12")[:7]))]
+
+
+def discharges(conn, start, end, limit=1000):
+    # Discharges with start <= discharged_at < end ("YYYY-MM-DD[ HH:MM]"), oldest first,
+    # read from the partitions of those months only
+    months = discharge_months(conn, start, end)
+    if not months:
+        return []
+    sql = " UNION ALL ".join(f"SELECT {DISCHARGE_SELECT} FROM {discharge_partition(m)} WHERE discharged_at >= ? AND discharged_at < ?"
+                             for m in months)
+    return conn.execute(f"SELECT * FROM ({sql}) ORDER BY discharged_at LIMIT ?",
+                        [v for _ in months for v in (start, end)] + [limit]).fetchall()
+
+
+def patient_discharges(conn, patient_id):
+    # A patient's archived stays, newest first, from the partitions discharge_index names
+    months = [m for m, in conn.execute("SELECT month FROM discharge_index WHERE patient_id=?", (patient_id,))]
+    if not months:
+        return []
+    sql = " UNION ALL ".join(f"SELECT {DISCHARGE_SELECT} FROM {discharge_partition(m)} WHERE patient_id = ?" for m in months)
+    return conn.execute(f"SELECT * FROM ({sql}) ORDER BY discharged_at DESC", [patient_id] * len(months)).fetchall()
+
+
+# ---------------------- ROLLUPS ----------------------
+# Reads of the trigger-maintained buckets (see migration 10). Buckets are
+# "YYYY-MM-DD" (day) or "YYYY-MM-DD HH" (hour); ranges are start <= bucket < end.
+BUCKET_FORMATS = {"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d"}
+BUCKET_STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def bucket_range(start, end, grain="day"):
+    # Every bucket from start up to (not including) end
+    fmt, step = BUCKET_FORMATS[grain], BUCKET_STEPS[grain]
+    at, stop = datetime.strptime(start, fmt), datetime.strptime(end, fmt)
+    buckets = []
+    while at < stop:
+        buckets.append(at.strftime(fmt))
+        at += step
+    return buckets
+
+
+def rollup_series(conn, metric, dim, start, end, grain="day"):
+    # {bucket: value} for the buckets that have one
+    return dict(conn.execute(f"SELECT bucket, value FROM {ROLLUP_GRAINS[grain]} WHERE metric=? AND dim=? AND bucket >= ? AND bucket < ?",
+                             (metric, dim, start, end)))
+
+
+def occupancy_series(conn, room_type, start, end, grain="day"):
+    # [(bucket, occupied rooms at its end, peak within it)] for every bucket; buckets
+    # without a change carry the level before them forward
+    table = ROLLUP_GRAINS[grain]
+    before = conn.execute(f"SELECT value FROM {table} WHERE metric='occupied' AND dim=? AND bucket < ? ORDER BY bucket DESC LIMIT 1",
+                          (room_type, start)).fetchone()
+    level = before[0] if before else 0
+    levels = rollup_series(conn, "occupied", room_type, start, end, grain)
+    peaks = rollup_series(conn, "occupied_peak", room_type, start, end, grain)
+    series = []
+    for bucket in bucket_range(start, end, grain):
+        peak = max(peaks.get(bucket, level), level)
+        level = levels.get(bucket, level)
+        series.append((bucket, level, peak))
+    return series
+
+
+def rollup_dims(conn):
+    # Room types seen so far, for the per-type metrics
+    return [t for t, in conn.execute("SELECT room_type FROM occupancy ORDER BY room_type")]
+
+
+def dashboard_trends(conn, days=14, stay_days=30, today=None):
+    # Daily admissions and peak occupancy per room type over the last `days` days, and
+    # the average length of stay per room type over the last `stay_days`
+    today = datetime.strptime(today, "%Y-%m-%d") if today else datetime.now()
+    end = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+    start = (today - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    stay_start = (today - timedelta(days=stay_days - 1)).strftime("%Y-%m-%d")
+    buckets = bucket_range(start, end)
+    admissions = rollup_series(conn, "admissions", "", start, end)
+    occupied, avg_stay = {}, {}
+    for room_type in rollup_dims(conn):
+        occupied[room_type] = [peak for _, _, peak in occupancy_series(conn, room_type, start, end)]
+        discharged = sum(rollup_series(conn, "discharges", room_type, stay_start, end).values())
+        if discharged:
+            avg_stay[room_type] = sum(rollup_series(conn, "stay_days", room_type, stay_start, end).values()) / discharged
+    return {"days": buckets, "admissions": [admissions.get(b, 0) for b in buckets], "occupied": occupied, "avg_stay": avg_stay}
+
+
+def backfill_rollups(conn, batch=10000):
+    # Rebuild both grains and stay_lengths from the archive and the current admissions (after a bulk
+    # import, or to cover history from before the rollups existed) in one pass over
+    # their stays in time order. Occupancy is counted from stays: a stay holds a room
+    # of its type from admission to discharge; within a minute, admissions are taken
+    # first, so a peak is never under-counted. Returns the number of stays read.
+    occupied, level = {}, {}  # (grain, type, bucket) -> [level, peak]; type -> level
+    sums = {}  # (grain, metric, dim, bucket) -> value
+    lengths = {}  # (type, days) -> finished stays
+    stays = 0
+    with write_transaction(conn):
+        cur = conn.execute("""
+            SELECT at, kind, room_type, doctor, days FROM (
+                SELECT admit_date AS at, 'admit' AS kind, ifnull(room_type, '') AS room_type, ifnull(doctor_name, '') AS doctor, 0 AS days
+                FROM discharged
+                UNION ALL
+                SELECT discharged_at, 'discharge', ifnull(room_type, ''), ifnull(doctor_name, ''), ifnull(days, 0) FROM discharged
+                UNION ALL
+                SELECT a.admit_date, 'admit', ifnull(r.type, ''), ifnull(a.doctor_name, ''), 0
+                FROM admission a LEFT JOIN rooms r ON r.room_no = a.room_no
+            ) WHERE at IS NOT NULL ORDER BY at, kind""")
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            for at, kind, room_type, doctor, days in rows:
+                hour = at[:13] if len(at) >= 13 else at[:10] + " 00"
+                for grain, bucket in (("hour", hour), ("day", at[:10])):
+                    if kind == "admit":
+                        for key in ((grain, "admissions", "", bucket), (grain, "admissions_by_doctor", doctor, bucket),
+                                    (grain, "admissions_by_type", room_type, bucket)):
+                            sums[key] = sums.get(key, 0) + 1
+                    else:
+                        for metric, value in (("discharges", 1), ("stay_days", days)):
+                            key = (grain, metric, room_type, bucket)
+                            sums[key] = sums.get(key, 0) + value
+                if kind == "admit":
+                    stays += 1
+                elif days >= 1:
+                    lengths[(room_type, days)] = lengths.get((room_type, days), 0) + 1
+                current = level[room_type] = level.get(room_type, 0) + (1 if kind == "admit" else -1)
+                for grain, bucket in (("hour", hour), ("day", at[:10])):
+                    entry = occupied.get((grain, room_type, bucket))
+                    if entry is None:
+                        occupied[(grain, room_type, bucket)] = [current, current]
+                    else:
+                        entry[0] = current
+                        entry[1] = max(entry[1], current)
+
+        for grain, table in ROLLUP_GRAINS.items():
+            conn.execute(f"DELETE FROM {table}")
+            conn.executemany(f"INSERT INTO {table} (metric, dim, bucket, value) VALUES (?, ?, ?, ?)",
+                             [key[1:] + (value,) for key, value in sums.items() if key[0] == grain])
+            conn.executemany(f"INSERT INTO {table} (metric, dim, bucket, value) VALUES (?, ?, ?, ?)",
+                             [(metric, key[1], key[2], entry[i]) for key, entry in occupied.items() if key[0] == grain
+                              for i, metric in enumerate(("occupied", "occupied_peak"))])
+        conn.execute("DELETE FROM stay_lengths")
+        conn.executemany("INSERT INTO stay_lengths (room_type, days, stays) VALUES (?, ?, ?)",
+                         [key + (count,) for key, count in lengths.items()])
+        reset_occupancy(conn)
+    return stays
+
+
+# ---------------------- QUERY PLAN CHECK ----------------------
+def exercise_queries(db):
+    # Call every data function once, with the same kinds of arguments the pages use
+    dashboard_counts(db)
+    add_doctor(db, "Asha Rao", "Cardiology", "555-0100", "Day", "")
+    doctor_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+    add_nurse(db, "Meera Das", "555-0200", "Night", "")
+    nurse_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+    get_doctor(db, doctor_id)
+    update_doctor(db, doctor_id, "Asha Rao", "Cardiology", "555-0101", "Day", "")
+    get_nurse(db, nurse_id)
+    update_nurse(db, nurse_id, "Meera Das", "555-0201", "Night", "")
+
+    add_room(db, "301", "Private", "Available")
+    get_room(db, "301")
+    update_room(db, "301", "Private", "Cleaning")
+    update_room(db, "301", "Private", "Available")
+    room_status(db, "301")
+    admission_choices(db)
+    room_choices(db, "Private", "3")
+
+    patient = {"name": "Ravi Kumar", "age": "40", "contact": "555-0300", "gender": "Male",
+               "disease": "Fever", "blood_group": "O+", "doctor": "Asha Rao"}
+    patient_id = admit_patient(db, patient, "301", nurse_by_name(db, "Meera Das"))
+    add_nurse_record(db, patient_id, "Meera Das", "Vitals stable", "Night", "")
+    patient_details(db, patient_id)
+    patient_bill(db, patient_id)
+    bill_all(db, "check")
+
+    seq, _ = changes_since(db)
+    add_room(db, "302", "Shared", "Available")
+    changes_since(db, seq)
+
+    sources = [admitted_patients_source(), rooms_source(), nurse_history_source(patient_id)]
+    for text in ["", "as", "asha"]:
+        sources.append(staff_search_source("doctors", ["id", "name", "specialization", "contact", "shift", "photo_path"], text))
+        sources.append(staff_search_source("nurses", ["id", "name", "contact", "shift", "photo_path"], text))
+    for source in sources:
+        source.count(db)
+        rows = source.after(db, None, 10)
+        if rows:
+            source.after(db, source.key(rows[0]), 10)
+            source.before(db, source.key(rows[-1]), 10)
+        source.at(db, 1, 10)
+        source.changed(db, [row[0] for row in rows])
+
+    discharge_admission(db, patient_id)
+    discharges(db, "2000-01-01", "9999-12-31")
+    patient_discharges(db, patient_id)
+    dashboard_trends(db)
+    occupancy_series(db, "Private", "2026-10-01 00", "2026-10-02 00", "hour")
+    from hospital_forecast import stay_counts  # its SQL only; the forecast itself needs numpy
+    stay_counts(db, "2026-10-02")
+    release_admission(db, patient_id)
+    remove_room(db, "301")
+    remove_room(db, "302")
+    remove_doctor(db, doctor_id)
+    remove_nurse(db, nurse_id)
+
+
+# Tables whose size doesn't grow with patients or staff (discharge_months: a row a
+# month, occupancy: a row per room type, stay_lengths: a row per room type and
+# length of stay), so reading all of them is fine.
+# The FTS5 config tables are read by SQLite itself when it reloads the schema.
+BOUNDED_TABLES = {"counters", "tariffs", "discharge_months", "occupancy", "stay_lengths"} | {f"{table}_fts_config" for table in STAFF_FTS}
+
+
+def is_full_scan(detail):
+    # "SCAN t" reads every row of table t. Index scans ("SCAN t USING INDEX ..."),
+    # FTS lookups ("... VIRTUAL TABLE INDEX ...") and constant rows are fine.
+    if not detail.startswith("SCAN ") or "INDEX" in detail or "CONSTANT ROW" in detail:
+        return False
+    return detail.split()[1].split(".")[-1] not in BOUNDED_TABLES
+
+
+def check_query_plans():
+    # EXPLAIN QUERY PLAN every statement the app issues (collected by running the data
+    # functions against a scratch database) and return (sql, plan step) for each full
+    # table scan found. An empty list means the check passed.
+    db = sqlite3.connect(":memory:", factory=Connection)
+    migrate(db)
+    statements = []
+    db.set_trace_callback(statements.append)
+    exercise_queries(db)
+    db.set_trace_callback(None)
+
+    problems = []
+    seen = set()
+    for sql in statements:
+        sql = sql.strip()
+        if sql in seen or not sql.upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            continue
+        seen.add(sql)
+        for row in db.execute("EXPLAIN QUERY PLAN " + sql):
+            if is_full_scan(row[3]):
+                problems.append((sql, row[3]))
+    db.close()
+    return problems
+
+
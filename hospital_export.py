@@ -0,0 +1,159 @@
+# Streaming exports for insurers and auditors. Rows are read through a cursor in
+# batches and written as they come, so memory use doesn't depend on table size.
+# Formats: CSV, JSON Lines and Parquet (columnar, needs the optional pyarrow),
+# optionally gzip-compressed. Files are written to a temporary name and renamed
+# into place, so a reader never sees a half-written extract.
+#
+# Incremental mode: an export run under a name (e.g. "insurer") only writes rows of
+# admission, nurse_treatment and rooms whose change_seq is after where that name's
+# previous run stopped, recorded in export_state. change_seq comes from a counter
+# bumped inside each write (migration 13), so it follows commit order: a run stops at
+# the counter as its snapshot sees it, and rows of a transaction still open then get
+# higher numbers and go out with the next run, however long that transaction takes.
+# Deleted rows (discharges) are not part of incremental extracts.
+import csv
+import gzip
+import json
+import os
+
+from hospital_core import CHANGE_TRACKED, write_transaction
+
+BATCH_SIZE = 5000
+FORMATS = ["csv", "jsonl", "parquet"]
+
+
+def format_for(path):
+    # Format from the file name: "rooms.csv.gz" -> "csv"
+    name = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(name)[1].lstrip(".")
+    return ext if ext in FORMATS else "csv"
+
+
+# ---------------------- READING ----------------------
+def read_batches(conn, table, window=None, batch_size=BATCH_SIZE):
+    # (columns, generator of row batches). window=(after, until) limits the rows to
+    # after < change_seq <= until.
+    if window is None:
+        cur = conn.execute(f"SELECT * FROM {table}")
+    else:
+        cur = conn.execute(f"SELECT * FROM {table} WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq", window)
+    columns = [d[0] for d in cur.description]
+
+    def batches():
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    return columns, batches()
+
+
+# ---------------------- WRITERS ----------------------
+class CsvWriter:
+    def __init__(self, path, columns, compress):
+        self.file = gzip.open(path, "wt", newline="", encoding="utf-8") if compress else open(path, "w", newline="", encoding="utf-8")
+        self.out = csv.writer(self.file)
+        self.out.writerow(columns)
+
+    def write(self, rows):
+        self.out.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, columns, compress):
+        self.file = gzip.open(path, "wt", encoding="utf-8") if compress else open(path, "w", encoding="utf-8")
+        self.columns = columns
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.columns, row))) + "\n" for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    # One row group per batch. SQLite columns only have type affinity (an INTEGER
+    # column can hold text), so everything is written as strings except the integer
+    # primary key "id", which SQLite guarantees to be an integer.
+    def __init__(self, path, columns, compress):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+        self.pa = pyarrow
+        self.types = [pyarrow.int64() if c == "id" else pyarrow.string() for c in columns]
+        schema = pyarrow.schema(list(zip(columns, self.types)))
+        self.writer = pyarrow.parquet.ParquetWriter(path, schema, compression="gzip" if compress else "snappy")
+        self.schema = schema
+
+    def write(self, rows):
+        arrays = []
+        for i, typ in enumerate(self.types):
+            values = [row[i] for row in rows]
+            if typ != self.pa.int64():
+                values = [None if v is None else str(v) for v in values]
+            arrays.append(self.pa.array(values, type=typ))
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+# ---------------------- EXPORT ----------------------
+def get_watermark(conn, name, table):
+    # Last change_seq exported under name; -1 before its first run (rows older than
+    # migration 13 have change_seq 0)
+    row = conn.execute("SELECT last_seq FROM export_state WHERE name=? AND table_name=?", (name, table)).fetchone()
+    return row[0] if row else -1
+
+
+def export_table(conn, table, path, fmt=None, compress=None, since_name=None):
+    # Write `table` to `path`; returns the number of rows written. With since_name,
+    # only rows changed since that name's last export, and its watermark moves on
+    # once the file is in place.
+    if since_name and table not in CHANGE_TRACKED:
+        raise ValueError(f"Incremental export needs a change-tracked table: {', '.join(CHANGE_TRACKED)}")
+    fmt = fmt or format_for(path)
+    if compress is None:
+        compress = path.endswith(".gz")
+    tmp = path + ".tmp"
+    count = 0
+    window = None
+
+    # One read transaction: every batch comes from the same snapshot
+    conn.execute("BEGIN")
+    try:
+        if since_name:
+            until = conn.execute("SELECT next_value FROM id_sequence WHERE name = 'change'").fetchone()[0]
+            window = (get_watermark(conn, since_name, table), until)
+        columns, batches = read_batches(conn, table, window)
+        writer = WRITERS[fmt](tmp, columns, compress)
+        try:
+            for rows in batches:
+                writer.write(rows)
+                count += len(rows)
+        finally:
+            writer.close()
+    except BaseException:
+        conn.rollback()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    conn.rollback()
+    os.replace(tmp, path)
+
+    if since_name:
+        with write_transaction(conn):
+            conn.execute("""INSERT INTO export_state (name, table_name, last_seq, exported_at)
+                            VALUES (?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+                            ON CONFLICT (name, table_name) DO UPDATE SET
+                                last_seq = excluded.last_seq, exported_at = excluded.exported_at""",
+                         (since_name, table, window[1]))
+    return count
@@ -0,0 +1,122 @@
+# Bed occupancy forecast per room type for the next FORECAST_DAYS days, for capacity
+# planning. Lengths of stay come from the whole discharge archive, with the patients
+# still admitted counted as stays known to have lasted at least their nights so far
+# (a Kaplan-Meier survival curve per room type). The expected occupancy on day h is
+# then, per room type:
+#
+#   sum over current patients of P(stay > nights + h | stay > nights)
+#   + arrivals per day * (S(0) + ... + S(h - 1))
+#
+# with arrivals per day averaged over the last ARRIVAL_WINDOW_DAYS of the daily
+# rollups. The history arrives already reduced to stays per (room type, days) by
+# stay_lengths, and NumPy does the rest for all room types at once. The result is
+# cached until a patient is admitted or the date changes. Needs the optional numpy.
+from datetime import datetime, timedelta
+
+from hospital_core import changes_since, rollup_dims, rollup_series
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FORECAST_DAYS = 14
+ARRIVAL_WINDOW_DAYS = 28
+
+
+def stay_counts(conn, today):
+    # (finished, current): {(room type, nights): patients}. Finished stays are their
+    # billed days; current ones the nights since admission as of today. Only stays
+    # in a room count: patients admitted without one don't take a bed, and reading
+    # from the occupied rooms keeps this to one index lookup per bed.
+    finished = {(t, d): n for t, d, n in conn.execute("SELECT room_type, days, stays FROM stay_lengths WHERE room_type != ''")}
+    current = {(t, d): n for t, d, n in conn.execute("""
+        SELECT r.type, max(0, ifnull(CAST(julianday(:today) - julianday(date(a.admit_date)) AS INTEGER), 0)), COUNT(*)
+        FROM rooms r CROSS JOIN admission a ON a.room_no = r.room_no WHERE r.status = 'Occupied' GROUP BY 1, 2""", {"today": today})}
+    return finished, current
+
+
+def capacity(conn):
+    # Rooms per type, from the dashboard counters
+    rooms = {}
+    for name, value in conn.execute("SELECT name, value FROM counters WHERE name >= 'rooms:' AND name < 'rooms;'"):
+        room_type = name.split(":")[1]
+        rooms[room_type] = rooms.get(room_type, 0) + value
+    return rooms
+
+
+def arrival_rates(conn, today):
+    # Mean admissions per day per room type over the ARRIVAL_WINDOW_DAYS before today
+    end = today.strftime("%Y-%m-%d")
+    start = (today - timedelta(days=ARRIVAL_WINDOW_DAYS)).strftime("%Y-%m-%d")
+    return {room_type: sum(rollup_series(conn, "admissions_by_type", room_type, start, end).values()) / ARRIVAL_WINDOW_DAYS
+            for room_type in rollup_dims(conn)}
+
+
+def survival(finished, censored):
+    # S[i, t] = P(stay > t nights) per room type from (types x nights) counts of
+    # finished stays and of stays still running after that many nights
+    at_risk = np.cumsum((finished + censored)[:, ::-1], axis=1)[:, ::-1]
+    hazard = np.divide(finished, at_risk, out=np.zeros(finished.shape), where=at_risk > 0)
+    return np.cumprod(1.0 - hazard, axis=1)
+
+
+def forecast(finished, current, rates, days=FORECAST_DAYS):
+    # {room type: [expected occupied rooms on day 1..days]} from the counts above
+    if np is None:
+        raise RuntimeError("The occupancy forecast needs numpy (pip install numpy)")
+    types = sorted({t for t, _ in finished} | {t for t, _ in current} | set(rates))
+    if not types:
+        return {}
+    row = {t: i for i, t in enumerate(types)}
+    longest = max([d for _, d in finished] + [d for _, d in current] + [0]) + days + 1
+
+    def matrix(counts):
+        m = np.zeros((len(types), longest + 1))
+        if counts:
+            keys = np.array([(row[t], d) for t, d in counts])
+            np.add.at(m, (keys[:, 0], keys[:, 1]), np.fromiter(counts.values(), float, len(counts)))
+        return m
+
+    patients = matrix(current)
+    s = survival(matrix(finished), patients)
+    horizon = np.arange(1, days + 1)
+    nights = np.arange(longest + 1 - days)
+    # P(still here h days from now | here now, `nights` nights in), types x nights x days
+    later = s[:, nights[:, None] + horizon[None, :]]
+    now = s[:, nights][:, :, None]
+    staying = np.divide(later, now, out=np.ones(later.shape), where=now > 0)
+    from_current = np.einsum("in,ind->id", patients[:, :len(nights)], staying)
+    arrivals = np.array([rates.get(t, 0.0) for t in types])[:, None] * np.cumsum(s[:, :days], axis=1)
+    return {t: (from_current[i] + arrivals[i]).round(1).tolist() for t, i in row.items()}
+
+
+class ForecastCache:
+    # The last forecast, recomputed when the date changes or the change feed moved (a
+    # patient was admitted or discharged, or a room changed, since), like TariffCache.
+    # The feed's position costs no query while nothing was written.
+    def __init__(self):
+        self.result = None
+        self.token = None
+
+    def get(self, conn, today=None):
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        token = (today, changes_since(conn)[0])
+        if token != self.token:
+            day = datetime.strptime(today, "%Y-%m-%d")
+            finished, current = stay_counts(conn, today)
+            expected = forecast(finished, current, arrival_rates(conn, day))
+            rooms = capacity(conn)
+            self.result = {"days": [(day + timedelta(days=h)).strftime("%Y-%m-%d") for h in range(1, FORECAST_DAYS + 1)],
+                           "expected": expected,
+                           "capacity": {t: rooms.get(t, 0) for t in expected}}
+            self.token = token
+        return self.result
+
+
+forecast_cache = ForecastCache()
+
+
+def occupancy_forecast(conn, today=None):
+    # {"days": [...], "expected": {room type: [rooms]}, "capacity": {room type: rooms}}
+    return forecast_cache.get(conn, today)
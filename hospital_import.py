@@ -0,0 +1,332 @@
+# Bulk import of admissions, doctors, nurses and rooms from CSV or JSON Lines files,
+# for loading the records of a previous system. Rows are streamed from the file,
+# checked with the same validation as the dialogs and inserted with executemany in
+# chunks, all inside one write transaction. Rows that fail validation are written
+# to a reject file (same format as the input, plus an "error" field) instead of
+# stopping the import.
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+from hospital_core import (PATIENT_FIELDS, ROOM_STATUSES, STAFF_FTS, CHANGE_TRACKED, CHANGE_FEED, write_transaction, recount, replay_events, stamp_changes, patient_id_allocator,
+                           normalize_patient_id, validate_patient_values, validate_doctor, validate_nurse,
+                           validate_room)
+
+CHUNK_SIZE = 20000
+
+
+class RejectedRow(Exception):
+    pass
+
+
+# ---------------------- RECORD KINDS ----------------------
+# Each kind reads the input columns named in `fields` (missing ones read as ""; a
+# field may also come under its name in `aliases`, e.g. the table's own column name
+# in a file written by hospital_export), turns one record's values into insert
+# parameters (or raises RejectedRow) and inserts a chunk of them. begin()/finish()
+# run once per import.
+class AdmissionImport:
+    # patient_id, room_no, admit_date and the nurse are optional. Missing patient IDs
+    # are allocated; IDs in the file that are at or above the sequence move it forward.
+    # The nurse is given by name (nurse) or, as exported, by id (nurse_id), and must
+    # be on the staff.
+    table = "admission"
+    fields = ["patient_id"] + PATIENT_FIELDS + ["room_no", "admit_date", "nurse", "nurse_id"]
+    aliases = {"name": "patient_name", "doctor": "doctor_name"}
+
+    def begin(self, conn):
+        self.free_rooms = {r[0] for r in conn.execute("SELECT room_no FROM rooms WHERE status='Available'")}
+        self.seen_ids = set()
+        self.max_sequence = 0
+        self.admit_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    def row(self, values):
+        error = validate_patient_values(values[1:8])
+        if error:
+            raise RejectedRow(error)
+        patient_id, name, age, contact, gender, disease, blood_group, doctor, room_no, admit_date, nurse, nurse_id = values
+        patient_id = normalize_patient_id(patient_id) if patient_id else ""
+        if patient_id:
+            if patient_id in self.seen_ids:
+                raise RejectedRow(f"Duplicate patient ID {patient_id}")
+            self.seen_ids.add(patient_id)
+            # Keep the sequence ahead of imported IDs that look like ours
+            digits = patient_id[1:]
+            if patient_id[:1] == patient_id_allocator.prefix and digits.isdigit() and len(digits) == patient_id_allocator.width:
+                self.max_sequence = max(self.max_sequence, int(digits) + 1)
+        if room_no:
+            if room_no not in self.free_rooms:
+                raise RejectedRow(f"Room {room_no} is not available")
+            self.free_rooms.discard(room_no)
+        if not nurse and nurse_id and not nurse_id.isdigit():
+            raise RejectedRow(f"Nurse ID {nurse_id} is not a number")
+        return [patient_id, name, age, contact, gender, disease, admit_date or self.admit_date, blood_group, doctor,
+                room_no or None, nurse, int(nurse_id) if nurse_id and not nurse else None]
+
+    def check(self, conn, rows):
+        # Patient IDs already in the database and the nurses, one indexed lookup each
+        # per chunk. A nurse name resolves to the lowest id with that name; known
+        # nurses leave the row with both the id and the name.
+        given = [r[0] for r in rows if r[0]]
+        taken = {r[0] for r in conn.execute(
+            "SELECT patient_id FROM admission WHERE patient_id IN (SELECT value FROM json_each(?))", (json.dumps(given),))} if given else set()
+        names = sorted({r[10] for r in rows if r[10]})
+        by_name = dict(conn.execute("SELECT name, min(id) FROM nurses WHERE name IN (SELECT value FROM json_each(?)) GROUP BY name",
+                                    (json.dumps(names),))) if names else {}
+        ids = sorted({r[11] for r in rows if r[11] is not None})
+        by_id = dict(conn.execute("SELECT id, name FROM nurses WHERE id IN (SELECT value FROM json_each(?))",
+                                  (json.dumps(ids),))) if ids else {}
+        good, bad = [], []
+        for r in rows:
+            if r[0] in taken:
+                error = f"Patient ID {r[0]} already exists"
+            elif r[10] and r[10] not in by_name:
+                error = f"No nurse named {r[10]}"
+            elif r[11] is not None and r[11] not in by_id:
+                error = f"No nurse with ID {r[11]}"
+            else:
+                if r[10]:
+                    r[11] = by_name[r[10]]
+                elif r[11] is not None:
+                    r[10] = by_id[r[11]]
+                good.append(r)
+                continue
+            bad.append((r, error))
+            if r[9]:
+                self.free_rooms.add(r[9])
+        return good, bad
+
+    def insert(self, conn, rows):
+        self.finish(conn)
+        missing = [r for r in rows if not r[0]]
+        for r, patient_id in zip(missing, patient_id_allocator.allocate(conn, len(missing)) if missing else []):
+            r[0] = patient_id
+        conn.executemany("INSERT INTO admission (patient_id, patient_name, age, contact, gender, disease, admit_date, blood_group, doctor_name, room_no, nurse_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (r[:10] + [r[11]] for r in rows))
+        conn.executemany("UPDATE rooms SET status='Occupied', patient_id=? WHERE room_no=?",
+                         ((r[0], r[9]) for r in rows if r[9]))
+        conn.executemany("INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date) VALUES (?, ?, 'Assigned on admission', '', '', ?)",
+                         ((r[0], r[10], r[6]) for r in rows if r[10]))
+
+    def finish(self, conn):
+        # Also run before allocating, so new IDs never collide with imported ones
+        if self.max_sequence:
+            conn.execute("UPDATE id_sequence SET next_value = max(next_value, ?) WHERE name = ?",
+                         (self.max_sequence, patient_id_allocator.name))
+
+
+class DoctorImport:
+    table = "doctors"
+    fields = ["name", "specialization", "contact", "shift", "photo_path"]
+    aliases = {}
+
+    def begin(self, conn):
+        pass
+
+    def row(self, values):
+        error = validate_doctor(values[0])
+        if error:
+            raise RejectedRow(error)
+        return values
+
+    def check(self, conn, rows):
+        return rows, []
+
+    def insert(self, conn, rows):
+        conn.executemany("INSERT INTO doctors (name, specialization, contact, shift, photo_path) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def finish(self, conn):
+        pass
+
+
+class NurseImport(DoctorImport):
+    table = "nurses"
+    fields = ["name", "contact", "shift", "photo_path"]
+
+    def row(self, values):
+        error = validate_nurse(values[0])
+        if error:
+            raise RejectedRow(error)
+        return values
+
+    def insert(self, conn, rows):
+        conn.executemany("INSERT INTO nurses (name, contact, shift, photo_path) VALUES (?, ?, ?, ?)", rows)
+
+
+class RoomImport(DoctorImport):
+    # type defaults to General and status to Available, as in the Add Room dialog
+    table = "rooms"
+    fields = ["room_no", "type", "status"]
+
+    def begin(self, conn):
+        self.room_nos = {r[0] for r in conn.execute("SELECT room_no FROM rooms")}
+
+    def row(self, values):
+        room_no, room_type, status = values
+        status = status or ROOM_STATUSES[0]
+        error = validate_room(room_no, status)
+        if error:
+            raise RejectedRow(error)
+        if room_no in self.room_nos:
+            raise RejectedRow(f"Room {room_no} already exists")
+        self.room_nos.add(room_no)
+        return [room_no, room_type or "General", status]
+
+    def insert(self, conn, rows):
+        conn.executemany("INSERT INTO rooms (room_no, type, status) VALUES (?, ?, ?)", rows)
+
+
+IMPORT_KINDS = {
+    "admissions": AdmissionImport,
+    "doctors": DoctorImport,
+    "nurses": NurseImport,
+    "rooms": RoomImport,
+}
+
+
+# ---------------------- FILES ----------------------
+def is_jsonl(path):
+    return path.endswith((".jsonl", ".ndjson", ".json"))
+
+
+class RecordReader:
+    # Iterates (values, raw) per CSV row / JSON line without reading the whole file.
+    # values are the stripped `fields` in order; raw is the record as read, kept for
+    # the reject file (a list of cells in `header` order for CSV, a dict for JSON).
+    # A field missing from a record is looked up under its alias, if it has one.
+    def __init__(self, path, fields, aliases=None):
+        self.path = path
+        self.fields = fields
+        self.aliases = aliases or {}
+        self.header = None
+
+    def names(self, present):
+        # The name each field is read under, given the names present in the input
+        return [k if k in present or k not in self.aliases else self.aliases[k] for k in self.fields]
+
+    def __iter__(self):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            if is_jsonl(self.path):
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        yield [str(rec.get(k) if rec.get(k) is not None else "").strip() for k in self.names(rec)], rec
+                return
+            reader = csv.reader(f)
+            self.header = next(reader, [])
+            # Absent columns point at a "" cell appended to every row
+            pick = itemgetter(*[self.header.index(k) if k in self.header else -1 for k in self.names(self.header)])
+            strip = str.strip
+            for cells in reader:
+                cells.append("")
+                yield list(map(strip, pick(cells))), cells
+
+
+class RejectWriter:
+    # Opens the reject file on the first bad row, so clean imports leave nothing behind
+    def __init__(self, path, records=None):
+        self.path = path
+        self.records = records  # the RecordReader, for the CSV header
+        self.file = None
+        self.csv = None
+        self.count = 0
+
+    def write(self, rec, error):
+        if self.file is None:
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+        self.count += 1
+        if isinstance(rec, list):
+            rec = dict(zip(self.records.header, rec))
+        rec = dict(rec, error=error)
+        if is_jsonl(self.path):
+            self.file.write(json.dumps(rec) + "\n")
+            return
+        if self.csv is None:
+            self.csv = csv.DictWriter(self.file, fieldnames=list(rec), extrasaction="ignore")
+            self.csv.writeheader()
+        self.csv.writerow(rec)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def default_reject_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.rejects{ext or '.csv'}"
+
+
+# ---------------------- IMPORT ----------------------
+def drop_table_extras(conn, table):
+    # Drop the secondary indexes and triggers (FTS sync, counters) of `table` and return
+    # their SQL so they can be recreated. Building an index once over all rows is much
+    # cheaper than updating it row by row. Constraint indexes (sql IS NULL) stay.
+    extras = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE tbl_name=? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                          (table,)).fetchall()
+    for kind, name, _ in extras:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in extras]
+
+
+def restore_table_extras(conn, table, extras):
+    for sql in extras:
+        conn.execute(sql)
+    # The triggers didn't see the imported rows; bring what they maintain up to date
+    # (events and rollups first: they find the imported rows by their missing stamp)
+    replay_events(conn, table)
+    if table in STAFF_FTS:
+        conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES('rebuild')")
+    if table in CHANGE_TRACKED:
+        stamp_changes(conn, table)
+    if table in CHANGE_FEED:
+        # Too many rows to list one by one; open lists of this table reload
+        conn.execute("INSERT INTO change_log (table_name, row_key, op) VALUES (?, NULL, 'reload')", (table,))
+    recount(conn)
+
+
+def import_records(conn, kind, records, rejects, chunk_size=CHUNK_SIZE, defer_indexes=True):
+    # Import an iterable of (values, raw) as produced by RecordReader; bad rows go to
+    # rejects.write(raw, error). Returns the number of rows imported. Everything
+    # commits at the end, or nothing does.
+    spec = IMPORT_KINDS[kind]()
+    imported = 0
+    records = iter(records)
+    with write_transaction(conn):
+        extras = drop_table_extras(conn, spec.table) if defer_indexes else None
+        spec.begin(conn)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            rows, sources = [], {}
+            for values, raw in chunk:
+                try:
+                    row = spec.row(values)
+                except RejectedRow as e:
+                    rejects.write(raw, str(e))
+                    continue
+                sources[id(row)] = raw
+                rows.append(row)
+            rows, bad = spec.check(conn, rows)
+            for row, error in bad:
+                rejects.write(sources[id(row)], error)
+            spec.insert(conn, rows)
+            imported += len(rows)
+        spec.finish(conn)
+        if extras is not None:
+            restore_table_extras(conn, spec.table, extras)
+    return imported
+
+
+def import_file(conn, kind, path, reject_path=None, chunk_size=CHUNK_SIZE, defer_indexes=True):
+    # Returns (rows imported, rows rejected, reject file path)
+    records = RecordReader(path, IMPORT_KINDS[kind].fields, IMPORT_KINDS[kind].aliases)
+    rejects = RejectWriter(reject_path or default_reject_path(path), records)
+    try:
+        imported = import_records(conn, kind, records, rejects, chunk_size, defer_indexes)
+    finally:
+        rejects.close()
+    return imported, rejects.count, rejects.path
@@ -0,0 +1,73 @@
+# Staff photos. A chosen photo is copied into a managed store under its content hash,
+# so the database never points at a file in someone's Downloads folder, and the same
+# picture chosen twice is stored once. Thumbnails are generated once per photo and
+# size into an on-disk cache keyed by that hash, so a row only ever decodes a tiny
+# PNG. Needs Pillow for thumbnails; without it staff rows simply show no photo.
+import hashlib
+import os
+import shutil
+from io import BytesIO
+
+from hospital_core import write_atomic
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+PHOTO_STORE = "photos"
+ORIGINALS_DIR = os.path.join(PHOTO_STORE, "originals")
+THUMBS_DIR = os.path.join(PHOTO_STORE, "thumbs")
+THUMB_SIZE = 36
+
+# (path, mtime, size) -> sha256, so files outside the store are hashed once
+_hashes = {}
+
+
+def file_hash(path):
+    # Photos in the store are named by their hash; anything else is read and hashed
+    name = os.path.basename(path)
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(ORIGINALS_DIR):
+        return os.path.splitext(name)[0]
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def import_photo(path):
+    # Copy a chosen photo into the store and return the stored path (what photo_path
+    # should hold). Photos already in the store, and empty paths, pass through.
+    if not path or os.path.dirname(os.path.abspath(path)) == os.path.abspath(ORIGINALS_DIR):
+        return path
+    stored = os.path.join(ORIGINALS_DIR, file_hash(path) + os.path.splitext(path)[1].lower())
+    if not os.path.exists(stored):
+        os.makedirs(ORIGINALS_DIR, exist_ok=True)
+        tmp = stored + ".tmp"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, stored)
+    return stored
+
+
+def thumbnail(path, size=THUMB_SIZE):
+    # Path of the size x size PNG thumbnail of a photo, generated on first use.
+    # None if there is no photo, it can't be read, or Pillow isn't installed.
+    if not path or Image is None:
+        return None
+    try:
+        thumb = os.path.join(THUMBS_DIR, f"{file_hash(path)}_{size}.png")
+        if not os.path.exists(thumb):
+            with Image.open(path) as img:
+                img = ImageOps.fit(ImageOps.exif_transpose(img).convert("RGB"), (size, size))
+            out = BytesIO()
+            img.save(out, "PNG", optimize=True)
+            os.makedirs(THUMBS_DIR, exist_ok=True)
+            write_atomic(thumb, out.getvalue())
+        return thumb
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,227 @@
+# Timing spans for the data layer and the desktop app's callbacks, a rotating log of
+# the slow ones and per-operation totals for the diagnostics panel, to tell whether a
+# slow click is spent in SQL, in creating widgets or in Tk layout. Nothing is patched
+# or timed until enable() is called (SAGARCARE_PROFILE=1 for the app, --profile for
+# the CLI), so a normal run pays one flag check per database request and no more.
+#
+# Span kinds:
+#   sql   one statement: its text, time to its first row (or to completion, for
+#         writes, with the rows changed), and commits
+#   data  one data function call from the app or API: elapsed and rows returned
+#   ui    one Tk callback (button, event, after() job, DB result handler): elapsed,
+#         widgets it created and the layout/redraw it left pending ("layout_ms")
+import logging
+import os
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from hospital_core import Connection
+
+PROFILE_ENV = "SAGARCARE_PROFILE"
+SLOW_LOG = "slow_ops.log"
+# Spans at or above these many milliseconds go to the slow log
+THRESHOLDS_MS = {
+    "sql": float(os.environ.get("SAGARCARE_SLOW_SQL_MS", 50)),
+    "data": float(os.environ.get("SAGARCARE_SLOW_DATA_MS", 100)),
+    "ui": float(os.environ.get("SAGARCARE_SLOW_UI_MS", 100)),
+}
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 3
+
+
+def span_name(text, limit=160):
+    return " ".join(text.split())[:limit]
+
+
+def format_details(details):
+    return " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in details.items())
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stats = {}  # (kind, name) -> [count, total ms, max ms]
+        self.slow = deque(maxlen=200)  # the most recent slow spans, newest last
+        self.widgets = 0  # Tk widgets created so far (counted once install_tk() ran)
+        self.thresholds = dict(THRESHOLDS_MS)
+        self.log = None
+
+    def enable(self, log_path=SLOW_LOG, thresholds=None):
+        if self.enabled:
+            return
+        self.thresholds.update(thresholds or {})
+        self.log = logging.getLogger("sagarcare.slow")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.log.addHandler(handler)
+        Connection.execute = profiled_execute
+        Connection.executemany = profiled_executemany
+        Connection.commit = profiled_commit
+        self.enabled = True
+
+    def record(self, kind, name, ms, **details):
+        with self.lock:
+            stat = self.stats.get((kind, name))
+            if stat is None:
+                stat = self.stats[(kind, name)] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += ms
+            stat[2] = max(stat[2], ms)
+            slow = ms >= self.thresholds.get(kind, 0)
+            if slow:
+                self.slow.append((time.time(), kind, name, ms, details))
+        if slow:
+            self.log.info(" ".join(filter(None, [kind, f"{ms:.1f}ms", name, format_details(details)])))
+
+    def call(self, kind, name, fn, *args):
+        # fn(*args) as one span; a list result counts as its rows. Widgets are only
+        # counted for "ui" spans, which run on the Tk thread that creates them.
+        start = time.perf_counter()
+        widgets = self.widgets
+        result = fn(*args)
+        details = {"rows": len(result)} if isinstance(result, list) else {}
+        if kind == "ui" and self.widgets != widgets:
+            details["widgets"] = self.widgets - widgets
+        self.record(kind, name, (time.perf_counter() - start) * 1000, **details)
+        return result
+
+    def top(self, n=20):
+        # [(kind, name, count, total ms, max ms)] by total time, largest first
+        with self.lock:
+            rows = [(kind, name, *stat) for (kind, name), stat in self.stats.items()]
+        rows.sort(key=lambda r: r[3], reverse=True)
+        return rows[:n]
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.slow.clear()
+
+
+profiler = Profiler()
+
+
+# ---------------------- DATA LAYER ----------------------
+_execute = Connection.execute
+_executemany = Connection.executemany
+_commit = Connection.commit
+
+
+def profiled_execute(self, sql, parameters=()):
+    start = time.perf_counter()
+    cur = _execute(self, sql, parameters)
+    details = {"rows": cur.rowcount} if cur.rowcount >= 0 else {}
+    profiler.record("sql", span_name(sql), (time.perf_counter() - start) * 1000, **details)
+    return cur
+
+
+def profiled_executemany(self, sql, seq_of_parameters):
+    start = time.perf_counter()
+    cur = _executemany(self, sql, seq_of_parameters)
+    profiler.record("sql", span_name(sql), (time.perf_counter() - start) * 1000, rows=cur.rowcount)
+    return cur
+
+
+def profiled_commit(self):
+    # Where a write pays for its fsync
+    start = time.perf_counter()
+    _commit(self)
+    profiler.record("sql", "COMMIT", (time.perf_counter() - start) * 1000)
+
+
+def function_name(fn):
+    # "after@admission" for list pages, else the function's name
+    owner = getattr(fn, "__self__", None)
+    table = getattr(owner, "table", None)
+    if table:
+        return f"{fn.__name__}@{table}"
+    return getattr(fn, "__qualname__", repr(fn))
+
+
+# ---------------------- TK ----------------------
+def untimed(fn):
+    # Mark a Tk callback that only hands results to handlers it times as spans of their
+    # own (the app's DB result poll), so its span doesn't count their time again
+    fn.untimed = True
+    return fn
+
+
+def after_job(fn):
+    # Misc.after() registers a closure around the job; look through it to the job
+    if getattr(fn, "__qualname__", "").endswith("after.<locals>.callit") and fn.__closure__:
+        cells = dict(zip(fn.__code__.co_freevars, fn.__closure__))
+        if "func" in cells:
+            return cells["func"].cell_contents
+    return fn
+
+
+def callback_name(fn):
+    # CTk widgets run their `command` from an internal click handler; name the command
+    fn = after_job(fn)
+    command = getattr(getattr(fn, "__self__", None), "_command", None)
+    if command is not None and getattr(fn, "__name__", "") == "_clicked":
+        fn = command
+    return getattr(fn, "__qualname__", repr(fn))
+
+
+def install_tk():
+    # Time every Tk -> Python callback and count widgets as they are created. Must run
+    # before any widget exists: callbacks are wrapped when they are registered.
+    import tkinter
+
+    class ProfiledCallWrapper(tkinter.CallWrapper):
+        def __call__(self, *args):
+            if getattr(after_job(self.func), "untimed", False):
+                return super().__call__(*args)
+            start = time.perf_counter()
+            widgets = profiler.widgets
+            try:
+                return super().__call__(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                # Geometry and redraws wait for idle time; run them now to measure them
+                layout_start = time.perf_counter()
+                try:
+                    self.widget.update_idletasks()
+                except tkinter.TclError:
+                    pass  # the window was destroyed by this callback
+                details = {"layout_ms": (time.perf_counter() - layout_start) * 1000}
+                if profiler.widgets != widgets:
+                    details["widgets"] = profiler.widgets - widgets
+                profiler.record("ui", callback_name(self.func), elapsed * 1000, **details)
+
+    setup = tkinter.BaseWidget._setup
+
+    def counting_setup(self, master, cnf):
+        profiler.widgets += 1
+        return setup(self, master, cnf)
+
+    tkinter.CallWrapper = ProfiledCallWrapper
+    tkinter.BaseWidget._setup = counting_setup
+
+
+def enable_from_env():
+    # True if SAGARCARE_PROFILE is set (to anything but 0); enables the profiler
+    if os.environ.get(PROFILE_ENV, "0") in ("", "0"):
+        return False
+    profiler.enable()
+    return True
+
+
+def format_top(n=20):
+    lines = [f"{'kind':5} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}  name"]
+    for kind, name, count, total, worst in profiler.top(n):
+        lines.append(f"{kind:5} {count:7} {total:10.1f} {total / count:9.2f} {worst:9.1f}  {name}")
+    return "\n".join(lines)
+
+
+def format_slow(n=30):
+    lines = []
+    for when, kind, name, ms, details in list(profiler.slow)[-n:][::-1]:
+        lines.append(f"{time.strftime('%H:%M:%S', time.localtime(when))} {kind:4} {ms:8.1f} ms  {name}  {format_details(details)}")
+    return "\n".join(lines)
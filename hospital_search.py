@@ -0,0 +1,208 @@
+# Patient lookup for the search bar and the billing page's autocomplete: matches a
+# fragment of a patient ID, name, contact number or disease and ranks the results,
+# without a query per keystroke. The index lives in memory and follows the change
+# feed (see changes_since), so after the first build only the admissions changed
+# since the last search are re-read.
+#
+# Patient IDs and contact numbers are kept sorted, so an ID prefix, or the first or
+# last digits of a number, is one bisect (a sorted list answers the same prefix
+# queries as a trie, in far less memory). Names and diseases repeat a lot, so they
+# are indexed per distinct value: each value maps to the patients that have it, and
+# each trigram of a value to the values containing it. A fragment of three or more
+# characters checks the values of its rarest trigram; shorter ones match prefixes.
+import json
+import threading
+from bisect import bisect_left, insort
+
+from hospital_core import changes_since, normalize_patient_id
+
+SEARCH_LIMIT = 8
+# Patients ranked per search; a fragment as common as a frequent surname stops
+# collecting here instead of ranking every patient that has it
+MAX_CANDIDATES = 500
+
+# Rank of a match, best first
+EXACT_ID, ID_PREFIX, NAME_PREFIX, WORD_PREFIX, CONTACT, SUBSTRING = range(6)
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class PatientIndex:
+    # Used from the app's DB thread and the API server's workers, so every access
+    # holds the lock; a search takes a few milliseconds.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = None  # change feed position the index is current to; None = not built
+        self.clear()
+
+    def clear(self):
+        self.slots = {}  # patient ID -> slot
+        self.rows = []  # slot -> (pid, name, contact, disease), None once freed
+        self.free = []
+        self.ids = []  # sorted patient IDs
+        self.contacts = []  # slots sorted by contact
+        self.reversed_contacts = []  # slots sorted by reversed contact, for "last digits"
+        self.values = {}  # lower-case name or disease -> set of slots
+        self.sorted_values = []  # the keys of values, sorted
+        self.grams = {}  # trigram -> set of values containing it
+
+    def refresh(self, conn):
+        with self.lock:
+            if self.seq is None:
+                self.rebuild(conn)
+                return self
+            newest, changes = changes_since(conn, self.seq)
+            keys = changes.get("admission", [])
+            if keys is None:
+                self.rebuild(conn)
+                return self
+            if keys:
+                self.update(conn, keys)
+            self.seq = newest
+        return self
+
+    def rebuild(self, conn):
+        # Position first: changes committed during the scan are re-read on the next refresh
+        seq = changes_since(conn)[0]
+        self.clear()
+        for row in conn.execute("SELECT patient_id, patient_name, ifnull(contact, ''), disease FROM admission"):
+            self.add(row, ordered=False)
+        self.ids.sort()
+        self.contacts.sort(key=self.contact)
+        self.reversed_contacts.sort(key=self.reversed_contact)
+        self.sorted_values.sort()
+        self.seq = seq
+
+    def update(self, conn, keys):
+        for pid in keys:
+            self.remove(pid)
+        for row in conn.execute("""SELECT patient_id, patient_name, ifnull(contact, ''), disease FROM admission
+                                   WHERE patient_id IN (SELECT value FROM json_each(?))""", (json.dumps(keys),)):
+            self.add(row)
+
+    def contact(self, slot):
+        return self.rows[slot][2]
+
+    def reversed_contact(self, slot):
+        return self.rows[slot][2][::-1]
+
+    def add(self, row, ordered=True):
+        pid, name, contact, disease = row
+        values = [(name or "").lower(), (disease or "").lower()]
+        # Rows share one string object per distinct name and disease
+        row = (pid, self.add_value(values[0], name or "", ordered), contact, self.add_value(values[1], disease or "", ordered))
+        if self.free:
+            slot = self.free.pop()
+            self.rows[slot] = row
+        else:
+            slot = len(self.rows)
+            self.rows.append(row)
+        self.slots[pid] = slot
+        for value in values:
+            self.values[value][1].add(slot)
+        if ordered:
+            insort(self.ids, pid)
+            insort(self.contacts, slot, key=self.contact)
+            insort(self.reversed_contacts, slot, key=self.reversed_contact)
+        else:
+            self.ids.append(pid)
+            self.contacts.append(slot)
+            self.reversed_contacts.append(slot)
+
+    def add_value(self, value, original, ordered):
+        # The shared original-case string for value, indexing it the first time it is seen
+        entry = self.values.get(value)
+        if entry is None:
+            entry = self.values[value] = (original, set())
+            if ordered:
+                insort(self.sorted_values, value)
+            else:
+                self.sorted_values.append(value)
+            for gram in trigrams(value):
+                self.grams.setdefault(gram, set()).add(value)
+        return entry[0]
+
+    def remove(self, pid):
+        slot = self.slots.pop(pid, None)
+        if slot is None:
+            return
+        _, name, contact, disease = self.rows[slot]
+        del self.ids[bisect_left(self.ids, pid)]
+        for slots, key in [(self.contacts, self.contact), (self.reversed_contacts, self.reversed_contact)]:
+            i = bisect_left(slots, key(slot), key=key)
+            while slots[i] != slot:
+                i += 1
+            del slots[i]
+        for value in {name.lower(), disease.lower()}:
+            holders = self.values[value][1]
+            holders.discard(slot)
+            if not holders:
+                del self.values[value]
+                del self.sorted_values[bisect_left(self.sorted_values, value)]
+                for gram in trigrams(value):
+                    self.grams[gram].discard(value)
+                    if not self.grams[gram]:
+                        del self.grams[gram]
+        self.rows[slot] = None
+        self.free.append(slot)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        # Up to `limit` (pid, name, contact, disease) rows, best match first
+        text = text.strip()
+        if not text:
+            return []
+        query = text.lower()
+        with self.lock:
+            ranks = {}  # slot -> rank
+            for pid in {text.upper(), normalize_patient_id(text)}:
+                i = bisect_left(self.ids, pid)
+                while i < len(self.ids) and self.ids[i].startswith(pid) and len(ranks) < limit:
+                    ranks[self.slots[self.ids[i]]] = EXACT_ID if self.ids[i] == pid else ID_PREFIX
+                    i += 1
+
+            for slots, key, fragment in [(self.contacts, self.contact, query),
+                                         (self.reversed_contacts, self.reversed_contact, query[::-1])]:
+                i = bisect_left(slots, fragment, key=key)
+                found = 0
+                while i < len(slots) and key(slots[i]).startswith(fragment) and found < limit:
+                    ranks.setdefault(slots[i], CONTACT)
+                    i += 1
+                    found += 1
+
+            # Values starting with the fragment first, so a full page of good matches
+            # is found before MAX_CANDIDATES cuts the scan short
+            i = bisect_left(self.sorted_values, query)
+            values = []
+            while i < len(self.sorted_values) and self.sorted_values[i].startswith(query):
+                values.append(self.sorted_values[i])
+                i += 1
+            if len(query) >= 3:
+                rarest = min((self.grams.get(gram, ()) for gram in trigrams(query)), key=len)
+                values += sorted(v for v in rarest if query in v and not v.startswith(query))
+            for value in values:
+                for slot in self.values[value][1]:
+                    if len(ranks) >= MAX_CANDIDATES:
+                        break
+                    if slot not in ranks:
+                        ranks[slot] = self.rank(slot, query)
+
+            best = sorted(ranks, key=lambda slot: (ranks[slot], self.rows[slot][1].lower(), self.rows[slot][0]))[:limit]
+            return [self.rows[slot] for slot in best]
+
+    def rank(self, slot, query):
+        name = self.rows[slot][1].lower()
+        if name.startswith(query):
+            return NAME_PREFIX
+        if any(word.startswith(query) for word in name.split()):
+            return WORD_PREFIX
+        return SUBSTRING
+
+
+patient_index = PatientIndex()
+
+
+def search_patients(conn, text, limit=SEARCH_LIMIT):
+    # Admitted patients matching text, as (pid, name, contact, disease), best first
+    return patient_index.refresh(conn).search(text, limit)
@@ -0,0 +1,219 @@
+# Nurse workload for assigning admitted patients: live load per nurse (patients
+# whose admission row names them, see migration 12), the least loaded nurse of a
+# shift for the admission form, and a batch rebalance of a shift's patients. Like
+# the patient search, the index lives in memory and follows the change feed, so an
+# admission, discharge or staff edit costs one keyed re-read.
+#
+# Each shift has a heap of (load, nurse id), plus one heap over every nurse for "any
+# shift". A load change pushes a fresh entry instead of moving the old one, and
+# stale entries (old load, nurse removed or moved to another shift) are dropped
+# when they reach the top, so a suggestion is O(log n) amortised. A heap is rebuilt
+# once stale entries outnumber its nurses.
+import heapq
+import json
+import threading
+from datetime import datetime
+
+from hospital_core import changes_since, write_transaction
+
+NURSE_CHOICES = 50  # nurses listed on the admission form, least loaded first
+ANY_SHIFT = None
+
+
+def shift_key(shift):
+    return (shift or "").strip().lower()
+
+
+class NurseWorkload:
+    # Used from the app's DB thread and the API server's workers, so every access
+    # holds the lock.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = None  # change feed position the index is current to; None = not built
+        self.clear()
+
+    def clear(self):
+        self.nurses = {}  # nurse id -> (name, shift as entered)
+        self.members = {ANY_SHIFT: set()}  # shift key -> nurse ids
+        self.shift_names = {}  # shift key -> the shift as first entered
+        self.patients = {}  # nurse id -> set of their admitted patients' ids
+        self.assigned = {}  # patient id -> nurse id
+        self.heaps = {ANY_SHIFT: []}  # shift key -> [(load, nurse id)], may hold stale entries
+
+    def refresh(self, conn):
+        with self.lock:
+            if self.seq is None:
+                self.rebuild(conn)
+                return self
+            newest, changes = changes_since(conn, self.seq)
+            if changes.get("admission", ()) is None or changes.get("nurses", ()) is None:
+                self.rebuild(conn)
+                return self
+            if changes.get("nurses"):
+                self.update_nurses(conn, changes["nurses"])
+            if changes.get("admission"):
+                self.update_patients(conn, changes["admission"])
+            self.seq = newest
+        return self
+
+    def rebuild(self, conn):
+        # Position first: changes committed during the scan are re-read on the next refresh
+        seq = changes_since(conn)[0]
+        self.clear()
+        for nurse_id, name, shift in conn.execute("SELECT id, name, shift FROM nurses"):
+            self.add_nurse(nurse_id, name, shift, push=False)
+        for patient_id, nurse_id in conn.execute("SELECT patient_id, nurse_id FROM admission WHERE nurse_id IS NOT NULL"):
+            self.assigned[patient_id] = nurse_id
+            self.patients.setdefault(nurse_id, set()).add(patient_id)
+        for key in self.members:
+            self.compact(key)
+        self.seq = seq
+
+    def update_nurses(self, conn, keys):
+        found = {r[0]: r[1:] for r in conn.execute("SELECT id, name, shift FROM nurses WHERE id IN (SELECT value FROM json_each(?))",
+                                                   (json.dumps(keys),))}
+        for nurse_id in keys:
+            self.remove_nurse(nurse_id)
+            if nurse_id in found:
+                self.add_nurse(nurse_id, *found[nurse_id])
+
+    def update_patients(self, conn, keys):
+        found = dict(conn.execute("SELECT patient_id, nurse_id FROM admission WHERE patient_id IN (SELECT value FROM json_each(?))",
+                                  (json.dumps(keys),)))
+        for patient_id in keys:
+            self.assign(patient_id, found.get(patient_id))
+
+    def add_nurse(self, nurse_id, name, shift, push=True):
+        self.nurses[nurse_id] = (name, shift or "")
+        self.shift_names.setdefault(shift_key(shift), (shift or "").strip())
+        for key in (ANY_SHIFT, shift_key(shift)):
+            self.members.setdefault(key, set()).add(nurse_id)
+            self.heaps.setdefault(key, [])
+            if push:
+                self.push(key, nurse_id)
+
+    def remove_nurse(self, nurse_id):
+        # Their heap entries go stale and are dropped later; their patients stay counted
+        # against the id until the admission rows say otherwise
+        nurse = self.nurses.pop(nurse_id, None)
+        if nurse is not None:
+            self.members[ANY_SHIFT].discard(nurse_id)
+            self.members[shift_key(nurse[1])].discard(nurse_id)
+
+    def assign(self, patient_id, nurse_id):
+        # Record patient_id's nurse (None: no nurse, or discharged)
+        old = self.assigned.pop(patient_id, None)
+        if old == nurse_id:
+            if nurse_id is not None:
+                self.assigned[patient_id] = nurse_id
+            return
+        if old is not None:
+            self.patients[old].discard(patient_id)
+            self.changed(old)
+        if nurse_id is not None:
+            self.assigned[patient_id] = nurse_id
+            self.patients.setdefault(nurse_id, set()).add(patient_id)
+            self.changed(nurse_id)
+
+    def load(self, nurse_id):
+        return len(self.patients.get(nurse_id, ()))
+
+    def changed(self, nurse_id):
+        nurse = self.nurses.get(nurse_id)
+        if nurse is not None:
+            for key in (ANY_SHIFT, shift_key(nurse[1])):
+                self.push(key, nurse_id)
+
+    def push(self, key, nurse_id):
+        heap = self.heaps[key]
+        heapq.heappush(heap, (self.load(nurse_id), nurse_id))
+        if len(heap) > 2 * len(self.members[key]) + 16:
+            self.compact(key)
+
+    def compact(self, key):
+        self.heaps[key] = [(self.load(n), n) for n in self.members[key]]
+        heapq.heapify(self.heaps[key])
+
+    def current(self, key, entry):
+        load, nurse_id = entry
+        return nurse_id in self.members[key] and self.load(nurse_id) == load
+
+    def least_loaded(self, shift=ANY_SHIFT, limit=1):
+        # [(nurse id, name, shift, load)] of the `limit` least loaded nurses of the
+        # shift (any shift for None), ties by id. Pops them (dropping stale and
+        # duplicate entries on the way) and pushes them back: O(limit log n).
+        key = ANY_SHIFT if shift is None else shift_key(shift)
+        heap = self.heaps.get(key)
+        if heap is None:
+            return []
+        found = {}
+        while heap and len(found) < limit:
+            entry = heapq.heappop(heap)
+            if entry[1] not in found and self.current(key, entry):
+                found[entry[1]] = entry
+        for entry in found.values():
+            heapq.heappush(heap, entry)
+        return [(nurse_id, *self.nurses[nurse_id], load) for nurse_id, (load, _) in found.items()]
+
+    def shifts(self):
+        # The shifts nurses work
+        return sorted(self.shift_names[key] for key, nurses in self.members.items() if key and nurses)
+
+    def plan_rebalance(self, shift):
+        # [(patient id, from nurse id, to nurse id)] evening out the shift's patients:
+        # with T patients over n nurses everyone ends with T // n or T // n + 1, the
+        # extra ones going to the nurses that had the most, so as few patients as
+        # possible change nurse. Each nurse hands over their latest admissions.
+        key = shift_key(shift)
+        nurses = sorted(self.members.get(key, ()), key=lambda n: (-self.load(n), n))
+        if not nurses:
+            return []
+        base, extra = divmod(sum(self.load(n) for n in nurses), len(nurses))
+        targets = {n: base + (i < extra) for i, n in enumerate(nurses)}
+        surplus = []
+        for nurse_id in nurses:
+            over = self.load(nurse_id) - targets[nurse_id]
+            if over > 0:
+                surplus += [(patient_id, nurse_id) for patient_id in sorted(self.patients[nurse_id])[-over:]]
+        moves = []
+        for nurse_id in reversed(nurses):
+            for _ in range(targets[nurse_id] - self.load(nurse_id)):
+                patient_id, old = surplus.pop()
+                moves.append((patient_id, old, nurse_id))
+        return moves
+
+
+nurse_workload = NurseWorkload()
+
+
+def nurse_choices(conn, shift=None, limit=NURSE_CHOICES):
+    # (shifts, [(nurse id, name, shift, patients)] least loaded first) for the
+    # admission form; the first nurse is the suggestion
+    index = nurse_workload.refresh(conn)
+    with index.lock:
+        return index.shifts(), index.least_loaded(shift, limit)
+
+
+def suggest_nurse(conn, shift=None):
+    # Id of the least loaded nurse of the shift (any shift for None), or None
+    found = nurse_choices(conn, shift, 1)[1]
+    return found[0][0] if found else None
+
+
+def rebalance_shift(conn, shift):
+    # Move the patients of the shift's nurses between them until their loads differ
+    # by at most one, in one transaction, noting each handover in the patient's
+    # treatment record. The plan is made under the write lock, so no admission can
+    # slip in between. Returns the moves as (patient id, from nurse id, to nurse id).
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    with write_transaction(conn):
+        index = nurse_workload.refresh(conn)
+        with index.lock:
+            moves = index.plan_rebalance(shift)
+            names = {nurse_id: index.nurses[nurse_id] for _, _, nurse_id in moves}
+        conn.executemany("UPDATE admission SET nurse_id=? WHERE patient_id=? AND nurse_id=?",
+                         [(new, patient_id, old) for patient_id, old, new in moves])
+        conn.executemany("""INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date)
+                            VALUES (?, ?, 'Reassigned to balance the shift', ?, '', ?)""",
+                         [(patient_id, *names[new], now) for patient_id, _, new in moves])
+    return moves
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hospital_core  # noqa: E402
+import hospital_forecast  # noqa: E402
+import hospital_search  # noqa: E402
+import hospital_workload  # noqa: E402
+from hospital_core import connect, migrate, open_database  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    # The in-memory indexes follow one database; every test starts a new one
+    for cache in [hospital_core.room_index, hospital_core.tariff_cache, hospital_forecast.forecast_cache]:
+        cache.token = None
+    for index in [hospital_search.patient_index, hospital_workload.nurse_workload]:
+        index.seq = None
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "hospital.db")
+
+
+@pytest.fixture
+def db(db_path):
+    conn = open_database(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def old_database(db_path, monkeypatch):
+    # old_database(version) -> connection to a database migrated only that far
+    def open_at(version):
+        with monkeypatch.context() as m:
+            m.setattr(hospital_core, "SCHEMA_VERSION", version)
+            conn = connect(db_path)
+            migrate(conn)
+        return conn
+    return open_at
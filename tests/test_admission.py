@@ -0,0 +1,54 @@
+import pytest
+
+from hospital_core import (RoomUnavailableError, NurseUnavailableError, add_nurse, add_room, admit_patient,
+                           admit_patients, dashboard_counts, nurse_by_name)
+
+PATIENT = {"name": "Asha Rao", "age": "40", "contact": "9000000000", "gender": "Female",
+           "disease": "Fever", "blood_group": "O+", "doctor": "Dr. On Call"}
+
+
+@pytest.fixture
+def rooms(db):
+    for room_no in ["101", "102", "103"]:
+        add_room(db, room_no, "General", "Available")
+    return db
+
+
+def room_status(db):
+    return dict(db.execute("SELECT room_no, status || ':' || ifnull(patient_id, '') FROM rooms WHERE room_no LIKE '10_'"))
+
+
+def test_batch_reserves_each_room_for_its_patient(rooms):
+    ids = admit_patients(rooms, [(dict(PATIENT, name=f"Patient {i}"), room_no, None)
+                                 for i, room_no in enumerate(["101", "103"])])
+    assert len(set(ids)) == 2
+    assert room_status(rooms) == {"101": f"Occupied:{ids[0]}", "102": "Available:", "103": f"Occupied:{ids[1]}"}
+    assert dict(rooms.execute("SELECT patient_id, room_no FROM admission")) == {ids[0]: "101", ids[1]: "103"}
+    assert dashboard_counts(rooms)["rooms:General:Occupied"] == 2
+
+
+def test_taken_room_rolls_back_the_whole_batch(rooms):
+    admit_patient(rooms, PATIENT, "102")
+    before = room_status(rooms)
+    with pytest.raises(RoomUnavailableError) as e:
+        admit_patients(rooms, [(PATIENT, "101", None), (PATIENT, "102", None)])
+    assert e.value.room_no == "102"
+    assert room_status(rooms) == before
+    assert rooms.execute("SELECT count(*) FROM admission").fetchone()[0] == 1
+
+
+def test_same_room_twice_in_one_batch(rooms):
+    with pytest.raises(RoomUnavailableError):
+        admit_patients(rooms, [(PATIENT, "101", None), (PATIENT, "101", None)])
+    assert rooms.execute("SELECT count(*) FROM admission").fetchone()[0] == 0
+
+
+def test_nurse_assigned_or_batch_rolled_back(rooms):
+    add_nurse(rooms, "Meera Das", "9000000001", "Day", "")
+    nurse_id = nurse_by_name(rooms, "Meera Das")
+    patient_id = admit_patient(rooms, PATIENT, "101", nurse_id)
+    assert rooms.execute("SELECT nurse_id FROM admission WHERE patient_id=?", (patient_id,)).fetchone() == (nurse_id,)
+    assert rooms.execute("SELECT nurse_name FROM nurse_treatment WHERE patient_id=?", (patient_id,)).fetchall() == [("Meera Das",)]
+    with pytest.raises(NurseUnavailableError):
+        admit_patients(rooms, [(PATIENT, "102", nurse_id), (PATIENT, "103", nurse_id + 1)])
+    assert room_status(rooms)["102"] == "Available:"
@@ -0,0 +1,76 @@
+import asyncio
+import http.client
+import threading
+
+import pytest
+
+from hospital_api import API_TOKEN_ENV, ApiClient, ApiError, ApiServer, serve
+
+
+@pytest.fixture
+def start_server(db, db_path):
+    # start(token) -> url of an API server for the test database, on a thread
+    running = []
+
+    def start(token):
+        server = ApiServer(db_path, workers=2, token=token)
+        ready = threading.Event()
+
+        def started(s):
+            running.append((asyncio.get_running_loop(), s, server))
+            ready.set()
+
+        def run():
+            try:
+                asyncio.run(server.serve("127.0.0.1", 0, started))
+            except asyncio.CancelledError:
+                pass
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        assert ready.wait(5)
+        running[-1] += (thread,)
+        return f"http://127.0.0.1:{running[-1][1].sockets[0].getsockname()[1]}"
+
+    yield start
+    for loop, s, server, thread in running:
+        loop.call_soon_threadsafe(s.close)
+        thread.join(5)
+        server.close()
+
+
+def status(url, method, path, headers=None):
+    client = ApiClient(url)
+    conn = http.client.HTTPConnection(client.host, client.port, timeout=5)
+    conn.request(method, path, "{}", headers or {})
+    return conn.getresponse().status
+
+
+def test_token_required(start_server, monkeypatch):
+    monkeypatch.delenv(API_TOKEN_ENV, raising=False)
+    url = start_server("s3cret")
+    assert "admission" in ApiClient(url, token="s3cret").call("dashboard_counts")
+    for token in [None, "wrong", "s3cret-and-more"]:
+        with pytest.raises(ApiError) as e:
+            ApiClient(url, token=token).call("dashboard_counts")
+        assert e.value.status == 401
+    assert status(url, "POST", "/api/dashboard_counts", {"Authorization": "s3cret"}) == 401
+    assert status(url, "GET", "/health") == 200
+
+
+def test_client_reads_token_from_environment(start_server, monkeypatch):
+    url = start_server("from-env")
+    monkeypatch.setenv(API_TOKEN_ENV, "from-env")
+    assert ApiClient(url).call("tariffs")
+
+
+def test_no_token_configured(start_server, monkeypatch):
+    monkeypatch.delenv(API_TOKEN_ENV, raising=False)
+    url = start_server(None)
+    assert status(url, "POST", "/api/dashboard_counts") == 200
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "192.168.1.10", "example.org"])
+def test_open_bind_needs_token(db_path, monkeypatch, host):
+    monkeypatch.delenv(API_TOKEN_ENV, raising=False)
+    with pytest.raises(RuntimeError, match=API_TOKEN_ENV):
+        serve(db_path, host, 0)
@@ -0,0 +1,45 @@
+import pytest
+
+import hospital_import
+from hospital_bench import generate
+from hospital_core import open_database, write_transaction
+
+TABLES = ["rooms", "doctors", "nurses", "admission", "nurse_treatment", "events", "change_log"]
+
+
+def counts(conn):
+    return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+def test_generate_is_seeded(db, tmp_path):
+    other = open_database(str(tmp_path / "other.db"))
+    for conn in (db, other):
+        generate(conn, patients=50, doctors=5, nurses=5, notes=20, seed=7)
+    query = "SELECT patient_name, doctor_name, room_no, admit_date FROM admission ORDER BY patient_id"
+    assert db.execute(query).fetchall() == other.execute(query).fetchall()
+    other.close()
+
+
+def test_failed_generate_leaves_database_as_it_was(db, monkeypatch):
+    with write_transaction(db):
+        db.execute("INSERT INTO doctors (name) VALUES ('Dr. Existing')")
+    before = counts(db)
+    triggers = db.execute("SELECT count(*) FROM sqlite_master WHERE type='trigger'").fetchone()[0]
+
+    def fail(self, conn, rows):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(hospital_import.AdmissionImport, "insert", fail)
+    with pytest.raises(RuntimeError):
+        generate(db, patients=20, doctors=2, nurses=2, notes=10)
+    assert counts(db) == before
+    assert db.execute("SELECT count(*) FROM sqlite_master WHERE type='trigger'").fetchone()[0] == triggers
+    assert not db.in_transaction
+
+
+def test_nested_write_transaction_rolls_back_with_outer(db):
+    with pytest.raises(ValueError):
+        with write_transaction(db):
+            with write_transaction(db):
+                db.execute("INSERT INTO doctors (name) VALUES ('Dr. Inner')")
+            raise ValueError
+    assert db.execute("SELECT count(*) FROM doctors").fetchone()[0] == 0
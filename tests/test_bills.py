@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+from hospital_bench import generate
+from hospital_bills import render_run, run_bills
+from hospital_core import bill_all, discharge_admission, open_database
+
+
+def run(db, name):
+    return {b["pid"]: b for chunk in run_bills(db, name) for b in chunk}
+
+
+def test_run_prints_discharged_patients(db):
+    generate(db, patients=3, doctors=1, nurses=1, notes=0)
+    bill_all(db, "2026-09", now="2026-09-30 12:00")
+    pid, name, doctor = db.execute("SELECT patient_id, patient_name, doctor_name FROM admission LIMIT 1").fetchone()
+    discharge_admission(db, pid, now="2026-10-01 09:00")
+    bills = run(db, "2026-09")
+    assert len(bills) == 3
+    assert (bills[pid]["name"], bills[pid]["doctor"]) == (name, doctor)
+
+
+def test_migration_fills_details_of_existing_bills(old_database, db_path):
+    conn = old_database(13)
+    generate(conn, patients=2, doctors=1, nurses=1, notes=0)
+    with conn:
+        conn.execute("""INSERT INTO bills (run, patient_id, billed_at, days, room_rate, room_cost, doctor_fee, nursing_fee, service_fee, total)
+                        SELECT '2026-09', patient_id, '2026-09-30', 1, 0, 0, 0, 0, 0, 0 FROM admission""")
+    pid, name = conn.execute("SELECT patient_id, patient_name FROM admission ORDER BY patient_id LIMIT 1").fetchone()
+    discharge_admission(conn, pid, now="2026-10-01 09:00")
+    conn.close()
+    conn = open_database(db_path)
+    bills = run(conn, "2026-09")
+    assert bills[pid]["name"] == name
+    assert all(b["name"] for b in bills.values())
+
+
+def test_render_run_writes_manifest(db, tmp_path):
+    generate(db, patients=4, doctors=1, nurses=1, notes=0)
+    bill_all(db, "2026-09", now="2026-09-30 12:00")
+    count, manifest = render_run(db, "2026-09", str(tmp_path), workers=1)
+    assert count == 8
+    for line in open(manifest).read().splitlines():
+        digest, name = line.split("  ")
+        with open(os.path.join(tmp_path, name), "rb") as f:
+            assert hashlib.sha256(f.read()).hexdigest() == digest
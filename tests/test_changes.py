@@ -0,0 +1,51 @@
+from hospital_core import (CHANGE_FEED, CHANGE_LOG_KEEP, add_doctor, add_room, admit_patient, changes_since, connect,
+                           release_admission, update_room, write_transaction)
+from hospital_import import import_records
+from hospital_bench import RaiseOnReject, records
+
+PATIENT = {"name": "Asha Rao", "age": "40", "contact": "9000000000", "gender": "Female",
+           "disease": "Fever", "blood_group": "O+", "doctor": "Dr. On Call"}
+
+
+def test_no_changes(db):
+    seq = changes_since(db)[0]
+    assert changes_since(db, seq) == (seq, {})
+
+
+def test_lists_changed_keys_once_per_table(db):
+    add_room(db, "301", "ICU", "Available")
+    seq = changes_since(db)[0]
+    patient_id = admit_patient(db, PATIENT, "301")
+    update_room(db, "301", "ICU", "Occupied")
+    add_doctor(db, "Dr. New", "Surgery", "9000000002", "Day", "")
+    newest, changes = changes_since(db, seq)
+    assert newest > seq
+    assert changes["admission"] == [patient_id]
+    assert changes["rooms"] == ["301"]
+    assert len(changes["doctors"]) == 1
+    assert changes_since(db, newest) == (newest, {})
+
+    release_admission(db, patient_id)
+    assert changes_since(db, newest)[1]["admission"] == [patient_id]
+
+
+def test_sees_other_connections_writes(db, db_path):
+    seq = changes_since(db)[0]
+    other = connect(db_path)
+    add_room(other, "302", "General", "Available")
+    other.close()
+    assert changes_since(db, seq)[1] == {"rooms": ["302"]}
+
+
+def test_bulk_import_asks_for_reload(db):
+    seq = changes_since(db)[0]
+    import_records(db, "rooms", records([["401", "General", "Available"]]), RaiseOnReject())
+    assert changes_since(db, seq)[1]["rooms"] is None
+
+
+def test_fallen_out_of_the_log_reloads_everything(db):
+    seq = changes_since(db)[0]
+    with write_transaction(db):
+        db.executemany("INSERT INTO change_log (table_name, row_key, op) VALUES ('rooms', ?, 'update')",
+                       [(str(i),) for i in range(CHANGE_LOG_KEEP + 1000)])
+    assert changes_since(db, seq)[1] == {table: None for table in CHANGE_FEED}
@@ -0,0 +1,34 @@
+from hospital_bench import generate
+from hospital_core import DISCHARGE_COLUMNS, dashboard_counts, discharge_admission, discharges, patient_discharges
+
+COLUMNS = [name for name, _ in DISCHARGE_COLUMNS]
+
+
+def admitted(db, n):
+    return [r[0] for r in db.execute("SELECT patient_id FROM admission ORDER BY patient_id LIMIT ?", (n,))]
+
+
+def test_discharge_archives_and_frees_the_room(db):
+    generate(db, patients=5, doctors=1, nurses=1, notes=0)
+    pid = admitted(db, 1)[0]
+    room_no, name = db.execute("SELECT room_no, patient_name FROM admission WHERE patient_id=?", (pid,)).fetchone()
+    bill = discharge_admission(db, pid, extra=300, now="2026-09-30 23:00")
+    assert bill["pid"] == pid
+    assert db.execute("SELECT count(*) FROM admission WHERE patient_id=?", (pid,)).fetchone()[0] == 0
+    assert db.execute("SELECT status, patient_id FROM rooms WHERE room_no=?", (room_no,)).fetchone() == ("Available", None)
+    assert dashboard_counts(db)["admission"] == 4
+    [stay] = [dict(zip(COLUMNS, row)) for row in patient_discharges(db, pid)]
+    assert (stay["patient_name"], stay["discharged_at"], stay["extra"], stay["total"]) == (name, "2026-09-30 23:00", 300, bill["total"])
+    assert discharge_admission(db, pid) is None
+
+
+def test_discharges_span_monthly_partitions(db):
+    generate(db, patients=6, doctors=1, nurses=1, notes=0)
+    pids = admitted(db, 3)
+    for pid, now in zip(pids, ["2026-08-31 23:59", "2026-09-01 00:00", "2026-10-05 10:00"]):
+        discharge_admission(db, pid, now=now)
+    assert db.execute("SELECT month FROM discharge_months ORDER BY month").fetchall() == [("2026-08",), ("2026-09",), ("2026-10",)]
+    found = discharges(db, "2026-08-31", "2026-10-01")
+    assert [row[COLUMNS.index("patient_id")] for row in found] == pids[:2]
+    assert db.execute("SELECT count(*) FROM discharged").fetchone()[0] == 3
+
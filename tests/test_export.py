@@ -0,0 +1,71 @@
+import csv
+import gzip
+import json
+import sqlite3
+import threading
+
+from hospital_bench import generate
+from hospital_core import add_nurse_record, open_database
+from hospital_export import export_table
+
+NOTE = "INSERT INTO nurse_treatment (patient_id, nurse_name, nurse_notes, shift, prescription, date) VALUES (?, ?, 'n', 'Day', '', 'x')"
+
+
+def exported(conn, tmp_path, name, table="nurse_treatment"):
+    path = str(tmp_path / f"{table}.jsonl")
+    export_table(conn, table, path, since_name=name)
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_formats_match(db, tmp_path):
+    generate(db, patients=30, doctors=2, nurses=2, notes=50)
+    export_table(db, "nurse_treatment", str(tmp_path / "n.csv.gz"))
+    export_table(db, "nurse_treatment", str(tmp_path / "n.jsonl"))
+    with gzip.open(tmp_path / "n.csv.gz", "rt", newline="") as f:
+        from_csv = list(csv.DictReader(f))
+    with open(tmp_path / "n.jsonl") as f:
+        from_jsonl = [{k: "" if v is None else str(v) for k, v in json.loads(line).items()} for line in f]
+    assert len(from_csv) == db.execute("SELECT count(*) FROM nurse_treatment").fetchone()[0]
+    assert from_csv == from_jsonl
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_incremental_runs(db, tmp_path):
+    generate(db, patients=10, doctors=0, nurses=0, notes=20)
+    assert len(exported(db, tmp_path, "insurer")) == 20
+    assert exported(db, tmp_path, "insurer") == []
+    pid = db.execute("SELECT patient_id FROM admission LIMIT 1").fetchone()[0]
+    add_nurse_record(db, pid, "Meera", "Checked", "Night", "")
+    assert [r["nurse_notes"] for r in exported(db, tmp_path, "insurer")] == ["Checked"]
+    # Another name keeps its own position
+    assert len(exported(db, tmp_path, "auditor")) == 21
+
+
+def test_transaction_open_during_export_goes_out_next_run(db, db_path, tmp_path):
+    generate(db, patients=1, doctors=1, nurses=1, notes=0)
+    exported(db, tmp_path, "insurer")
+    pid = db.execute("SELECT patient_id FROM admission").fetchone()[0]
+    slow = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    slow.execute("BEGIN IMMEDIATE")
+    slow.execute(NOTE, (pid, "Slow"))
+    # Commits while the export waits to save its position, after it read its snapshot
+    timer = threading.Timer(0.5, slow.commit)
+    timer.start()
+    assert exported(db, tmp_path, "insurer") == []
+    timer.join()
+    assert [r["nurse_name"] for r in exported(db, tmp_path, "insurer")] == ["Slow"]
+
+
+def test_migration_keeps_export_positions(old_database, db_path, tmp_path):
+    # Before migration 13 the position was an updated_at; rows after it must still go out
+    conn = old_database(12)
+    with conn:
+        conn.executemany(NOTE, [("P1", "Old"), ("P1", "Seen"), ("P1", "Pending"), ("P1", "Later")])
+        for name, stamp in [("Old", "2025-12-01"), ("Seen", "2026-01-01"), ("Pending", "2026-03-01"), ("Later", "2026-04-01")]:
+            conn.execute("UPDATE nurse_treatment SET updated_at = ? WHERE nurse_name = ?", (stamp, name))
+        conn.execute("INSERT INTO export_state VALUES ('insurer', 'nurse_treatment', '2026-02-01', '2026-02-01')")
+    conn.close()
+    conn = open_database(db_path)
+    assert [r["nurse_name"] for r in exported(conn, tmp_path, "insurer")] == ["Pending", "Later"]
+    assert len(exported(conn, tmp_path, "new")) == 4
@@ -0,0 +1,19 @@
+import pytest
+
+from hospital_bench import generate
+from hospital_core import discharge_admission
+
+np = pytest.importorskip("numpy")
+
+from hospital_forecast import occupancy_forecast  # noqa: E402
+
+
+def test_discharge_invalidates_forecast(db):
+    generate(db, patients=40, doctors=2, nurses=2, notes=0)
+    today = "2030-01-01"
+    before = occupancy_forecast(db, today)
+    before_total = sum(days[0] for days in before["expected"].values())
+    for pid, in db.execute("SELECT patient_id FROM admission LIMIT 20").fetchall():
+        discharge_admission(db, pid, now="2029-12-31 12:00")
+    after = occupancy_forecast(db, today)
+    assert sum(days[0] for days in after["expected"].values()) < before_total
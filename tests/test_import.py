@@ -0,0 +1,56 @@
+import csv
+
+from hospital_bench import generate
+from hospital_core import open_database
+from hospital_export import export_table
+from hospital_import import import_file
+
+
+def admissions(conn):
+    return conn.execute("""SELECT patient_id, patient_name, age, contact, gender, disease, blood_group, doctor_name,
+                                  room_no, admit_date, nurse_id FROM admission ORDER BY patient_id""").fetchall()
+
+
+def empty_copy(conn, path):
+    # A database with the same staff and rooms (all free) and no patients
+    target = open_database(path)
+    conn.backup(target)
+    with target:
+        target.execute("UPDATE rooms SET status='Available', patient_id=NULL")
+        target.execute("DELETE FROM nurse_treatment")
+        target.execute("DELETE FROM admission")
+    return target
+
+
+def test_generate(db):
+    added = generate(db, patients=300, doctors=10, nurses=20, notes=500)
+    assert added == {"rooms": 360, "doctors": 10, "nurses": 20, "admission": 300, "nurse_treatment": 500}
+    assert db.execute("SELECT count(*) FROM admission WHERE nurse_id IS NULL").fetchone()[0] == 0
+    assert db.execute("SELECT count(*) FROM rooms WHERE status='Occupied'").fetchone()[0] == 300
+
+
+def test_export_import_round_trip(db, tmp_path):
+    generate(db, patients=300, doctors=10, nurses=20, notes=0)
+    for ext in ["csv", "jsonl"]:
+        path = str(tmp_path / f"admission.{ext}")
+        export_table(db, "admission", path)
+        target = empty_copy(db, str(tmp_path / f"target-{ext}.db"))
+        imported, rejected, _ = import_file(target, "admissions", path)
+        assert (imported, rejected) == (300, 0)
+        assert admissions(target) == admissions(db)
+        target.close()
+
+
+def test_unknown_nurse_rejected(db, tmp_path):
+    generate(db, patients=0, doctors=1, nurses=1, rooms=2, notes=0)
+    nurse = db.execute("SELECT name FROM nurses").fetchone()[0]
+    path = tmp_path / "new.csv"
+    with open(path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["name", "age", "contact", "gender", "disease", "blood_group", "doctor", "nurse"])
+        out.writerow(["Asha Rao", "40", "9000000000", "Female", "Fever", "O+", "Dr. On Call", nurse])
+        out.writerow(["Ravi Kumar", "41", "9000000001", "Male", "Fever", "O+", "Dr. On Call", "Nobody"])
+    imported, rejected, reject_path = import_file(db, "admissions", str(path))
+    assert (imported, rejected) == (1, 1)
+    assert "No nurse named Nobody" in open(reject_path).read()
+    assert db.execute("SELECT count(*) FROM nurse_treatment").fetchone()[0] == 1
@@ -0,0 +1,47 @@
+import pytest
+
+import hospital_core
+from hospital_core import MIGRATIONS, SCHEMA_VERSION, check_query_plans, migrate, open_database
+
+
+def version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def schema(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def test_fresh_database_is_current(db):
+    assert version(db) == SCHEMA_VERSION == len(MIGRATIONS)
+    before = schema(db)
+    migrate(db)
+    assert schema(db) == before
+
+
+def test_step_by_step_matches_fresh(old_database, tmp_path):
+    fresh = schema(open_database(str(tmp_path / "fresh.db")))
+    conn = old_database(1)
+    for step in range(2, SCHEMA_VERSION + 1):
+        conn.close()
+        conn = old_database(step)
+        assert version(conn) == step
+    assert schema(conn) == fresh
+
+
+def test_failed_step_keeps_previous_version(old_database, monkeypatch):
+    conn = old_database(SCHEMA_VERSION - 1)
+    before = schema(conn)
+
+    def broken(db):
+        db.execute("CREATE TABLE half_done (x)")
+        raise RuntimeError("boom")
+    monkeypatch.setattr(hospital_core, "MIGRATIONS", MIGRATIONS[:-1] + [broken])
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    assert version(conn) == SCHEMA_VERSION - 1
+    assert schema(conn) == before
+
+
+def test_query_plans_use_indexes():
+    assert check_query_plans() == []
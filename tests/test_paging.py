@@ -0,0 +1,43 @@
+from hospital_bench import generate
+from hospital_core import KeysetSource, admitted_patients_source
+
+
+def all_rows(db, source):
+    return db.execute(source._select()[0], source.params).fetchall()
+
+
+def walk_forward(db, source, size):
+    rows, key = [], None
+    while True:
+        page = source.after(db, key, size)
+        rows += page
+        if len(page) < size:
+            return rows
+        key = source.key(page[-1])
+
+
+def test_pages_cover_every_row_once(db):
+    # Many patients share a name, so pages must break ties on the ID
+    generate(db, patients=250, doctors=3, nurses=3, notes=0)
+    source = admitted_patients_source()
+    expected = all_rows(db, source)
+    assert source.count(db) == len(expected) == 250
+    assert walk_forward(db, source, 17) == expected
+    assert list(source.rows(db, page_size=40)) == expected
+    assert source.at(db, 100, 10) == expected[100:110]
+
+
+def test_before_pages_back(db):
+    generate(db, patients=120, doctors=3, nurses=3, notes=0)
+    source = admitted_patients_source()
+    expected = all_rows(db, source)
+    assert source.before(db, source.key(expected[60]), 25) == expected[35:60]
+    assert source.before(db, source.key(expected[10]), 25) == expected[:10]
+
+
+def test_descending_and_filtered(db):
+    generate(db, patients=0, doctors=0, nurses=0, rooms=90, notes=0)
+    source = KeysetSource("rooms", ["room_no", "type"], ["room_no"], where="type = ?", params=("ICU",), descending=True)
+    expected = db.execute("SELECT room_no, type FROM rooms WHERE type='ICU' ORDER BY room_no DESC").fetchall()
+    assert walk_forward(db, source, 7) == expected
+    assert source.count(db) == len(expected)